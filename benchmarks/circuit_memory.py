@@ -0,0 +1,80 @@
+'''Measures the memory used by circuit elements.
+
+Builds a synthetic netlist of resistors with 100k InstAssign's and reports
+the bytes allocated per element, followed by the bytes per element of the
+component classes.
+
+    python benchmarks/circuit_memory.py [assigns]
+'''
+import sys
+import tracemalloc
+from pycircuit.circuit import Netlist, Net, Inst, InstAssign
+from pycircuit.component import Component, Pin, Fun, BusFun
+from pycircuit.library import *
+
+
+def measure(build):
+    '''Returns the result of build and the number of bytes it allocated.'''
+
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    result = build()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return result, after - before
+
+
+def netlist_memory(num_assigns):
+    Component.component_by_name('R')
+    netlist = Netlist('memory')
+
+    # Every inst connects to two nets, every net has two assigns
+    num_insts = num_assigns // 2
+
+    def build_nets():
+        return [Net('n%d' % i, _parent=netlist) for i in range(num_insts)]
+
+    def build_insts():
+        return [Inst('R', _parent=netlist) for i in range(num_insts)]
+
+    def build_assigns():
+        assigns = []
+        for i, inst in enumerate(insts):
+            assigns.append(InstAssign(inst, '~', nets[i], _parent=netlist))
+            assigns.append(InstAssign(inst, '~', nets[i - 1],
+                                      _parent=netlist))
+        return assigns
+
+    nets, net_bytes = measure(build_nets)
+    insts, inst_bytes = measure(build_insts)
+    assigns, assign_bytes = measure(build_assigns)
+
+    # The assign lists of insts and nets grow while assigns are built, so
+    # assign_bytes includes the list storage referencing them.
+    print('%d assigns, %d insts, %d nets' %
+          (len(assigns), len(insts), len(nets)))
+    print('%-12s %8.1f bytes' % ('Net', net_bytes / len(nets)))
+    print('%-12s %8.1f bytes' % ('Inst', inst_bytes / len(insts)))
+    print('%-12s %8.1f bytes' % ('InstAssign', assign_bytes / len(assigns)))
+    total = net_bytes + inst_bytes + assign_bytes
+    print('%-12s %8.1f bytes' % ('total/assign', total / len(assigns)))
+
+
+def component_memory(num_pins):
+    def build_pins():
+        return [Pin('P%d' % i, Fun('GPIO'), BusFun('UART%d' % i, 'UART_TX'))
+                for i in range(num_pins)]
+
+    pins, pin_bytes = measure(build_pins)
+    # Each pin owns a Fun, a BusFun and a list of funs
+    print('%-12s %8.1f bytes (Fun + BusFun included)' %
+          ('Pin', pin_bytes / len(pins)))
+
+    funs, fun_bytes = measure(lambda: [Fun('GPIO') for i in range(num_pins)])
+    print('%-12s %8.1f bytes' % ('Fun', fun_bytes / len(funs)))
+
+
+if __name__ == '__main__':
+    num_assigns = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    netlist_memory(num_assigns)
+    component_memory(num_assigns // 10)
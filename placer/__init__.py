@@ -1 +1,4 @@
 from placer.place import Placer
+from placer.analytic import AnalyticPlacer
+from placer.anneal import AnnealPlacer
+from placer.hierarchy import HierarchicalPlacer
@@ -0,0 +1,276 @@
+import numpy as np
+import scipy.sparse as sp
+from scipy.sparse.linalg import spsolve
+from pycircuit.pcb import Pcb
+from pycircuit.package import Courtyard
+from pycircuit.formats import json
+
+from placer.box import Box, Anchor
+from placer.grid import Grid, Occupancy
+
+
+class AnalyticPlacer(object):
+    '''Quadratic placer for large boards.
+
+    The wire length of every net is modelled with springs between the pads
+    of the net, a clique for small nets and a star for large ones.  Every
+    iteration minimizes the quadratic wire length with a sparse linear
+    solve, spreads the insts to remove overlap and pulls the insts towards
+    their spread location with increasing weight.  Finally the insts are
+    legalized onto the Courtyard.IPC_GRID_SCALE grid.  Insts are not
+    rotated.'''
+
+    def __init__(self, grid_size=Courtyard.IPC_GRID_SCALE, density=1.5,
+                 iterations=30, star_degree=10, verbose=False):
+        assert density > 1
+        self.grid_size = grid_size
+        self.density = density
+        self.iterations = iterations
+        self.star_degree = star_degree
+        self.verbose = verbose
+
+    def place(self, filein, fileout):
+        self.pcb = Pcb.from_file(filein)
+        if self.place_pcb(self.pcb):
+            self.pcb.to_file(fileout)
+        else:
+            print('unsat')
+
+    def place_pcb(self, pcb):
+        '''Places all insts of pcb.  Returns False when the insts don't fit
+        into the placement area.'''
+
+        self.pcb = pcb
+        area = pcb.outline.polygon.interiors[0]
+        left, bottom, right, top = area.bounds
+        self.origin = np.array([left, bottom])
+        self.width = int((right - left) / self.grid_size)
+        self.height = int((top - bottom) / self.grid_size)
+
+        insts = pcb.pads.insts
+        self.boxes = [Box(inst, inst.device.package.courtyard.ipc_width,
+                          inst.device.package.courtyard.ipc_height,
+                          Anchor.Center, Anchor.Center)
+                      for inst in insts]
+        self.size = np.array([[box.width, box.height] for box in self.boxes],
+                             dtype=float).reshape(-1, 2)
+        # Offset from the inst origin to the center of the courtyard
+        self.center = np.array(
+            [[(b[0] + b[2]) / 2, (b[1] + b[3]) / 2] for b in
+             [inst.device.package.courtyard.bounds for inst in insts]],
+            dtype=float).reshape(-1, 2)
+
+        xy = self.global_place()
+        if not self.legalize(xy, area):
+            return False
+
+        for box, inst, center in zip(self.boxes, insts, self.center):
+            x, y = self.origin + \
+                np.array([box.x.value, box.y.value]) * self.grid_size - center
+            inst.attributes.place(inst.attributes.layer, x, y)
+
+        if self.verbose:
+            grid = Grid(self.width, self.height)
+            for box in self.boxes:
+                grid.add_box(box)
+            print(str(grid))
+        return True
+
+    def springs(self):
+        '''Returns the sparse spring matrix and the spring forces on the
+        insts from the pad offsets.  Star nets add a variable per net after
+        the insts.'''
+
+        pads = self.pcb.pads
+        num_insts = len(pads.insts)
+        # Pad offsets from the center of the courtyard in grid units
+        offset = (pads.local[:, :2] - self.center[pads.inst]) / self.grid_size
+
+        rows, cols, weights, forces = [], [], [], []
+        num_vars = num_insts
+
+        for i in range(len(pads.nets)):
+            net_pads = pads.net_pads[pads.net_ptr[i]:pads.net_ptr[i + 1]]
+            degree = len(net_pads)
+            if degree < 2 or len(set(pads.inst[net_pads])) < 2:
+                continue
+
+            if degree <= self.star_degree:
+                a, b = np.triu_indices(degree, 1)
+                pa, pb = net_pads[a], net_pads[b]
+                keep = pads.inst[pa] != pads.inst[pb]
+                pa, pb = pa[keep], pb[keep]
+                ia, ib = pads.inst[pa], pads.inst[pb]
+                w = np.full(len(pa), 1 / (degree - 1))
+                forces.append((ia, w[:, None] * (offset[pb] - offset[pa])))
+                forces.append((ib, w[:, None] * (offset[pa] - offset[pb])))
+            else:
+                # Springs from every pad to a star variable
+                ia = pads.inst[net_pads]
+                ib = np.full(degree, num_vars)
+                num_vars += 1
+                w = np.full(degree, degree / (degree - 1))
+                forces.append((ia, -w[:, None] * offset[net_pads]))
+                forces.append((ib, w[:, None] * offset[net_pads]))
+
+            rows += [ia, ib, ia, ib]
+            cols += [ia, ib, ib, ia]
+            weights += [w, w, -w, -w]
+
+        if len(rows) == 0:
+            return sp.csr_matrix((num_vars, num_vars)), \
+                np.zeros((num_vars, 2))
+
+        springs = sp.csr_matrix(
+            (np.concatenate(weights),
+             (np.concatenate(rows), np.concatenate(cols))),
+            shape=(num_vars, num_vars))
+        force = np.zeros((num_vars, 2))
+        for index, f in forces:
+            np.add.at(force, index, f)
+        return springs, force
+
+    def global_place(self):
+        '''Returns the centers of the insts in grid units after quadratic
+        placement and spreading.'''
+
+        num_insts = len(self.boxes)
+        springs, force = self.springs()
+        num_vars = springs.shape[0]
+
+        # A weak anchor to the center keeps the system nonsingular
+        targets = np.zeros((num_vars, 2))
+        targets[:] = (self.width / 2, self.height / 2)
+        anchors = np.full(num_vars, 1e-3)
+
+        for iteration in range(self.iterations + 1):
+            system = (springs + sp.diags(anchors)).tocsc()
+            xy = spsolve(system, force + anchors[:, None] * targets)
+            xy = xy.reshape(num_vars, 2)
+
+            spread = self.spread(xy[:num_insts])
+            overflow = np.abs(spread - xy[:num_insts]).mean()
+            if self.verbose:
+                print('iteration', iteration, 'displacement', overflow)
+            if overflow < 0.5:
+                break
+
+            targets[:num_insts] = spread
+            anchors[:num_insts] = 0.01 * 1.5 ** iteration
+
+        return spread
+
+    def spread(self, xy):
+        '''Returns the centers of the insts spread over a region with
+        density times the area of the insts.  The region is split
+        recursively so that both halves hold insts of equal area.'''
+
+        area = np.prod(self.size, axis=1)
+        region_area = min(area.sum() * self.density, self.width * self.height)
+        scale = np.sqrt(region_area / (self.width * self.height))
+        half = np.array([self.width, self.height]) * scale / 2
+
+        center = np.average(xy, axis=0, weights=area)
+        center = np.clip(center, half, (self.width, self.height) - half)
+        spread = np.empty_like(xy)
+        self.bisect(xy, area, np.arange(len(xy)),
+                    np.concatenate([center - half, center + half]), spread)
+
+        # Spreading doesn't move the insts as a whole
+        spread += xy.mean(axis=0) - spread.mean(axis=0)
+        return np.clip(spread, self.size / 2,
+                       (self.width, self.height) - self.size / 2)
+
+    def bisect(self, xy, area, index, region, spread):
+        if len(index) == 1:
+            i = index[0]
+            half = np.minimum(self.size[i], region[2:] - region[:2]) / 2
+            spread[i] = np.clip(xy[i], region[:2] + half, region[2:] - half)
+            return
+
+        axis = 0 if region[2] - region[0] >= region[3] - region[1] else 1
+        index = index[np.argsort(xy[index, axis], kind='stable')]
+        cumulative = np.cumsum(area[index])
+        split = np.searchsorted(cumulative, cumulative[-1] / 2) + 1
+        split = min(max(split, 1), len(index) - 1)
+
+        fraction = cumulative[split - 1] / cumulative[-1]
+        cut = region[axis] + fraction * (region[axis + 2] - region[axis])
+        low, high = region.copy(), region.copy()
+        low[axis + 2] = cut
+        high[axis] = cut
+        self.bisect(xy, area, index[:split], low, spread)
+        self.bisect(xy, area, index[split:], high, spread)
+
+    def legalize(self, xy, area):
+        '''Places the boxes at the free grid position closest to xy, largest
+        boxes first.  Grid cells outside of area are occupied.'''
+
+        occupied = Occupancy.from_area(area, self.grid_size).count > 0
+
+        order = np.lexsort((xy[:, 0], -np.prod(self.size, axis=1)))
+        for i in order:
+            box = self.boxes[i]
+            w, h = int(box.width), int(box.height)
+            if w > self.width or h > self.height:
+                print('Error: %s does not fit on the board' % box.inst.name)
+                return False
+
+            position = free_position(occupied, w, h, xy[i] - (w / 2, h / 2))
+            if position is None:
+                print('Error: No space left for %s' % box.inst.name)
+                return False
+
+            x, y = position
+            occupied[y:y + h, x:x + w] = True
+            box.set_position(x + w / 2, y + h / 2)
+        return True
+
+
+def free_position(occupied, w, h, target):
+    '''Returns the position (x, y) closest to target where a w * h box
+    covers no occupied cells or None.  The search starts in a window around
+    target that grows until it holds a position closer than the window
+    border.'''
+
+    height, width = occupied.shape
+    tx, ty = target
+    radius = max(w, h)
+    while True:
+        x0 = max(int(np.floor(tx)) - radius, 0)
+        y0 = max(int(np.floor(ty)) - radius, 0)
+        x1 = min(int(np.ceil(tx)) + w + radius, width)
+        y1 = min(int(np.ceil(ty)) + h + radius, height)
+        whole = (x0, y0, x1, y1) == (0, 0, width, height)
+
+        # Number of occupied cells under the box at every position
+        window = occupied[y0:y1, x0:x1]
+        table = np.zeros((y1 - y0 + 1, x1 - x0 + 1), dtype=np.int64)
+        table[1:, 1:] = window.cumsum(axis=0).cumsum(axis=1)
+        used = table[h:, w:] - table[:-h, w:] - table[h:, :-w] \
+            + table[:-h, :-w]
+        free_y, free_x = np.nonzero(used == 0)
+
+        if len(free_x) > 0:
+            distance = (free_x + x0 - tx) ** 2 + (free_y + y0 - ty) ** 2
+            k = np.argmin(distance)
+            # Positions outside of the window are at least radius away
+            if whole or distance[k] <= (radius - 1) ** 2:
+                return int(free_x[k] + x0), int(free_y[k] + y0)
+        elif whole:
+            return None
+        radius *= 2
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Analytic placement')
+
+    parser.add_argument('filein', type=str)
+    parser.add_argument('fileout', type=str)
+
+    args, unknown = parser.parse_known_args()
+
+    placer = AnalyticPlacer()
+    placer.place(args.filein, args.fileout)
@@ -0,0 +1,420 @@
+import math
+import random
+import time
+import numpy as np
+from pycircuit.pcb import Matrix, Pcb
+from pycircuit.package import Courtyard
+
+from placer.analytic import free_position
+from placer.box import Box
+from placer.grid import Grid, Occupancy
+
+
+class AnnealPlacer(object):
+    '''Simulated annealing placer.
+
+    The cost of a placement is the half perimeter wire length of all nets
+    plus the overlap of the boxes and the area of their bounding box, all
+    in mm and mm^2 and scaled by weights.  A move shifts a box, swaps two
+    boxes or rotates a box by 90 degrees and only reevaluates the nets of
+    the moved insts, the cells of an Occupancy grid under the moved boxes
+    and the bounding box when a box on its boundary moves inward.
+
+    The temperature starts at initial_temperature, or a temperature at
+    which most uphill moves are accepted, and is multiplied by cooling
+    every steps moves.  Without cooling the temperature decays
+    exponentially to final_temperature times the initial temperature over
+    the move budget or the time limit, whichever runs out first.
+    Annealing stops after moves moves, after time_limit seconds or when the
+    temperature drops below final_temperature times the initial
+    temperature.  The result only depends on seed without a time limit.
+    Boxes that still overlap are moved to the closest free position.'''
+
+    def __init__(self, grid_size=Courtyard.IPC_GRID_SCALE, seed=0,
+                 moves=None, time_limit=None, initial_temperature=None,
+                 final_temperature=1e-3, cooling=None, steps=None,
+                 wirelength_weight=1, overlap_weight=10, area_weight=0.01,
+                 allow_rotate=True, start='random', verbose=False):
+        self.grid_size = grid_size
+        self.seed = seed
+        self.moves = moves
+        self.time_limit = time_limit
+        self.initial_temperature = initial_temperature
+        self.final_temperature = final_temperature
+        self.cooling = cooling
+        self.steps = steps
+        self.weights = (wirelength_weight, overlap_weight, area_weight)
+        self.allow_rotate = allow_rotate
+        self.start = start
+        self.verbose = verbose
+
+    def place(self, filein, fileout):
+        self.pcb = Pcb.from_file(filein)
+        if self.place_pcb(self.pcb):
+            self.pcb.to_file(fileout)
+        else:
+            print('unsat')
+
+    def place_pcb(self, pcb):
+        '''Places all insts of pcb.  Returns False when the insts don't fit
+        into the placement area.'''
+
+        self.pcb = pcb
+        self.random = random.Random(self.seed)
+        area = pcb.outline.polygon.interiors[0]
+        self.origin = np.array(area.bounds[:2])
+        self.occupancy = Occupancy.from_area(area, self.grid_size)
+        self.width = self.occupancy.width
+        self.height = self.occupancy.height
+
+        self.init_boxes()
+        self.init_nets()
+        if not self.init_positions():
+            return False
+
+        self.anneal()
+        if not self.legalize():
+            return False
+
+        for i, box in enumerate(self.boxes):
+            inst = box.inst
+            x, y = self.origin + np.array([box.x.value, box.y.value]) * \
+                self.grid_size - self.crtyd_min[self.rotation[i], i]
+            inst.attributes.place(inst.attributes.layer, x, y,
+                                  90 * self.rotation[i])
+
+        if self.verbose:
+            grid = Grid(self.width, self.height)
+            for box in self.boxes:
+                grid.add_box(box)
+            print(str(grid))
+        return True
+
+    def init_boxes(self):
+        '''Creates a Box for every inst and the offsets of the pads from
+        the lower left corner of the box for both rotations.'''
+
+        pads = self.pcb.pads
+        insts = pads.insts
+        self.boxes = [Box.from_inst(inst) for inst in insts]
+        self.size = np.array([[box.width, box.height] for box in self.boxes],
+                             dtype=float).reshape(-1, 2)
+        self.position = np.zeros((len(insts), 2))
+        self.rotation = np.zeros(len(insts), dtype=np.int64)
+
+        # Lower left corner of the courtyard and pad offsets for 0 and 90
+        # degrees
+        self.crtyd_min = np.zeros((2, len(insts), 2))
+        self.offset = np.zeros((2, len(pads), 2))
+        for r, angle in enumerate((0, 90)):
+            matrices = np.array([
+                Matrix.inst_matrix(0, 0, angle, inst.attributes.layer.flip)
+                for inst in insts]).reshape(-1, 3, 3)
+            crtyds = Matrix.transform_all(
+                [inst.device.package.courtyard.polygon for inst in insts],
+                matrices)
+            self.crtyd_min[r] = [crtyd.bounds[:2] for crtyd in crtyds]
+            local = np.einsum('nij,nj->ni', matrices[pads.inst], pads.local)
+            self.offset[r] = local[:, :2] - self.crtyd_min[r][pads.inst]
+
+    def init_nets(self):
+        pads = self.pcb.pads
+        self.net_pads = []
+        self.net_insts = []
+        inst_nets = [set() for inst in pads.insts]
+        for i in range(len(pads.nets)):
+            net_pads = pads.net_pads[pads.net_ptr[i]:pads.net_ptr[i + 1]]
+            if len(set(pads.inst[net_pads])) < 2:
+                continue
+            n = len(self.net_pads)
+            self.net_pads.append(net_pads)
+            self.net_insts.append(pads.inst[net_pads])
+            for inst in pads.inst[net_pads]:
+                inst_nets[inst].add(n)
+        self.inst_nets = [sorted(nets) for nets in inst_nets]
+        self.net_hpwl = np.zeros(len(self.net_pads))
+
+    def init_positions(self):
+        '''Places the boxes at random positions or keeps the current
+        positions of the insts when start is 'current'.'''
+
+        for i, box in enumerate(self.boxes):
+            if self.start == 'current' and \
+               box.inst.attributes.angle % 180 == 90:
+                self.rotate_box(i)
+            if not self.fits(box.width, box.height):
+                print('Error: %s does not fit on the board' % box.inst.name)
+                return False
+
+            if self.start == 'current':
+                attrs = box.inst.attributes
+                x, y = (np.array([attrs.x, attrs.y]) - self.origin +
+                        self.crtyd_min[self.rotation[i], i]) / self.grid_size
+                self.set_position(i, round(x), round(y))
+            else:
+                self.set_position(
+                    i, self.random.randint(0, self.width - box.width),
+                    self.random.randint(0, self.height - box.height))
+            self.occupancy.add_box(box)
+
+        for n in range(len(self.net_pads)):
+            self.net_hpwl[n] = self.hpwl(n)
+        self.total_hpwl = self.net_hpwl.sum()
+        self.bounds = self.scan_bounds()
+        self.cost = self.total_cost()
+        return True
+
+    def fits(self, width, height):
+        return width <= self.width and height <= self.height
+
+    def set_position(self, i, x, y):
+        box = self.boxes[i]
+        # Negative positions would wrap around in the Occupancy grid
+        if not self.fits(box.width, box.height):
+            raise ValueError('%s does not fit on the board' % box.inst.name)
+        x = min(max(x, 0), self.width - box.width)
+        y = min(max(y, 0), self.height - box.height)
+        box.set_position(x, y)
+        self.position[i] = (x, y)
+
+    def rotate_box(self, i):
+        box = self.boxes[i]
+        box.width, box.height = box.height, box.width
+        self.size[i] = (box.width, box.height)
+        self.rotation[i] = 1 - self.rotation[i]
+
+    def hpwl(self, n):
+        '''Returns the half perimeter wire length of the n-th net in mm.'''
+
+        insts = self.net_insts[n]
+        xy = self.position[insts] * self.grid_size + \
+            self.offset[self.rotation[insts], self.net_pads[n]]
+        return np.sum(np.ptp(xy, axis=0))
+
+    def scan_bounds(self):
+        '''Returns the bounding box (min_x, min_y, max_x, max_y) of all
+        boxes in grid units.'''
+
+        return tuple(np.min(self.position, axis=0)) + \
+            tuple(np.max(self.position + self.size, axis=0))
+
+    def update_bounds(self, undo):
+        '''Updates the bounding box after the boxes in undo moved.  All
+        boxes are only scanned when a box on the boundary moved inward.'''
+
+        b = self.bounds
+        for i, x, y, rotation in undo:
+            w, h = self.size[i]
+            if rotation != self.rotation[i]:
+                w, h = h, w
+            old = (x, y, x + w, y + h)
+            new = tuple(self.position[i]) + \
+                tuple(self.position[i] + self.size[i])
+            if (old[0] == b[0] and new[0] > old[0]) or \
+               (old[1] == b[1] and new[1] > old[1]) or \
+               (old[2] == b[2] and new[2] < old[2]) or \
+               (old[3] == b[3] and new[3] < old[3]):
+                self.bounds = self.scan_bounds()
+                return
+
+        for i, _, _, _ in undo:
+            x, y = self.position[i]
+            w, h = self.size[i]
+            b = (min(b[0], x), min(b[1], y), max(b[2], x + w),
+                 max(b[3], y + h))
+        self.bounds = b
+
+    def area(self):
+        '''Returns the area of the bounding box of all boxes in mm^2.'''
+
+        b = self.bounds
+        return (b[2] - b[0]) * (b[3] - b[1]) * self.grid_size ** 2
+
+    def total_cost(self):
+        return self.weights[0] * self.total_hpwl + \
+            self.weights[1] * self.occupancy.overlap * self.grid_size ** 2 + \
+            self.weights[2] * self.area()
+
+    def move(self, temperature_ratio):
+        '''Applies a random move and returns a list of (inst, x, y,
+        rotated) to undo it.'''
+
+        kind = self.random.random()
+        n = len(self.boxes)
+        if kind < 0.3 and n > 1:
+            i, j = self.random.sample(range(n), 2)
+            undo = [self.state(i), self.state(j)]
+            bi, bj = self.boxes[i], self.boxes[j]
+            # Swap the centers of the boxes
+            ci = (bi.x.value + bi.width / 2, bi.y.value + bi.height / 2)
+            cj = (bj.x.value + bj.width / 2, bj.y.value + bj.height / 2)
+            self.move_box(i, round(cj[0] - bi.width / 2),
+                          round(cj[1] - bi.height / 2))
+            self.move_box(j, round(ci[0] - bj.width / 2),
+                          round(ci[1] - bj.height / 2))
+        elif kind < 0.4 and self.allow_rotate:
+            i = self.random.randrange(n)
+            box = self.boxes[i]
+            if not self.fits(box.height, box.width):
+                # The rotated box doesn't fit on the board
+                return []
+            undo = [self.state(i)]
+            cx = box.x.value + box.width / 2
+            cy = box.y.value + box.height / 2
+            self.occupancy.remove_box(box)
+            self.rotate_box(i)
+            self.set_position(i, round(cx - box.width / 2),
+                              round(cy - box.height / 2))
+            self.occupancy.add_box(box)
+        else:
+            i = self.random.randrange(n)
+            undo = [self.state(i)]
+            box = self.boxes[i]
+            radius = max(1, int(max(self.width, self.height) *
+                                temperature_ratio))
+            self.move_box(i,
+                          box.x.value + self.random.randint(-radius, radius),
+                          box.y.value + self.random.randint(-radius, radius))
+        return undo
+
+    def state(self, i):
+        box = self.boxes[i]
+        return (i, box.x.value, box.y.value, self.rotation[i])
+
+    def move_box(self, i, x, y):
+        box = self.boxes[i]
+        self.occupancy.remove_box(box)
+        self.set_position(i, x, y)
+        self.occupancy.add_box(box)
+
+    def undo(self, undo):
+        for i, x, y, rotation in undo:
+            box = self.boxes[i]
+            self.occupancy.remove_box(box)
+            if self.rotation[i] != rotation:
+                self.rotate_box(i)
+            self.set_position(i, x, y)
+            self.occupancy.add_box(box)
+
+    def delta(self, undo):
+        '''Updates the nets of the moved insts and the bounding box.
+        Returns the state needed to restore them and the new cost.'''
+
+        nets = set()
+        for i, _, _, _ in undo:
+            nets.update(self.inst_nets[i])
+        nets = list(nets)
+        saved = (nets, self.net_hpwl[nets].copy(), self.total_hpwl,
+                 self.bounds)
+        for n in nets:
+            hpwl = self.hpwl(n)
+            self.total_hpwl += hpwl - self.net_hpwl[n]
+            self.net_hpwl[n] = hpwl
+        self.update_bounds(undo)
+        return saved, self.total_cost()
+
+    def restore(self, undo, saved):
+        '''Undoes a move and restores the state saved by delta.'''
+
+        self.undo(undo)
+        nets, old, self.total_hpwl, self.bounds = saved
+        self.net_hpwl[nets] = old
+
+    def anneal(self):
+        n = len(self.boxes)
+        moves = self.moves if self.moves is not None else 500 * n
+        steps = self.steps if self.steps is not None else max(n, 100)
+        start = time.time()
+
+        temperature = self.initial_temperature
+        if temperature is None:
+            temperature = self.sample_temperature()
+        initial = temperature
+
+        accepted = 0
+        for move in range(moves):
+            if move > 0 and move % steps == 0:
+                # Fraction of the move budget or time limit used
+                progress = move / moves
+                if self.time_limit is not None:
+                    elapsed = time.time() - start
+                    if elapsed > self.time_limit:
+                        break
+                    progress = max(progress, elapsed / self.time_limit)
+
+                if self.cooling is None:
+                    temperature = initial * self.final_temperature ** progress
+                else:
+                    temperature *= self.cooling
+                if self.verbose:
+                    print('temperature', temperature, 'cost', self.cost,
+                          'accepted', accepted / steps)
+                accepted = 0
+                if temperature < self.final_temperature * initial:
+                    break
+
+            undo = self.move(temperature / initial if initial > 0 else 0)
+            saved, cost = self.delta(undo)
+            delta = cost - self.cost
+            if delta <= 0 or (temperature > 0 and self.random.random() <
+                              math.exp(-delta / temperature)):
+                self.cost = cost
+                accepted += 1
+            else:
+                self.restore(undo, saved)
+
+    def sample_temperature(self, samples=100):
+        '''Returns a temperature at which uphill moves are accepted with a
+        probability of about 0.8.'''
+
+        uphill = []
+        for _ in range(samples):
+            undo = self.move(1)
+            saved, cost = self.delta(undo)
+            if cost > self.cost:
+                uphill.append(cost - self.cost)
+            self.restore(undo, saved)
+        if len(uphill) == 0:
+            return 1
+        return -np.mean(uphill) / math.log(0.8)
+
+    def legalize(self):
+        '''Moves boxes that overlap other boxes or blocked cells to the
+        closest free position.'''
+
+        overlapping = []
+        for i, box in enumerate(self.boxes):
+            if np.any(self.occupancy.cells(box) > 1):
+                overlapping.append(i)
+                self.occupancy.remove_box(box)
+        occupied = self.occupancy.count > 0
+
+        for i in overlapping:
+            box = self.boxes[i]
+            position = free_position(occupied, int(box.width),
+                                     int(box.height), self.position[i])
+            if position is None:
+                print('Error: No space left for %s' % box.inst.name)
+                return False
+            self.set_position(i, *position)
+            self.occupancy.add_box(box)
+            occupied = self.occupancy.count > 0
+        return True
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Annealing placement')
+
+    parser.add_argument('filein', type=str)
+    parser.add_argument('fileout', type=str)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--moves', type=int, default=None)
+    parser.add_argument('--time-limit', type=float, default=None)
+
+    args, unknown = parser.parse_known_args()
+
+    placer = AnnealPlacer(seed=args.seed, moves=args.moves,
+                          time_limit=args.time_limit)
+    placer.place(args.filein, args.fileout)
@@ -25,6 +25,15 @@ class Bin(object):
                                                self.area())
 
 
+class FixedBin(Bin):
+    '''A Bin of fixed size that can be used in place of a Z3Bin.'''
+
+    def __init__(self, width, height):
+        super().__init__(width, height)
+        self.var_width = IntVal(width)
+        self.var_height = IntVal(height)
+
+
 class Z3Bin(Bin):
     def __init__(self):
         super().__init__(0, 0)
@@ -88,17 +88,19 @@ class Box(object):
 
 class Z3Box(Box):
 
-    def __init__(self, inst, width, height):
+    def __init__(self, inst, width, height, name=None):
         super().__init__(inst, width, height, Anchor.Center, Anchor.Center)
 
         self.const_rx = int(math.ceil(width / 2))
         self.const_ry = int(math.ceil(height / 2))
 
-        self.var_x = Int('%s_x' % str(inst.uid))
-        self.var_y = Int('%s_y' % str(inst.uid))
-        self.var_rot = Bool('%s_rot' % str(inst.uid))
-        self.var_rx = Int('%s_rx' % str(inst.uid))
-        self.var_ry = Int('%s_ry' % str(inst.uid))
+        if name is None:
+            name = str(inst.uid)
+        self.var_x = Int('%s_x' % name)
+        self.var_y = Int('%s_y' % name)
+        self.var_rot = Bool('%s_rot' % name)
+        self.var_rx = Int('%s_rx' % name)
+        self.var_ry = Int('%s_ry' % name)
 
     def range_constraint(self, bin):
         return And(self.var_x >= self.var_rx,
@@ -1,4 +1,7 @@
 import math
+import numpy as np
+import shapely
+from shapely.geometry import Polygon
 
 
 class Grid(object):
@@ -25,3 +28,56 @@ class Grid(object):
             result += '|\n'
         result += '_' * (self.width + 2) + '\n'
         return result
+
+
+class Occupancy(object):
+    '''Number of boxes covering every cell of a grid.  Blocked cells count
+    as covered by one box.  Boxes have Anchor.Min coordinates in grid
+    units.'''
+
+    def __init__(self, width, height, blocked=None):
+        self.width = width
+        self.height = height
+        self.count = np.zeros((height, width), dtype=np.int64)
+        if blocked is not None:
+            self.count[blocked] = 1
+        self.overlap = 0
+
+    @classmethod
+    def from_area(cls, area, grid_size):
+        '''Returns the Occupancy of the bounding box of the polygon ring
+        area, with the cells outside of area blocked.'''
+
+        left, bottom, right, top = area.bounds
+        width = int((right - left) / grid_size)
+        height = int((top - bottom) / grid_size)
+
+        x, y = np.meshgrid(np.arange(width), np.arange(height))
+        x = left + x * grid_size
+        y = bottom + y * grid_size
+        cells = shapely.box(x, y, x + grid_size, y + grid_size)
+        area = Polygon(area)
+        shapely.prepare(area)
+        return cls(width, height, ~shapely.contains(area, cells))
+
+    def cells(self, box):
+        l, b = int(box.left()), int(box.bottom())
+        return self.count[b:b + int(box.height), l:l + int(box.width)]
+
+    def add_box(self, box):
+        '''Adds box and returns the increase of the overlap.'''
+
+        cells = self.cells(box)
+        delta = int(np.count_nonzero(cells))
+        cells += 1
+        self.overlap += delta
+        return delta
+
+    def remove_box(self, box):
+        '''Removes box and returns the decrease of the overlap.'''
+
+        cells = self.cells(box)
+        cells -= 1
+        delta = int(np.count_nonzero(cells))
+        self.overlap -= delta
+        return delta
@@ -0,0 +1,312 @@
+import math
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from shapely.geometry import Polygon, box
+from pycircuit.pcb import Pcb
+from pycircuit.package import Courtyard
+
+from placer.partition import RegionSolver, connectivity
+
+
+class Cluster(object):
+    '''The insts of a SubInst and the clusters of its SubInst's.  insts are
+    indices into the PadTable.  layout is the tuple (centers, size) of the
+    placed items, the insts followed by the children, relative to the lower
+    left corner of the cluster in grid units.'''
+
+    def __init__(self, name):
+        self.name = name
+        self.insts = []
+        self.children = []
+        self.layout = None
+
+    def all_insts(self):
+        return self.insts + [i for child in self.children
+                             for i in child.all_insts()]
+
+    def walk(self, depth=0):
+        '''Iterator over (depth, cluster) of the cluster and all clusters
+        below it in depth-first order.'''
+
+        yield depth, self
+        for child in self.children:
+            yield from child.walk(depth + 1)
+
+    def signature(self, pads):
+        '''Returns a key that is equal for clusters of the same circuit with
+        the same packages connected the same way.'''
+
+        numbering = {}
+
+        def inst_signature(i):
+            nets = tuple(-1 if net < 0 else
+                         numbering.setdefault(net, len(numbering))
+                         for net in pads.net[pads.by_inst(pads.insts[i])])
+            return (pads.insts[i].device.package.name, nets)
+
+        def signature(cluster):
+            return (cluster.name,
+                    tuple(inst_signature(i) for i in cluster.insts),
+                    tuple(signature(child) for child in cluster.children))
+
+        return signature(self)
+
+    def size(self):
+        return self.layout[1]
+
+    def __str__(self):
+        return '%s (%d insts)' % (self.name, len(self.all_insts()))
+
+
+def pack_cluster(sizes, adjacency, density, region_size, timeout):
+    '''Returns the centers of boxes of sizes (width, height) packed into a
+    bin of about density times their area and the size of their bounding
+    box or None.  The bin grows until the boxes fit.'''
+
+    area = sum(w * h for w, h in sizes) * density
+    width = max(int(math.ceil(math.sqrt(area))), max(w for w, _ in sizes))
+    height = max(int(math.ceil(area / width)), max(h for _, h in sizes))
+
+    solver = RegionSolver(sizes, adjacency, region_size, timeout, workers=1)
+    for attempt in range(10):
+        centers = solver.solve(width, height)
+        if centers is not None:
+            break
+        width = int(math.ceil(width * 1.2))
+        height = int(math.ceil(height * 1.2))
+    else:
+        return None
+
+    # Shrink the bin to the bounding box, sizes are even so that the
+    # centers of the clusters are on the grid
+    x0 = min(x - w // 2 for (x, _), (w, _) in zip(centers, sizes))
+    y0 = min(y - h // 2 for (_, y), (_, h) in zip(centers, sizes))
+    x1 = max(x + w // 2 for (x, _), (w, _) in zip(centers, sizes))
+    y1 = max(y + h // 2 for (_, y), (_, h) in zip(centers, sizes))
+    size = (x1 - x0 + (x1 - x0) % 2, y1 - y0 + (y1 - y0) % 2)
+    return [(x - x0, y - y0) for x, y in centers], size
+
+
+class HierarchicalPlacer(object):
+    '''Placer that follows the SubInst tree of the netlist.
+
+    The insts of every SubInst are placed as a cluster, innermost
+    SubInst's first.  Clusters of the same depth are placed in parallel
+    and a cluster is placed as a single box in the cluster of its parent.
+    The insts that are not part of a SubInst and the outermost clusters
+    are placed on the board.  Clusters of the same circuit with the same
+    packages connected the same way share one placement, so repeated
+    channels are only placed once.  Every placement is solved with a
+    RegionSolver.  Insts are not rotated.'''
+
+    def __init__(self, grid_size=Courtyard.IPC_GRID_SCALE, density=1.5,
+                 region_size=8, time_limit=60, workers=None):
+        assert density > 1
+        self.grid_size = grid_size
+        self.density = density
+        self.region_size = region_size
+        self.time_limit = time_limit
+        self.workers = workers
+
+    def place(self, filein, fileout):
+        self.pcb = Pcb.from_file(filein)
+        if self.place_pcb(self.pcb):
+            self.pcb.to_file(fileout)
+        else:
+            print('unsat')
+
+    def place_pcb(self, pcb):
+        '''Places all insts of pcb.  Returns False when the insts don't fit
+        into the placement area.'''
+
+        self.pcb = pcb
+        pads = pcb.pads
+        area = pcb.outline.polygon.interiors[0]
+        left, bottom, right, top = area.bounds
+        width = int((right - left) / self.grid_size)
+        height = int((top - bottom) / self.grid_size)
+
+        # Box sizes as in Z3Box, rounded up to an even number of cells
+        courtyards = [inst.device.package.courtyard for inst in pads.insts]
+        self.sizes = [(2 * int(math.ceil(c.ipc_width / 2)),
+                       2 * int(math.ceil(c.ipc_height / 2)))
+                      for c in courtyards]
+
+        root = self.clusters()
+        if not self.place_clusters(root):
+            return False
+
+        blocked = self.blocked(area)
+        for bin_width, bin_height in self.bins(root, width, height):
+            # Bins are centered on the board
+            x0, y0 = (width - bin_width) // 2, (height - bin_height) // 2
+            centers = self.solve(root, bin_width, bin_height,
+                                 [(r[0] - x0, r[1] - y0, r[2] - x0, r[3] - y0)
+                                  for r in blocked])
+            if centers is not None:
+                break
+            print('Warn: Insts don\'t fit into %sx%s' %
+                  (bin_width, bin_height))
+        else:
+            return False
+        root.layout = centers, (bin_width, bin_height)
+
+        positions = {}
+        self.positions(root, (x0, y0), positions)
+        for i, inst in enumerate(pads.insts):
+            b = courtyards[i].bounds
+            # Offset from the inst origin to the center of the courtyard
+            x, y = positions[i]
+            x = left + x * self.grid_size - (b[0] + b[2]) / 2
+            y = bottom + y * self.grid_size - (b[1] + b[3]) / 2
+            inst.attributes.place(inst.attributes.layer, x, y)
+        return True
+
+    def clusters(self):
+        '''Returns the root Cluster of the SubInst tree of the insts.'''
+
+        root = Cluster(self.pcb.netlist.name)
+        clusters = {(): root}
+        for i, inst in enumerate(self.pcb.pads.insts):
+            cluster = root
+            for depth, (uid, name) in enumerate(inst.subinsts):
+                path = inst.subinsts[:depth + 1]
+                if path not in clusters:
+                    clusters[path] = Cluster(name)
+                    cluster.children.append(clusters[path])
+                cluster = clusters[path]
+            cluster.insts.append(i)
+        return root
+
+    def items(self, cluster):
+        '''Returns the sizes of the items of cluster and their connection
+        weights.'''
+
+        sizes = [self.sizes[i] for i in cluster.insts] + \
+            [child.size() for child in cluster.children]
+        items = np.full(len(self.sizes), -1)
+        items[cluster.insts] = np.arange(len(cluster.insts))
+        for k, child in enumerate(cluster.children):
+            items[child.all_insts()] = len(cluster.insts) + k
+        adjacency = connectivity(self.pcb.pads, items=items,
+                                 num_items=len(sizes))
+        return sizes, adjacency
+
+    def place_clusters(self, root):
+        '''Places the clusters below root, deepest first.  Returns False
+        when a cluster can't be placed.'''
+
+        levels = {}
+        for depth, cluster in root.walk():
+            if depth > 0:
+                levels.setdefault(depth, []).append(cluster)
+
+        timeout = int(self.time_limit * 1000)
+        self.num_layouts = 0
+        executor = None
+        if self.workers != 1:
+            executor = ProcessPoolExecutor(self.workers)
+        try:
+            for depth in sorted(levels, reverse=True):
+                # Identical clusters share a placement
+                unique = {}
+                for cluster in levels[depth]:
+                    unique.setdefault(cluster.signature(self.pcb.pads),
+                                      []).append(cluster)
+                print('depth', depth, 'clusters', len(levels[depth]),
+                      'placed', len(unique))
+                self.num_layouts += len(unique)
+
+                jobs = []
+                for clusters in unique.values():
+                    sizes, adjacency = self.items(clusters[0])
+                    jobs.append((sizes, adjacency, self.density,
+                                 self.region_size, timeout))
+                if executor is None:
+                    layouts = [pack_cluster(*job) for job in jobs]
+                else:
+                    layouts = list(executor.map(pack_cluster, *zip(*jobs)))
+
+                for clusters, layout in zip(unique.values(), layouts):
+                    if layout is None:
+                        print('Error: Failed to place %s' % clusters[0])
+                        return False
+                    for cluster in clusters:
+                        cluster.layout = layout
+        finally:
+            if executor is not None:
+                executor.shutdown()
+        return True
+
+    def blocked(self, area):
+        '''Returns the grid rects (x0, y0, x1, y1) covering the parts of the
+        bounding box of area outside of area.'''
+
+        left, bottom, right, top = area.bounds
+        outside = box(*area.bounds).difference(Polygon(area))
+        rects = []
+        for polygon in getattr(outside, 'geoms', [outside]):
+            if polygon.is_empty:
+                continue
+            x0, y0, x1, y1 = polygon.bounds
+            rects.append((int(math.floor((x0 - left) / self.grid_size)),
+                          int(math.floor((y0 - bottom) / self.grid_size)),
+                          int(math.ceil((x1 - left) / self.grid_size)),
+                          int(math.ceil((y1 - bottom) / self.grid_size))))
+        return rects
+
+    def bins(self, root, width, height):
+        '''Returns the bins to try for the root cluster, a bin of density
+        times the area of its items with the aspect ratio of the board and
+        the whole board.'''
+
+        sizes, _ = self.items(root)
+        area = sum(w * h for w, h in sizes) * self.density
+        scale = math.sqrt(min(area / (width * height), 1))
+        return [(min(int(math.ceil(width * scale)), width),
+                 min(int(math.ceil(height * scale)), height)),
+                (width, height)]
+
+    def solve(self, cluster, width, height, blocked):
+        sizes, adjacency = self.items(cluster)
+        if any(w > width or h > height for w, h in sizes):
+            return None
+        solver = RegionSolver(sizes, adjacency, self.region_size,
+                              int(self.time_limit * 1000), self.workers,
+                              blocked)
+        return solver.solve(width, height)
+
+    def positions(self, cluster, offset, positions):
+        '''Sets positions[i] to the center of inst i in grid units.
+        offset is the lower left corner of cluster.'''
+
+        centers, _ = cluster.layout
+        items = cluster.insts + cluster.children
+        for item, (x, y) in zip(items, centers):
+            x, y = x + offset[0], y + offset[1]
+            if isinstance(item, Cluster):
+                w, h = item.size()
+                self.positions(item, (x - w // 2, y - h // 2), positions)
+            else:
+                positions[item] = (x, y)
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description='Hierarchical placement following the SubInst tree')
+
+    parser.add_argument('filein', type=str)
+    parser.add_argument('fileout', type=str)
+
+    parser.add_argument('--region-size', type=int, default=8)
+    parser.add_argument('--time-limit', type=float, default=60)
+    parser.add_argument('--workers', type=int, default=None)
+
+    args, unknown = parser.parse_known_args()
+
+    placer = HierarchicalPlacer(region_size=args.region_size,
+                                time_limit=args.time_limit,
+                                workers=args.workers)
+    placer.place(args.filein, args.fileout)
@@ -0,0 +1,230 @@
+import numpy as np
+import scipy.sparse as sp
+from concurrent.futures import ProcessPoolExecutor
+from scipy.sparse.linalg import eigsh
+from z3 import *
+from placer.bin import FixedBin
+from placer.box import Z3Box
+
+
+class Region(object):
+    '''A rectangle of the placement area in grid units and the insts
+    placed in it.  index are the indices of the insts, children the two
+    regions the region is split into.'''
+
+    def __init__(self, index, bounds, children=()):
+        self.index = index
+        self.bounds = bounds
+        self.children = list(children)
+
+    def width(self):
+        return self.bounds[2] - self.bounds[0]
+
+    def height(self):
+        return self.bounds[3] - self.bounds[1]
+
+    def leaves(self):
+        if len(self.children) == 0:
+            return [self]
+        return [leaf for child in self.children for leaf in child.leaves()]
+
+    def __str__(self):
+        return '%s insts in %s' % (len(self.index), self.bounds)
+
+
+def connectivity(pads, max_degree=100, items=None, num_items=None):
+    '''Returns a sparse matrix of the connection weights between insts.  A
+    net connecting k insts adds a clique of weight 1 / (k - 1).  Nets with
+    more than max_degree insts are ignored, they connect everything.
+
+    items maps every inst to the index of the item it is part of or -1,
+    the weights are then between the num_items items.'''
+
+    inst_item = pads.inst if items is None else np.asarray(items)[pads.inst]
+    rows, cols, weights = [], [], []
+    for i in range(len(pads.nets)):
+        net_pads = pads.net_pads[pads.net_ptr[i]:pads.net_ptr[i + 1]]
+        insts = np.unique(inst_item[net_pads])
+        insts = insts[insts >= 0]
+        k = len(insts)
+        if k < 2 or k > max_degree:
+            continue
+        a, b = np.triu_indices(k, 1)
+        rows += [insts[a], insts[b]]
+        cols += [insts[b], insts[a]]
+        weights += [np.full(2 * len(a), 1 / (k - 1))]
+
+    n = len(pads.insts) if items is None else num_items
+    if len(rows) == 0:
+        return sp.csr_matrix((n, n))
+    return sp.csr_matrix((np.concatenate(weights),
+                          (np.concatenate(rows), np.concatenate(cols))),
+                         shape=(n, n))
+
+
+def bisect(adjacency, area, index):
+    '''Splits the insts index into two halves of equal area with few
+    connections between them.  The insts are ordered by the Fiedler vector
+    of the Laplacian of their connectivity (spectral bisection).'''
+
+    if len(index) > 2:
+        a = adjacency[index][:, index]
+        laplacian = sp.diags(np.asarray(a.sum(axis=1)).ravel()) - a
+        if len(index) <= 200:
+            _, vectors = np.linalg.eigh(laplacian.toarray())
+        else:
+            # Shift to keep the Laplacian nonsingular for shift-invert
+            _, vectors = eigsh(laplacian + 1e-6 * sp.identity(len(index)),
+                               k=2, sigma=0, which='LM')
+        # Break ties of equal entries by the order of the insts
+        order = np.lexsort((index, np.round(vectors[:, 1], 12)))
+        index = index[order]
+
+    cumulative = np.cumsum(area[index])
+    split = np.searchsorted(cumulative, cumulative[-1] / 2) + 1
+    split = min(max(split, 1), len(index) - 1)
+    return index[:split], index[split:]
+
+
+def partition(adjacency, area, index, bounds, region_size):
+    '''Returns a tree of Region's that recursively bisects the insts index
+    and the rectangle bounds until every region has at most region_size
+    insts.  The rectangle is cut across its longer side in proportion to
+    the area of the insts on both sides.'''
+
+    if len(index) <= region_size:
+        return Region(index, bounds)
+
+    low, high = bisect(adjacency, area, index)
+    x0, y0, x1, y1 = bounds
+    fraction = area[low].sum() / area[index].sum()
+    if x1 - x0 >= y1 - y0:
+        cut = min(max(int(round(x0 + fraction * (x1 - x0))), x0 + 1), x1 - 1)
+        low_bounds, high_bounds = (x0, y0, cut, y1), (cut, y0, x1, y1)
+    else:
+        cut = min(max(int(round(y0 + fraction * (y1 - y0))), y0 + 1), y1 - 1)
+        low_bounds, high_bounds = (x0, y0, x1, cut), (x0, cut, x1, y1)
+
+    return Region(index, bounds, [
+        partition(adjacency, area, low, low_bounds, region_size),
+        partition(adjacency, area, high, high_bounds, region_size)])
+
+
+def overlap_constraints(num_boxes):
+    return num_boxes * (num_boxes - 1) // 2
+
+
+def clip(rects, bounds):
+    '''Returns the rects (x0, y0, x1, y1) that intersect bounds clipped to
+    bounds and relative to its lower left corner.'''
+
+    x0, y0, x1, y1 = bounds
+    clipped = []
+    for r in rects:
+        r = (max(r[0], x0), max(r[1], y0), min(r[2], x1), min(r[3], y1))
+        if r[0] < r[2] and r[1] < r[3]:
+            clipped.append((r[0] - x0, r[1] - y0, r[2] - x0, r[3] - y0))
+    return clipped
+
+
+def solve_region(sizes, width, height, timeout, blocked=()):
+    '''Returns the centers (x, y) of boxes of sizes (width, height) placed
+    without overlap in a bin of width * height or None.  The boxes don't
+    overlap the blocked rects (x0, y0, x1, y1).  timeout is in
+    milliseconds.'''
+
+    bin = FixedBin(width, height)
+    boxes = [Z3Box(None, w, h, name='box%d' % i)
+             for i, (w, h) in enumerate(sizes)]
+
+    s = Solver()
+    s.set('timeout', timeout)
+    for i, box in enumerate(boxes):
+        s.add(box.rotation_constraint())
+        s.add(box.range_constraint(bin))
+        for j in range(i):
+            s.add(box.overlap_constraint(boxes[j]))
+        for x0, y0, x1, y1 in blocked:
+            s.add(Or(box.var_x + box.var_rx <= x0,
+                     box.var_x - box.var_rx >= x1,
+                     box.var_y + box.var_ry <= y0,
+                     box.var_y - box.var_ry >= y1))
+
+    if s.check() != sat:
+        return None
+    model = s.model()
+    return [(model[box.var_x].as_long(), model[box.var_y].as_long())
+            for box in boxes]
+
+
+class RegionSolver(object):
+    '''Places boxes of sizes (width, height) without overlap by solving
+    regions of at most region_size boxes independently.
+
+    The boxes are split into regions by recursive spectral bisection of
+    adjacency and every region gets a disjoint part of the bin in
+    proportion to the area of its boxes.  Overlap constraints are only
+    needed between boxes of the same region, so the regions are solved in
+    parallel by workers processes.  When a region is unsat its parent
+    region is solved instead.  timeout is in milliseconds per region.
+    blocked are rects (x0, y0, x1, y1) of the bin that are not available
+    for placement.'''
+
+    def __init__(self, sizes, adjacency, region_size=8, timeout=60000,
+                 workers=None, blocked=()):
+        self.sizes = sizes
+        self.adjacency = adjacency
+        self.region_size = region_size
+        self.timeout = timeout
+        self.workers = workers
+        self.blocked = blocked
+        self.num_regions = 0
+        self.num_constraints = 0
+
+    def solve_regions(self, regions):
+        jobs = [([self.sizes[i] for i in region.index], region.width(),
+                 region.height(), self.timeout,
+                 clip(self.blocked, region.bounds)) for region in regions]
+        self.num_constraints += sum(overlap_constraints(len(region.index))
+                                    for region in regions)
+        if self.workers == 1 or len(jobs) < 2:
+            return [solve_region(*job) for job in jobs]
+        with ProcessPoolExecutor(self.workers) as executor:
+            return list(executor.map(solve_region, *zip(*jobs)))
+
+    def solve(self, width, height):
+        '''Returns the centers of the boxes in a bin of width * height or
+        None.'''
+
+        area = np.array([w * h for w, h in self.sizes], dtype=float)
+        root = partition(self.adjacency, area, np.arange(len(self.sizes)),
+                         (0, 0, width, height), self.region_size)
+        leaves = root.leaves()
+        self.num_regions = len(leaves)
+        self.num_constraints = 0
+        solved = dict(zip(map(id, leaves), self.solve_regions(leaves)))
+
+        def solve(region):
+            '''Returns a dict of the box indices of region to their centers
+            or None.'''
+
+            if len(region.children) == 0:
+                centers = solved[id(region)]
+            else:
+                children = [solve(child) for child in region.children]
+                if all(child is not None for child in children):
+                    return {i: c for child in children
+                            for i, c in child.items()}
+                print('Warn: Region with %s is unsat, solving parent' %
+                      region.children[children.index(None)])
+                centers = self.solve_regions([region])[0]
+            if centers is None:
+                return None
+            x0, y0 = region.bounds[:2]
+            return {i: (x + x0, y + y0)
+                    for i, (x, y) in zip(region.index, centers)}
+
+        centers = solve(root)
+        if centers is None:
+            return None
+        return [centers[i] for i in range(len(self.sizes))]
@@ -1,18 +1,30 @@
+import math
+import time
+import numpy as np
 from pycircuit.pcb import Pcb
 from pycircuit.package import Courtyard
 from pycircuit.formats import json
 
 from z3 import *
 from placer.box import Z3Box
-from placer.bin import Z3Bin
+from placer.bin import Bin, Z3Bin
 from placer.grid import Grid
+from placer.partition import RegionSolver, connectivity, overlap_constraints
 
 
 class Placer(object):
-    def __init__(self, grid_size=Courtyard.IPC_GRID_SCALE, density=1.5):
+    def __init__(self, grid_size=Courtyard.IPC_GRID_SCALE, density=1.5,
+                 optimize=False, time_limit=60, partition=False,
+                 region_size=8, workers=None):
         assert density > 1
         self.grid_size = grid_size
         self.density = density
+        self.optimize = optimize
+        self.time_limit = time_limit
+        self.partition = partition
+        self.region_size = region_size
+        self.workers = workers
+        self.trajectory = []
 
     def place(self, filein, fileout):
         self.pcb = Pcb.from_file(filein)
@@ -29,6 +41,24 @@ class Placer(object):
             min_area += box.area()
             boxes.append(box)
 
+        if self.partition:
+            # Bin of density times the area of the boxes with the aspect
+            # ratio of the board, the whole board if that is too small
+            scale = math.sqrt(min(min_area * self.density / (width * height),
+                                  1))
+            bins = [Bin(min(int(math.ceil(width * scale)), int(width)),
+                        min(int(math.ceil(height * scale)), int(height))),
+                    Bin(int(width), int(height))]
+            for bin in bins:
+                print(str(bin))
+                if self.place_regions(boxes, bin):
+                    self.place_boxes(boxes, (left, top), bin)
+                    self.pcb.to_file(fileout)
+                    return
+                print('Warn: Insts don\'t fit into the bin')
+            print('unsat')
+            return
+
         pcb = Z3Bin()
 
         s = Solver()
@@ -51,26 +81,150 @@ class Placer(object):
 
         # s.add(boxes[0].fix_position_constraint(*pcb.var_center()))
 
-        if s.check() == sat:
+        if self.optimize:
+            model = self.minimize(s, pcb, boxes, min_area)
+        elif s.check() == sat:
             model = s.model()
+        else:
+            model = None
 
+        if model is not None:
             pcb.eval(model)
             print(str(pcb))
 
-            grid = Grid(*pcb.dim())
-
             for box in boxes:
                 box.eval(model)
-                print(str(box))
-                grid.add_box(box)
-                box.place_inst((left, top), self.grid_size)
-
-            print(str(grid))
+            self.place_boxes(boxes, (left, top), pcb)
 
             self.pcb.to_file(fileout)
         else:
             print('unsat')
 
+    def place_boxes(self, boxes, offset, bin):
+        grid = Grid(*bin.dim())
+
+        for box in boxes:
+            print(str(box))
+            grid.add_box(box)
+            box.place_inst(offset, self.grid_size)
+
+        print(str(grid))
+
+    def place_regions(self, boxes, bin):
+        '''Places the boxes without a global solver.  The insts are split
+        into regions of at most region_size insts by recursive spectral
+        bisection of the netlist and every region gets a disjoint part of
+        the bin in proportion to the area of its insts.  Overlap constraints
+        are only needed between boxes of the same region, so the regions
+        are solved independently in parallel.  When a region is unsat its
+        parent region is solved instead.  Returns False when the root
+        region is unsat.'''
+
+        sizes = [(box.const_rx * 2, box.const_ry * 2) for box in boxes]
+        solver = RegionSolver(sizes, connectivity(self.pcb.pads),
+                              self.region_size, int(self.time_limit * 1000),
+                              self.workers)
+        centers = solver.solve(*bin.dim())
+        self.num_constraints = solver.num_constraints
+        print('regions', solver.num_regions, 'overlap constraints',
+              self.num_constraints, 'instead of',
+              overlap_constraints(len(boxes)))
+
+        if centers is None:
+            return False
+        for box, (x, y) in zip(boxes, centers):
+            box.set_position(x, y)
+        return True
+
+    def wirelength(self, boxes):
+        '''Returns an expression for the total half perimeter wire length
+        of all nets in grid units and the constraints that bound the pads
+        of every net.  The pad offsets are only valid for unrotated insts,
+        so the constraints also forbid rotation.'''
+
+        pads = self.pcb.pads
+        # Pad offsets from the inst origin in grid units
+        offset = np.round(pads.local[:, :2] / self.grid_size).astype(int)
+
+        total = []
+        constraints = [Not(box.var_rot) for box in boxes]
+        for i, net in enumerate(pads.nets):
+            net_pads = pads.net_pads[pads.net_ptr[i]:pads.net_ptr[i + 1]]
+            if len(set(pads.inst[net_pads])) < 2:
+                continue
+
+            bounds = [Int('net%d_%s' % (i, b)) for b in
+                      ('min_x', 'min_y', 'max_x', 'max_y')]
+            min_x, min_y, max_x, max_y = bounds
+            for k in net_pads:
+                box = boxes[pads.inst[k]]
+                x = box.var_x + int(offset[k, 0])
+                y = box.var_y + int(offset[k, 1])
+                constraints += [min_x <= x, x <= max_x, min_y <= y, y <= max_y]
+            total.append(max_x - min_x + max_y - min_y)
+        return Sum(total) if len(total) > 0 else IntVal(0), constraints
+
+    def check(self, s, deadline):
+        remaining = deadline - time.time()
+        if remaining <= 0:
+            return unknown
+        s.set('timeout', max(int(remaining * 1000), 1))
+        return s.check()
+
+    def tighten(self, s, objective, model, lower, deadline, phase):
+        '''Binary searches the smallest upper bound of objective for which s
+        is satisfiable.  Returns the best model and its objective.'''
+
+        best = model.eval(objective).as_long()
+        self.record(phase, best, sat, best)
+        while lower < best:
+            bound = (lower + best) // 2
+            s.push()
+            s.add(objective <= bound)
+            result = self.check(s, deadline)
+            if result == sat:
+                model = s.model()
+                best = model.eval(objective).as_long()
+            elif result == unsat:
+                lower = bound + 1
+            s.pop()
+            self.record(phase, bound, result, best)
+            if result == unknown:
+                break
+        return model, best
+
+    def record(self, phase, bound, result, best):
+        step = (time.time() - self.start, phase, bound, str(result), best)
+        self.trajectory.append(step)
+        print('%8.3fs %s <= %s: %s, best %s' % step)
+
+    def minimize(self, s, pcb, boxes, min_area):
+        '''Finds a placement that minimizes the bin area and then the total
+        half perimeter wire length within the time limit.  Returns the best
+        model found or None.  The bounds that were checked are recorded
+        in the trajectory as (seconds, objective, bound, result, best).'''
+
+        self.start = time.time()
+        deadline = self.start + self.time_limit
+        self.trajectory = []
+
+        if self.check(s, deadline) != sat:
+            return None
+        model = s.model()
+
+        # Half of the time is left for the wire length
+        model, area = self.tighten(s, pcb.var_area, model,
+                                   int(math.ceil(min_area)),
+                                   self.start + self.time_limit / 2, 'area')
+        s.add(pcb.var_area <= area)
+
+        hpwl, constraints = self.wirelength(boxes)
+        s.add(constraints)
+        if self.check(s, deadline) != sat:
+            return model
+        model, _ = self.tighten(s, hpwl, s.model(), 0, deadline, 'hpwl')
+        return model
+
 
 if __name__ == '__main__':
     import argparse
@@ -81,7 +235,17 @@ if __name__ == '__main__':
     parser.add_argument('filein', type=str)
     parser.add_argument('fileout', type=str)
 
+    parser.add_argument('--optimize', action='store_true',
+                        help='Minimize area and wire length')
+    parser.add_argument('--time-limit', type=float, default=60)
+    parser.add_argument('--partition', action='store_true',
+                        help='Solve regions of the netlist independently')
+    parser.add_argument('--region-size', type=int, default=8)
+    parser.add_argument('--workers', type=int, default=None)
+
     args, unknown = parser.parse_known_args()
 
-    placer = Placer()
+    placer = Placer(optimize=args.optimize, time_limit=args.time_limit,
+                    partition=args.partition, region_size=args.region_size,
+                    workers=args.workers)
     placer.place(args.filein, args.fileout)
@@ -12,8 +12,8 @@ def netlistsvg(filein, fileout):
     os.system('netlistsvg --skin %s %s -o %s' % (skin, filein, fileout))
 
 
-def default_compile(filein, fileout):
-    compiler = Compiler()
+def default_compile(filein, fileout, pin_cache=None):
+    compiler = Compiler(pin_cache=pin_cache)
     return compiler.compile(filein, fileout)
 
 
@@ -41,7 +41,11 @@ class Builder(object):
                  compile=default_compile,
                  place=default_place,
                  route=default_route,
-                 post_process=default_post_process):
+                 post_process=default_post_process,
+                 pin_cache=None):
+        '''pin_cache is the path of a file that keeps pin assignments
+        across builds.  It is passed to the compile hook when set.'''
+
         self.base_file_name = string_to_filename(circuit.name)
         self.builddir = builddir
         self.files = {
@@ -70,6 +74,7 @@ class Builder(object):
         self.place_hook = place
         self.route_hook = route
         self.post_process_hook = post_process
+        self.pin_cache = pin_cache
 
     def file_hash(self, path):
         try:
@@ -134,7 +139,13 @@ class Builder(object):
         self.read_hashfile()
         self.circuit.to_file(self.files['net_in'])
 
-        run, circuit = self.step('net_in', 'net_out', self.compile_hook)
+        compile = self.compile_hook
+        if self.pin_cache is not None:
+            def compile(filein, fileout):
+                return self.compile_hook(filein, fileout,
+                                         pin_cache=self.pin_cache)
+
+        run, circuit = self.step('net_in', 'net_out', compile)
         if not run:
             circuit = Circuit.from_file(self.files['net_out'])
 
@@ -19,12 +19,17 @@ class UID(object):
 class CircuitElement(object):
     '''Abstract base class for circuit elements.'''
 
+    __slots__ = ('parent', 'uid', 'guid', 'name', 'assigns')
+
+    # Constructor of the assigns container
+    _assigns = list
+
     def __init__(self, name, _parent=None, _uid=None, _guid=None):
         self.parent = _parent
         self.uid = _uid
         self.guid = _guid
         self.name = name
-        self.assigns = []
+        self.assigns = self._assigns()
 
         if self.uid is None:
             self.uid = UID.uid()
@@ -66,6 +71,8 @@ class NetType(Enum):
 
 
 class Net(CircuitElement):
+    __slots__ = ('type', 'attributes')
+
     def __init__(self, name, _parent=None, _uid=None, _guid=None):
         super().__init__(name, _parent, _uid, _guid)
         self.type = NetType.SIGNAL
@@ -118,6 +125,8 @@ class PortType(Enum):
 
 
 class Port(CircuitElement):
+    __slots__ = ('type', 'internal', 'external')
+
     def __init__(self, name, type, _parent=None, _uid=None, _guid=None):
         super().__init__(name, _parent, _uid, _guid)
         self.type = type
@@ -163,11 +172,17 @@ class Port(CircuitElement):
 
 
 class Inst(CircuitElement):
+    __slots__ = ('component', 'value', 'device', 'attributes', 'horizontal',
+                 'subinsts')
+
     def __init__(self, component, value=None,
                  _parent=None, _uid=None, _guid=None):
         self.set_component(component)
         self.set_value(value)
         self.device = None
+        # (uid, circuit name) of the SubInst's the inst is part of, from the
+        # outermost to the innermost.  Survives flattening of the circuit.
+        self.subinsts = ()
         super().__init__(self.component.name, _parent, _uid, _guid)
 
     def set_component(self, component):
@@ -214,6 +229,8 @@ class Inst(CircuitElement):
         obj['assigns'] = [assign.to_object() for assign in self.assigns]
         if self.device is not None:
             obj['device'] = self.device.name
+        if len(self.subinsts) > 0:
+            obj['subinsts'] = [list(subinst) for subinst in self.subinsts]
         return obj
 
     @classmethod
@@ -223,12 +240,20 @@ class Inst(CircuitElement):
         inst.name = obj['name']
         if 'device' in obj:
             inst.device = Device.device_by_name(obj['device'])
+        if 'subinsts' in obj:
+            inst.subinsts = tuple(tuple(subinst)
+                                  for subinst in obj['subinsts'])
         for assign in obj['assigns']:
             InstAssign.from_object(assign, parent, inst)
         return inst
 
 
 class Assign(CircuitElement):
+    __slots__ = ('net', 'erc_type')
+
+    # Assign's don't have assigns, so they share the empty tuple
+    _assigns = tuple
+
     def __init__(self, net, _parent=None, _uid=None, _guid=None):
         super().__init__(None, _parent, _uid, _guid)
         assert isinstance(net, Net)
@@ -244,6 +269,8 @@ class Assign(CircuitElement):
 
 
 class InstAssign(Assign):
+    __slots__ = ('inst', 'function', 'pin', 'type')
+
     def __init__(self, inst, function, net,
                  _parent=None, _uid=None, _guid=None):
         assert isinstance(inst, Inst)
@@ -288,6 +315,8 @@ class InstAssign(Assign):
 
 
 class PortAssign(Assign):
+    __slots__ = ('port', 'type')
+
     def __init__(self, port, net, external=False,
                  _parent=None, _uid=None, _guid=None):
         assert isinstance(port, Port)
@@ -327,6 +356,9 @@ class Netlist(object):
         self.nets = []
         self.assigns = []
 
+        # uid -> element indexes, kept up to date by the add_* methods
+        self._uids = {'inst': {}, 'net': {}}
+
     def add_circuit_element(self, elem):
         if isinstance(elem, Inst):
             self.add_inst(elem)
@@ -342,24 +374,28 @@ class Netlist(object):
     def add_inst(self, inst):
         inst.parent = self
         self.insts.append(inst)
+        self.index_uid('inst', inst)
 
     def add_net(self, net):
         net.parent = self
         self.nets.append(net)
+        self.index_uid('net', net)
 
     def add_assign(self, assign):
         assign.parent = self
         self.assigns.append(assign)
 
+    def index_uid(self, kind, elem):
+        '''Adds elem to the uid index of kind.  The first element
+        added with a uid wins.'''
+
+        self._uids[kind].setdefault(elem.uid, elem)
+
     def inst_by_uid(self, uid):
-        for inst in self.iter_insts():
-            if inst.uid == uid:
-                return inst
+        return self._uids['inst'].get(uid)
 
     def net_by_uid(self, uid):
-        for net in self.iter_nets():
-            if net.uid == uid:
-                return net
+        return self._uids['net'].get(uid)
 
     def iter_insts(self):
         return iter(self.insts)
@@ -413,6 +449,14 @@ class Circuit(Netlist):
         self.ports = []
         self.port_assigns = []
 
+        # Ports are indexed by uid through the hierarchy, by name and
+        # subinsts by uid only in this circuit
+        self._uids['port'] = {}
+        self._subinsts_by_uid = {}
+        self._ports_by_name = {}
+
+        self._hierarchy = None
+
     def add_circuit_element(self, elem):
         if isinstance(elem, SubInst):
             self.add_subinst(elem)
@@ -422,33 +466,66 @@ class Circuit(Netlist):
             self.add_port_assign(elem)
         else:
             super().add_circuit_element(elem)
+        self.invalidate()
 
     def add_subinst(self, subinst):
         subinst.parent = self
         self.subinsts.append(subinst)
+        self._subinsts_by_uid.setdefault(subinst.uid, subinst)
+
+        # Make the elements of the subcircuit visible to this circuit
+        for kind, uids in subinst.circuit._uids.items():
+            for elem in uids.values():
+                self.index_uid(kind, elem)
+        subinst.circuit.parent = self
+
+        for inst in subinst.circuit.iter_insts():
+            inst.subinsts = ((subinst.uid, subinst.circuit.name),) + \
+                inst.subinsts
 
     def add_port(self, port):
         port.parent = self
         self.ports.append(port)
+        self._ports_by_name.setdefault(port.name, port)
+        self.index_uid('port', port)
 
     def add_port_assign(self, port_assign):
         port_assign.parent = self
         self.port_assigns.append(port_assign)
 
+    def replace_ports_and_nets(self, ports, nets):
+        '''Replaces the ports and nets of the circuit and reindexes them.
+        The elements keep their parents.'''
+
+        self.ports = list(ports)
+        self.nets = list(nets)
+
+        self._ports_by_name = {}
+        self._uids['port'] = {}
+        self._uids['net'] = {}
+        for port in self.ports:
+            self._ports_by_name.setdefault(port.name, port)
+            self.index_uid('port', port)
+        for net in self.nets:
+            self.index_uid('net', net)
+        self.invalidate()
+
+    def index_uid(self, kind, elem):
+        '''Adds elem to the uid index of kind in this circuit and all
+        circuits it is a subcircuit of.'''
+
+        super().index_uid(kind, elem)
+        if self.parent is not None:
+            self.parent.index_uid(kind, elem)
+
     def subinst_by_uid(self, uid):
-        for subinst in self.subinsts:
-            if subinst.uid == uid:
-                return subinst
+        return self._subinsts_by_uid.get(uid)
 
     def port_by_uid(self, uid):
-        for port in self.iter_ports():
-            if port.uid == uid:
-                return port
+        return self._uids['port'].get(uid)
 
     def port_by_name(self, name):
-        for port in self.ports:
-            if port.name == name:
-                return port
+        return self._ports_by_name.get(name)
 
     def external_ports(self):
         for port in self.iter_ports():
@@ -467,25 +544,34 @@ class Circuit(Netlist):
                 guids.add(port.guid)
                 yield port.guid
 
+    def hierarchy(self):
+        '''Returns the flattened Hierarchy of the circuit.  It is built on
+        first use and reused until an element is added.'''
+
+        if self._hierarchy is None:
+            self._hierarchy = Hierarchy(self)
+        return self._hierarchy
+
+    def invalidate(self):
+        '''Drops the cached Hierarchy of the circuit and of all circuits
+        it is a subcircuit of.  Needs to be called when the element lists
+        are modified directly.'''
+
+        # A cached parent Hierarchy implies a cached Hierarchy here
+        if self._hierarchy is None:
+            return
+        self._hierarchy = None
+        if self.parent is not None:
+            self.parent.invalidate()
+
     def iter_insts(self):
-        for inst in self.insts:
-            yield inst
-        for subinst in self.iter_subinsts():
-            for inst in subinst.circuit.insts:
-                yield inst
+        return iter(self.hierarchy().insts)
 
     def iter_subinsts(self):
-        for subinst in self.subinsts:
-            yield subinst
-            for subinst in subinst.circuit.iter_subinsts():
-                yield subinst
+        return iter(self.hierarchy().subinsts)
 
     def iter_nets(self):
-        for net in self.nets:
-            yield net
-        for subinst in self.iter_subinsts():
-            for net in subinst.circuit.nets:
-                yield net
+        return iter(self.hierarchy().nets)
 
     def assigned_nets(self):
         for net in self.iter_nets():
@@ -493,25 +579,13 @@ class Circuit(Netlist):
                 yield net
 
     def iter_ports(self):
-        for port in self.ports:
-            yield port
-        for subinst in self.iter_subinsts():
-            for port in subinst.circuit.ports:
-                yield port
+        return iter(self.hierarchy().ports)
 
     def iter_assigns(self):
-        for assign in self.assigns:
-            yield assign
-        for subinst in self.iter_subinsts():
-            for assign in subinst.circuit.assigns:
-                yield assign
+        return iter(self.hierarchy().assigns)
 
     def iter_port_assigns(self):
-        for assign in self.port_assigns:
-            yield assign
-        for subinst in self.iter_subinsts():
-            for assign in subinst.circuit.port_assigns:
-                yield assign
+        return iter(self.hierarchy().port_assigns)
 
     def __repr__(self):
         subdesign = 'subdesign {\n'
@@ -550,6 +624,26 @@ class Circuit(Netlist):
         return circuit
 
 
+class Hierarchy(object):
+    '''A flattened snapshot of a Circuit and all of it's subcircuits.
+    Elements are listed circuit by circuit, starting with the circuit
+    itself followed by it's SubInst's in depth-first order.'''
+
+    def __init__(self, circuit):
+        self.subinsts = []
+        for subinst in circuit.subinsts:
+            self.subinsts.append(subinst)
+            self.subinsts += subinst.circuit.hierarchy().subinsts
+
+        circuits = [circuit] + [subinst.circuit for subinst in self.subinsts]
+        self.insts = [inst for c in circuits for inst in c.insts]
+        self.nets = [net for c in circuits for net in c.nets]
+        self.ports = [port for c in circuits for port in c.ports]
+        self.assigns = [assign for c in circuits for assign in c.assigns]
+        self.port_assigns = [assign for c in circuits
+                             for assign in c.port_assigns]
+
+
 class ERCType(Enum):
     INPUT, OUTPUT, UNKNOWN = range(3)
 
@@ -600,11 +694,12 @@ class ERCType(Enum):
 
 
 class SubInst(CircuitElement):
+    __slots__ = ('circuit',)
+
     def __init__(self, circuit, _parent=None, _uid=None, _guid=None):
-        super().__init__(None, _parent, _uid, _guid)
-        self.name = circuit.name
+        # The parent circuit indexes the subcircuit when the SubInst is added
         self.circuit = circuit
-        circuit.parent = self.parent
+        super().__init__(circuit.name, _parent, _uid, _guid)
 
     def __setitem__(self, port_name, to):
         if isinstance(port_name, tuple):
@@ -0,0 +1,263 @@
+import numpy as np
+from pycircuit.circuit import Netlist, ERCType
+from pycircuit.component import Component, PinType
+from pycircuit.device import Device
+
+
+def _csr(keys, size):
+    '''Returns the (ptr, indices) arrays of a compressed sparse row
+    adjacency from key to the positions of keys.'''
+
+    indices = np.argsort(keys, kind='stable')
+    counts = np.bincount(keys, minlength=size)
+    ptr = np.zeros(size + 1, dtype=np.int64)
+    np.cumsum(counts, out=ptr[1:])
+    return ptr, indices
+
+
+def _code(value):
+    '''Returns the integer code of an enum value or -1 for None.'''
+
+    return -1 if value is None else value.value
+
+
+class ColumnarNetlist(object):
+    '''Array-backed representation of a Netlist.
+
+    Insts, nets and assigns are stored as columns in NumPy arrays.  Every
+    assign has the index of it's net and inst and the id of it's pin (-1
+    when no pin has been assigned yet).  net_ptr/net_assigns and
+    inst_ptr/inst_assigns are CSR adjacencies from nets and insts to the
+    indices of their assigns.'''
+
+    def __init__(self, name, insts, nets, assigns):
+        '''insts, nets and assigns are lists of row tuples:
+        insts   (uid, guid, name, component, value, device, subinsts)
+        nets    (uid, guid, name)
+        assigns (uid, guid, net, inst, function, pin, type, erc_type)
+        '''
+
+        self.name = name
+
+        inst_cols = list(zip(*insts)) or [()] * 7
+        self.inst_uid = np.array(inst_cols[0], dtype=np.int64)
+        self.inst_guid = np.array(inst_cols[1], dtype=np.int64)
+        self.inst_name = np.array(inst_cols[2], dtype=object)
+        self.inst_component = np.array(inst_cols[3], dtype=object)
+        self.inst_value = np.array(inst_cols[4], dtype=object)
+        self.inst_device = np.array(inst_cols[5], dtype=object)
+        # Tuples of (uid, circuit name) like Inst.subinsts
+        self.inst_subinsts = np.empty(len(insts), dtype=object)
+        self.inst_subinsts[:] = list(inst_cols[6])
+
+        net_cols = list(zip(*nets)) or [()] * 3
+        self.net_uid = np.array(net_cols[0], dtype=np.int64)
+        self.net_guid = np.array(net_cols[1], dtype=np.int64)
+        self.net_name = np.array(net_cols[2], dtype=object)
+
+        assign_cols = list(zip(*assigns)) or [()] * 8
+        self.assign_uid = np.array(assign_cols[0], dtype=np.int64)
+        self.assign_guid = np.array(assign_cols[1], dtype=np.int64)
+        self.assign_net = np.array(assign_cols[2], dtype=np.int64)
+        self.assign_inst = np.array(assign_cols[3], dtype=np.int64)
+        self.assign_function = np.array(assign_cols[4], dtype=object)
+        self.assign_pin = np.array(assign_cols[5], dtype=np.int64)
+        self.assign_type = np.array(assign_cols[6], dtype=np.int64)
+        self.assign_erc_type = np.array(assign_cols[7], dtype=np.int64)
+
+        self.net_ptr, self.net_assigns = _csr(self.assign_net, len(nets))
+        self.inst_ptr, self.inst_assigns = _csr(self.assign_inst, len(insts))
+
+    def __len__(self):
+        '''Returns the number of assigns.'''
+
+        return len(self.assign_uid)
+
+    def assigns_by_net(self, net):
+        '''Returns the assign indices of the net with index net.'''
+
+        return self.net_assigns[self.net_ptr[net]:self.net_ptr[net + 1]]
+
+    def assigns_by_inst(self, inst):
+        '''Returns the assign indices of the inst with index inst.'''
+
+        return self.inst_assigns[self.inst_ptr[inst]:self.inst_ptr[inst + 1]]
+
+    def net_degree(self):
+        '''Returns the number of assigns of every net.'''
+
+        return np.diff(self.net_ptr)
+
+    def inst_degree(self):
+        '''Returns the number of assigns of every inst.'''
+
+        return np.diff(self.inst_ptr)
+
+    def net_partner(self):
+        '''Returns for every assign the other assign of it's net if the net
+        has exactly two assigns, otherwise -1.  This is the net2 step of
+        the compiler's path walk.'''
+
+        return self._partner(self.net_ptr, self.net_assigns)
+
+    def inst_partner(self):
+        '''Returns for every assign the other assign of it's inst if the
+        inst has exactly two assigns, otherwise -1.  This is the inst2 step
+        of the compiler's path walk.'''
+
+        return self._partner(self.inst_ptr, self.inst_assigns)
+
+    def _partner(self, ptr, indices):
+        partner = np.full(len(self), -1, dtype=np.int64)
+        pairs = np.flatnonzero(np.diff(ptr) == 2)
+        first = indices[ptr[pairs]]
+        second = indices[ptr[pairs] + 1]
+        partner[first] = second
+        partner[second] = first
+        return partner
+
+    def erc_types(self):
+        '''Returns the ERCType codes of all assigns computed from their
+        PinType codes like ERCType.from_type.'''
+
+        lookup = np.full(len(PinType) + 1, -1, dtype=np.int64)
+        for ty in PinType:
+            lookup[ty.value] = ERCType.from_type(ty).value
+        # Unassigned types (-1) map to the last entry
+        return lookup[self.assign_type]
+
+    def pads(self):
+        '''Returns the arrays (assign, pad) of all pads connected to an
+        assign.  assign holds the assign index and pad the pad name, so
+        assign_net[assign] yields the net of every pad.'''
+
+        # Pads are looked up once per (device, pin) pair
+        devices = self.inst_device[self.assign_inst]
+        pad_names = {}
+        assign_index, pads = [], []
+        for i in np.flatnonzero(self.assign_pin >= 0):
+            key = (devices[i], self.assign_pin[i])
+            if key not in pad_names:
+                device = Device.device_by_name(devices[i])
+                pin = device.component.pins[self.assign_pin[i]]
+                pad_names[key] = [pad.name
+                                  for pad in device.pads_by_pin(pin)]
+            for pad in pad_names[key]:
+                assign_index.append(i)
+                pads.append(pad)
+        return (np.array(assign_index, dtype=np.int64),
+                np.array(pads, dtype=object))
+
+    @classmethod
+    def from_netlist(cls, netlist):
+        '''Builds a ColumnarNetlist from the object graph of a Netlist.'''
+
+        nets = list(netlist.iter_nets())
+        net_index = {net.uid: i for i, net in enumerate(nets)}
+
+        inst_rows, assign_rows = [], []
+        for i, inst in enumerate(netlist.iter_insts()):
+            device = inst.device.name if inst.device is not None else None
+            inst_rows.append((inst.uid, inst.guid, inst.name,
+                              inst.component.name, inst.value, device,
+                              inst.subinsts))
+            for assign in inst.assigns:
+                pin = assign.pin.id if assign.pin is not None else -1
+                assign_rows.append((assign.uid, assign.guid,
+                                    net_index[assign.net.uid], i,
+                                    assign.function, pin,
+                                    _code(assign.type),
+                                    _code(assign.erc_type)))
+
+        net_rows = [(net.uid, net.guid, net.name) for net in nets]
+        return cls(netlist.name, inst_rows, net_rows, assign_rows)
+
+    def to_netlist(self):
+        '''Builds the object graph of a Netlist.'''
+
+        return Netlist.from_object(self.to_object())
+
+    def to_object(self):
+        '''Returns the same object as Netlist.to_object.'''
+
+        components = [Component.component_by_name(name)
+                      for name in self.inst_component]
+
+        insts = []
+        for i in range(len(self.inst_uid)):
+            assigns = []
+            for a in self.assigns_by_inst(i):
+                assign = {
+                    'uid': int(self.assign_uid[a]),
+                    'guid': int(self.assign_guid[a]),
+                    'name': None,
+                    'net': int(self.net_uid[self.assign_net[a]]),
+                    'erc_type': str(ERCType(self.assign_erc_type[a])
+                                    if self.assign_erc_type[a] >= 0
+                                    else None),
+                    'function': self.assign_function[a],
+                }
+                if self.assign_pin[a] >= 0:
+                    pin = components[i].pins[self.assign_pin[a]]
+                    assign['pin'] = pin.name
+                if self.assign_type[a] >= 0:
+                    assign['type'] = str(PinType(self.assign_type[a]))
+                assigns.append(assign)
+
+            inst = {
+                'uid': int(self.inst_uid[i]),
+                'guid': int(self.inst_guid[i]),
+                'name': self.inst_name[i],
+                'component': self.inst_component[i],
+                'value': self.inst_value[i],
+                'assigns': assigns,
+            }
+            if self.inst_device[i] is not None:
+                inst['device'] = self.inst_device[i]
+            if len(self.inst_subinsts[i]) > 0:
+                inst['subinsts'] = [list(subinst)
+                                    for subinst in self.inst_subinsts[i]]
+            insts.append(inst)
+
+        nets = [{'uid': int(uid), 'guid': int(guid), 'name': name}
+                for uid, guid, name
+                in zip(self.net_uid, self.net_guid, self.net_name)]
+
+        return {
+            'name': self.name,
+            'nets': nets,
+            'insts': insts,
+        }
+
+    @classmethod
+    def from_object(cls, obj):
+        '''Builds a ColumnarNetlist from an object returned by
+        Netlist.to_object without building the object graph.'''
+
+        net_rows = [(net['uid'], net['guid'], net['name'])
+                    for net in obj['nets']]
+        net_index = {net['uid']: i for i, net in enumerate(obj['nets'])}
+
+        inst_rows, assign_rows = [], []
+        for i, inst in enumerate(obj['insts']):
+            component = Component.component_by_name(inst['component'])
+            inst_rows.append((inst['uid'], inst['guid'], inst['name'],
+                              inst['component'], inst['value'],
+                              inst.get('device'),
+                              tuple(tuple(subinst) for subinst
+                                    in inst.get('subinsts', ()))))
+            for assign in inst['assigns']:
+                pin = -1
+                if assign.get('pin') is not None:
+                    pin = component.pin_by_name(assign['pin']).id
+                ty = -1
+                if assign.get('type') is not None:
+                    ty = PinType.from_string(assign['type']).value
+                erc_type = -1
+                if assign.get('erc_type', 'None') != 'None':
+                    erc_type = ERCType[assign['erc_type'].upper()].value
+                assign_rows.append((assign['uid'], assign['guid'],
+                                    net_index[assign['net']], i,
+                                    assign['function'], pin, ty, erc_type))
+
+        return cls(obj['name'], inst_rows, net_rows, assign_rows)
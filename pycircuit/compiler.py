@@ -1,4 +1,5 @@
 from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
 from enum import Enum
 from pycircuit.circuit import *
 from pycircuit.device import Device
@@ -7,31 +8,144 @@ from pycircuit.pinassign import *
 
 
 class Compiler(object):
+    def __init__(self, workers=1, incremental=False, pin_cache=None):
+        '''workers is the number of processes used to assign pins.  With
+        more than one worker the pin assignment problems of all Inst's are
+        solved in parallel.  The result is the same as with one worker.
+
+        When incremental is True pin assignment problems are solved
+        incrementally to report the first conflicting Assign of an Inst.
+
+        Insts requesting the same functions of the same Component share a
+        solution.  pin_cache is the path of a file that keeps solutions
+        across compiler runs.
+        '''
+
+        assert workers >= 1
+        self.workers = workers
+        self.incremental = incremental
+        self.pin_cache = AssignmentCache(pin_cache)
 
     @staticmethod
-    def assign_pins(inst):
-        '''Find a valid Pin assignment for an Inst.
+    def pin_requests(inst):
+        '''Returns the (function, guid) pairs of all Assign's in Inst.
+        Assign's with the same guid need to be assigned to the same bus.'''
+
+        return [(assign.function, assign.guid) for assign in inst.assigns]
 
-        Converts all Assign's in Inst to Z3Assign's and Z3BusAssign's and uses
-        Z3 to find a valid Pin assignment.
+    @staticmethod
+    def solve_pins(component, requests, incremental=False):
+        '''Find a valid Pin assignment for requests returned by
+        pin_requests.
+
+        Converts all requests to Z3Assign's and Z3BusAssign's and uses Z3
+        to find a valid Pin assignment.  Returns the Pin ids in the order
+        of requests.  The meta data of the Z3Assign's is the index of the
+        request.
         '''
         assigns = {}
-        for assign in inst.assigns:
-            if not assign.guid in assigns:
-                assigns[assign.guid] = Z3BusAssign()
-            assigns[assign.guid].add_assign(Z3Assign(assign.function, assign))
-            problem = AssignmentProblem(inst.component, assigns.values())
+        z3_assigns = []
+        for i, (function, guid) in enumerate(requests):
+            if not guid in assigns:
+                assigns[guid] = Z3BusAssign()
+            z3_assign = Z3Assign(function, i)
+            assigns[guid].add_assign(z3_assign)
+            z3_assigns.append(z3_assign)
+
+        problem = AssignmentProblem(component, assigns.values())
+        problem.solve(incremental=incremental)
+        assert problem.check_solution() is None
+
+        return [assign.pin.id for assign in z3_assigns]
+
+    @staticmethod
+    def print_pin_error(inst, error):
+        print('Failed to assign pins', str(inst))
+        if isinstance(error, PinAssignmentError) and error.meta is not None:
+            print('First conflicting assign', repr(inst.assigns[error.meta]))
+
+    @staticmethod
+    def assign_pins(inst, pins=None, incremental=False):
+        '''Find a valid Pin assignment for an Inst.
+
+        pins are the Pin ids returned by solve_pins, when they are None
+        solve_pins is called.
+        '''
+        if pins is None:
+            try:
+                pins = Compiler.solve_pins(inst.component,
+                                           Compiler.pin_requests(inst),
+                                           incremental)
+            except Exception as e:
+                Compiler.print_pin_error(inst, e)
+                raise
+
+        for assign, pin in zip(inst.assigns, pins):
+            assign.pin = inst.component.pins[pin]
+            assign.type = assign.pin.type
+
+    def assign_all_pins(self, insts):
+        '''Find a valid Pin assignment for all insts.
+
+        Every distinct problem is solved once in canonical order, so the
+        assignment of an Inst doesn't depend on which problems have been
+        solved before or are cached.
+        '''
+
+        cache = self.pin_cache
+        plans = []
+        problems = {}
+        for inst in insts:
+            requests = Compiler.pin_requests(inst)
+            signature, order = cache.signature(requests)
+            key = cache.key(inst.component, signature)
+            plans.append((inst, key, order))
+            if cache.get(key) is None and key not in problems:
+                problems[key] = (inst, order,
+                                 [requests[i] for i in order])
+
+        def solved(key, future):
+            inst, order, requests = problems[key]
             try:
-                problem.solve()
-                assert problem.check_solution() is None
-            except:
-                print('Failed to assign pins', str(inst))
+                pins = future()
+            except PinAssignmentError as e:
+                if e.meta is None:
+                    Compiler.print_pin_error(inst, e)
+                    raise
+                # The problem was solved in canonical order
+                i = order[e.meta]
+                error = PinAssignmentError(
+                    'unsat: first conflicting assign %s' %
+                    repr(inst.assigns[i]), i)
+                Compiler.print_pin_error(inst, error)
+                raise error from e
+            except Exception as e:
+                Compiler.print_pin_error(inst, e)
                 raise
+            cache.put(key, pins)
 
-            for bus_assign in assigns.values():
-                for assign in bus_assign:
-                    assign.meta.pin = assign.pin
-                    assign.meta.type = assign.pin.type
+        if self.workers == 1 or len(problems) < 2:
+            for key, (inst, order, requests) in problems.items():
+                solved(key, lambda: Compiler.solve_pins(
+                    inst.component, requests, self.incremental))
+        else:
+            with ProcessPoolExecutor(self.workers) as pool:
+                futures = [(key, pool.submit(Compiler.solve_pins,
+                                             inst.component, requests,
+                                             self.incremental))
+                           for key, (inst, order, requests)
+                           in problems.items()]
+                for key, future in futures:
+                    solved(key, future.result)
+
+        for inst, key, order in plans:
+            pins = [None] * len(order)
+            for pin, i in zip(cache.get(key), order):
+                pins[i] = pin
+            Compiler.assign_pins(inst, pins)
+
+        if cache.path is not None and len(problems) > 0:
+            cache.save()
 
     @staticmethod
     def check_required_pins(inst):
@@ -236,8 +350,9 @@ class Compiler(object):
         circuit = Circuit.from_file(net_in)
 
         # Check insts
-        for inst in Compiler.rename(circuit.iter_insts()):
-            Compiler.assign_pins(inst)
+        insts = list(Compiler.rename(circuit.iter_insts()))
+        self.assign_all_pins(insts)
+        for inst in insts:
             Compiler.check_required_pins(inst)
             Compiler.match_device(inst)
 
@@ -289,8 +404,7 @@ class Compiler(object):
                     assign.net = port.external.net
                 port.external.net.assigns = assigns
                 port.internal.net.assigns = []
-        circuit.ports = ports
-        circuit.nets = list(circuit.assigned_nets())
+        circuit.replace_ports_and_nets(ports, circuit.assigned_nets())
 
         circuit.to_file(net_out)
         return circuit
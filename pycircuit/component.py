@@ -1,4 +1,5 @@
 from enum import Enum
+from pycircuit.registry import Registry, registry
 
 
 class PinType(Enum):
@@ -24,6 +25,8 @@ class PinType(Enum):
 
 
 class Fun(object):
+    __slots__ = ('id', 'bus_id', 'pin', 'function')
+
     def __init__(self, function, **kwargs):
         self.id = None
         self.bus_id = None
@@ -39,6 +42,8 @@ class Fun(object):
 
 
 class BusFun(Fun):
+    __slots__ = ('bus',)
+
     def __init__(self, bus, function):
         super().__init__(function)
 
@@ -52,6 +57,9 @@ class BusFun(Fun):
 
 
 class Pin(object):
+    __slots__ = ('id', 'device', 'name', 'funs', 'type', 'optional',
+                 'description', 'component')
+
     def __init__(self, name, *funs, **kwargs):
         self.id = None
         self.device = None
@@ -96,42 +104,43 @@ class Pin(object):
 
 
 class Component(object):
-    components = []
+    components = Registry()
 
     def __init__(self, name, description, *pins):
-        Component.components.append(self)
-
         self.name = name
         self.description = description
 
         self.pins = []
         self.funs = []
         self.busses = []
-        self._functions = set()
+        self._funs_by_function = {}
+        self._pins_by_name = {}
 
         for pin in pins:
             self.add_pin(pin)
 
         # Check that there is no Fun named like a BusFun
         # and no BusFun named like a Fun
-        for function in self._functions:
-            iterator = self.funs_by_function(function)
-            ty = type(next(iterator))
-            for fun in iterator:
+        for funs in self._funs_by_function.values():
+            ty = type(funs[0])
+            for fun in funs:
                 assert type(fun) == ty
 
+        registry(Component, 'components').append(self)
+
     def add_pin(self, pin):
         assert self.pin_by_name(pin.name) is None
 
         pin.id = len(self.pins)
         pin.component = self
         self.pins.append(pin)
+        self._pins_by_name[pin.name] = pin
 
         for fun in pin.funs:
             fun.id = len(self.funs)
             fun.pin = pin
             self.funs.append(fun)
-            self._functions.add(fun.function)
+            self._funs_by_function.setdefault(fun.function, []).append(fun)
 
             # Assign bus_id
             if isinstance(fun, BusFun):
@@ -147,20 +156,16 @@ class Component(object):
                 fun.bus_id = -fun.id - 1
 
     def has_function(self, function):
-        return function in self._functions
+        return function in self._funs_by_function
 
     def is_busfun(self, function):
-        return isinstance(next(self.funs_by_function(function)), BusFun)
+        return isinstance(self._funs_by_function[function][0], BusFun)
 
     def funs_by_function(self, function):
-        for fun in self.funs:
-            if fun.function == function:
-                yield fun
+        return iter(self._funs_by_function.get(function, ()))
 
     def pin_by_name(self, name):
-        for pin in self.pins:
-            if pin.name == name:
-                return pin
+        return self._pins_by_name.get(name)
 
     def __str__(self):
         '''Return the name of the component.'''
@@ -177,48 +182,63 @@ class Component(object):
     def component_by_name(cls, name):
         '''Returns the Component called `name` from registered components.'''
 
-        for c in cls.components:
-            if c.name == name:
-                return c
+        component = registry(cls, 'components').get(name)
+        if component is None:
+            raise IndexError('No Component with name ' + name)
+        return component
+
+    @classmethod
+    def lazy(cls, name, factory):
+        '''Register a Component that is built by calling factory with name
+        when it is looked up.'''
 
-        raise IndexError('No Component with name ' + name)
+        registry(cls, 'components').defer(name, factory)
 
     @classmethod
     def register_component(cls, component):
         '''Register a Component.'''
 
-        try:
-            cls.component_by_name(component.name)
+        components = registry(cls, 'components')
+        if components.get(component.name) is not None:
             raise Exception('Component with name %s exists' % component.name)
-        except IndexError:
-            cls.components.append(component)
+        components.append(component)
 
 
 class Io(Pin):
+    __slots__ = ()
+
     def __init__(self, name, *funs, **kwargs):
         kwargs['type'] = PinType.INOUT
         super().__init__(name, Fun('GPIO'), *funs, **kwargs)
 
 
 class In(Pin):
+    __slots__ = ()
+
     def __init__(self, name, *funs, **kwargs):
         kwargs['type'] = PinType.IN
         super().__init__(name, *funs, **kwargs)
 
 
 class Out(Pin):
+    __slots__ = ()
+
     def __init__(self, name, *funs, **kwargs):
         kwargs['type'] = PinType.OUT
         super().__init__(name, *funs, **kwargs)
 
 
 class Pwr(Pin):
+    __slots__ = ()
+
     def __init__(self, name, **kwargs):
         kwargs['type'] = PinType.POWER
         super().__init__(name, **kwargs)
 
 
 class Gnd(Pin):
+    __slots__ = ()
+
     def __init__(self, name, **kwargs):
         kwargs['type'] = PinType.GND
         super().__init__(name, **kwargs)
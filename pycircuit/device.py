@@ -1,5 +1,6 @@
 from pycircuit.component import *
 from pycircuit.package import *
+from pycircuit.registry import DeviceRegistry, registry
 
 
 class Map(object):
@@ -26,7 +27,7 @@ class Map(object):
 class Device(object):
     '''Represents a mapping from a Component to a Package.'''
 
-    devices = []
+    devices = DeviceRegistry()
 
     def __init__(self, name, component, package, *maps):
         '''A Device with name that maps the pads of a Package to the pins
@@ -36,6 +37,8 @@ class Device(object):
         self.component = Component.component_by_name(component)
         self.package = Package.package_by_name(package)
         self.maps = []
+        self._pads_by_pin = {}
+        self._pin_by_pad = {}
 
         for map in maps:
             self.add_map(map)
@@ -67,38 +70,30 @@ class Device(object):
         map.pad = pad
         map.device = self
         self.maps.append(map)
+        self._pads_by_pin.setdefault(pin, []).append(pad)
+        self._pin_by_pad.setdefault(pad, pin)
 
     def check_device(self):
         '''Checks that every Pin and every Pad has a Map.'''
 
         for pin in self.component.pins:
-            for map in self.maps:
-                if map.pin == pin:
-                    break
-            else:
+            if pin not in self._pads_by_pin:
                 raise AssertionError('No map for component %s pin %s in device %s'
                                      % (self.component.name, pin.name, self.name))
         for pad in self.package.pads:
-            for map in self.maps:
-                if map.pad == pad:
-                    break
-            else:
+            if pad not in self._pin_by_pad:
                 raise AssertionError('No map for package %s pad %s in device %s'
                                      % (self.package.name, pad.name, self.name))
 
     def pin_by_pad(self, pad):
         '''Returns the pin mapped to pad.'''
 
-        for map in self.maps:
-            if map.pad == pad:
-                return map.pin
+        return self._pin_by_pad.get(pad)
 
     def pads_by_pin(self, pin):
         '''Returns a list of pads mapped to pin.'''
 
-        for map in self.maps:
-            if map.pin == pin:
-                yield map.pad
+        return iter(self._pads_by_pin.get(pin, ()))
 
     def __str__(self):
         '''Returns the name of the Device.'''
@@ -115,26 +110,32 @@ class Device(object):
     def device_by_name(cls, name):
         '''Returns the Device with name from registered devices.'''
 
-        for dev in cls.devices:
-            if dev.name == name:
-                return dev
-
-        raise IndexError('No Device with name ' + name)
+        device = registry(cls, 'devices', DeviceRegistry).get(name)
+        if device is None:
+            raise IndexError('No Device with name ' + name)
+        return device
 
     @classmethod
     def devices_by_component(cls, component):
         '''Returns the available Devices for Component.'''
 
-        for dev in cls.devices:
-            if dev.component == component:
-                yield dev
+        devices = registry(cls, 'devices', DeviceRegistry)
+        devices.load_component(component.name)
+        return iter(devices.by_component.get(component, ()))
+
+    @classmethod
+    def lazy(cls, name, component, factory):
+        '''Register a Device for the Component called component that is
+        built by calling factory with name when it is looked up.'''
+
+        devices = registry(cls, 'devices', DeviceRegistry)
+        devices.defer(name, factory, component)
 
     @classmethod
     def register_device(cls, device):
         '''Register a Device.'''
 
-        try:
-            cls.device_by_name(device.name)
+        devices = registry(cls, 'devices', DeviceRegistry)
+        if devices.get(device.name) is not None:
             raise Exception('Device with name %s already exists' % device.name)
-        except IndexError:
-            cls.devices.append(device)
+        devices.append(device)
@@ -0,0 +1,434 @@
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import shapely
+from shapely.geometry import LineString, Point, Polygon
+from shapely.ops import unary_union
+from pycircuit.outline import Hole, Slot, Cutout
+from pycircuit.traces import Via
+
+
+COPPER = ('pad', 'segment', 'via')
+
+
+class Violation(object):
+    '''A violated design rule.
+
+    rule is one of 'clearance', 'edge_clearance', 'courtyard_overlap' or
+    'annular_ring'.  features are the Feature's of the SpatialIndex that
+    violate the rule, layer is the Layer they are on or None.  actual is
+    the measured distance, overlap area or annular ring and required the
+    value required by the design rules.  descriptions are readable names
+    of the features.'''
+
+    def __init__(self, rule, layer, features, location, actual, required,
+                 descriptions=()):
+        self.rule = rule
+        self.layer = layer
+        self.features = tuple(features)
+        self.descriptions = tuple(descriptions)
+        self.location = location
+        self.actual = actual
+        self.required = required
+
+        self.key = (rule, '' if layer is None else layer.name,
+                    float(location[0]), float(location[1]))
+
+    def __str__(self):
+        return '%s on %s at (%.3f, %.3f): %s %.4f (required %.4f)' % (
+            self.rule, self.layer, self.location[0], self.location[1],
+            ' <> '.join(self.descriptions), self.actual, self.required)
+
+    def to_object(self):
+        return {
+            'rule': self.rule,
+            'layer': None if self.layer is None else self.layer.name,
+            'features': list(self.descriptions),
+            'x': float(self.location[0]),
+            'y': float(self.location[1]),
+            'actual': float(self.actual),
+            'required': float(self.required),
+        }
+
+
+class DrcReport(object):
+    '''The violations found by a design rule check.'''
+
+    def __init__(self, violations):
+        self.violations = sorted(violations, key=lambda v: v.key)
+
+    def __len__(self):
+        return len(self.violations)
+
+    def __iter__(self):
+        return iter(self.violations)
+
+    def by_rule(self, rule):
+        return [v for v in self.violations if v.rule == rule]
+
+    def count(self):
+        '''Returns a dict from rule to the number of violations.'''
+
+        counts = {}
+        for v in self.violations:
+            counts[v.rule] = counts.get(v.rule, 0) + 1
+        return counts
+
+    def print(self):
+        for v in self.violations:
+            print('DRC Error:', v)
+
+    def to_object(self):
+        return {
+            'count': self.count(),
+            'violations': [v.to_object() for v in self.violations],
+        }
+
+
+class Drc(object):
+    '''Geometric design rule checker of a Pcb.
+
+    Checks copper to copper clearance with the clearance of the NetClass of
+    each feature, copper to board edge clearance, courtyard overlap and
+    the annular ring of vias and drilled pads.  Candidate pairs are found
+    with the SpatialIndex of the Pcb and a shapely STRtree, every layer is
+    checked in a thread of a pool.'''
+
+    def __init__(self, pcb, workers=None):
+        self.pcb = pcb
+        self.workers = workers
+        self.index = pcb.spatial_index()
+
+        self.rules = pcb.attributes.trace_design_rules
+        self.board, self.edges = board_edges(pcb.outline)
+
+    def run(self):
+        '''Checks all features and returns a DrcReport.'''
+
+        layers = self.pcb.attributes.layers
+        jobs = []
+        for rlayer in layers.routing_layers:
+            jobs.append((self.check_clearance, rlayer.layer))
+            jobs.append((self.check_edge_clearance, rlayer.layer))
+        for player in layers.placement_layers:
+            jobs.append((self.check_courtyards, player.layer))
+
+        violations = []
+        with ThreadPoolExecutor(self.workers) as pool:
+            futures = [pool.submit(check, layer) for check, layer in jobs]
+            for future in futures:
+                violations += future.result()
+        violations += self.check_annular_rings()
+        return DrcReport(violations)
+
+    def features(self, layer, kinds):
+        '''Returns the features of kinds on layer ordered by location.'''
+
+        return sorted((f for f in self.index.grid(layer).features()
+                       if f.kind in kinds), key=lambda f: f.bounds)
+
+    def describe(self, feature):
+        '''Returns a readable name of feature.'''
+
+        if feature.kind == 'pad':
+            pads = self.pcb.pads
+            return 'pad %s.%s' % (pads.insts[pads.inst[feature.item]].name,
+                                  pads.pads[feature.item].name)
+        if feature.kind == 'courtyard':
+            return 'courtyard %s' % feature.item.name
+        return '%s %s' % (feature.kind, feature.net.name)
+
+    def violation(self, rule, layer, features, location, actual, required):
+        return Violation(rule, layer, features, location, actual, required,
+                         [self.describe(f) for f in features])
+
+    def clearance(self, feature):
+        '''Returns the clearance required around feature.'''
+
+        if feature.net is None:
+            return self.rules.min_clearance
+        net_class = feature.net.attributes.net_class
+        if feature.kind == 'via':
+            return net_class.via_clearance
+        return net_class.segment_clearance
+
+    def check_clearance(self, layer, features=None, neighbours=None):
+        '''Returns the clearance violations on layer between features and
+        neighbours, which default to all copper features on layer.'''
+
+        if features is None:
+            features = self.features(layer, COPPER)
+        if neighbours is None:
+            neighbours = features
+        if len(features) == 0 or len(neighbours) == 0:
+            return []
+
+        clearance = np.array([self.clearance(f) for f in features])
+        neighbour_clearance = np.array([self.clearance(f)
+                                        for f in neighbours])
+        geometries = np.array([f.geometry for f in features], dtype=object)
+        neighbour_geometries = np.array([f.geometry for f in neighbours],
+                                        dtype=object)
+
+        tree = shapely.STRtree(neighbour_geometries)
+        i, j = tree.query(geometries, predicate='dwithin',
+                          distance=np.maximum(clearance,
+                                              neighbour_clearance.max()))
+
+        # Every pair of different nets is checked once
+        pairs = {}
+        for a, b in zip(i, j):
+            fa, fb = features[a], neighbours[b]
+            if fa is fb or (fa.net is not None and fa.net is fb.net):
+                continue
+            pair = frozenset((id(fa), id(fb)))
+            if pair not in pairs:
+                pairs[pair] = (a, b)
+        if len(pairs) == 0:
+            return []
+        i, j = np.array(list(pairs.values())).T
+
+        required = np.maximum(clearance[i], neighbour_clearance[j])
+        distance = shapely.distance(geometries[i], neighbour_geometries[j])
+        lines = shapely.shortest_line(geometries[i], neighbour_geometries[j])
+        locations = shapely.get_coordinates(shapely.centroid(lines))
+
+        violations = []
+        for k in np.flatnonzero(distance < required):
+            violations.append(self.violation(
+                'clearance', layer, (features[i[k]], neighbours[j[k]]),
+                locations[k], distance[k], required[k]))
+        return violations
+
+    def check_edge_clearance(self, layer, features=None):
+        '''Returns the copper features on layer closer to the board edge
+        than the minimum edge clearance.'''
+
+        if features is None:
+            features = self.features(layer, COPPER)
+        if len(features) == 0:
+            return []
+
+        required = self.rules.min_edge_clearance
+        geometries = np.array([f.geometry for f in features], dtype=object)
+        distance = shapely.distance(geometries, self.edges)
+        distance[~shapely.within(geometries, self.board)] = 0
+
+        violations = []
+        for k in np.flatnonzero(distance < required):
+            line = shapely.shortest_line(geometries[k], self.edges)
+            violations.append(self.violation(
+                'edge_clearance', layer, (features[k],),
+                shapely.get_coordinates(line.centroid)[0],
+                distance[k], required))
+        return violations
+
+    def check_courtyards(self, layer, features=None, neighbours=None):
+        '''Returns the overlapping courtyards on layer.'''
+
+        if features is None:
+            features = self.features(layer, ('courtyard',))
+        if neighbours is None:
+            neighbours = features
+        if len(features) == 0 or len(neighbours) == 0:
+            return []
+
+        geometries = np.array([f.geometry for f in features], dtype=object)
+        tree = shapely.STRtree([f.geometry for f in neighbours])
+        violations = []
+        seen = set()
+        for a, b in zip(*tree.query(geometries, predicate='intersects')):
+            fa, fb = features[a], neighbours[b]
+            pair = frozenset((id(fa), id(fb)))
+            if fa is fb or pair in seen:
+                continue
+            seen.add(pair)
+            # Courtyards that only touch don't overlap, up to rounding
+            overlap = fa.geometry.intersection(fb.geometry)
+            if overlap.area < 1e-9:
+                continue
+            violations.append(self.violation(
+                'courtyard_overlap', layer, (fa, fb),
+                shapely.get_coordinates(overlap.centroid)[0],
+                overlap.area, 0))
+        return violations
+
+    def check_annular_rings(self, vias=None, pads=None):
+        '''Returns the vias and drilled pads with an annular ring smaller
+        than the minimum.  vias and pads default to all vias and pads.'''
+
+        required = self.rules.min_annular_ring
+        index = self.index
+        violations = []
+
+        if vias is None:
+            vias = [via for net in self.pcb.netlist.nets
+                    for via in net.attributes.vias]
+        for via in vias:
+            ring = (via.diameter - via.drill) / 2
+            if ring < required:
+                feature = index.features[via][0][1]
+                violations.append(self.violation(
+                    'annular_ring', None, (feature,),
+                    np.array(via.position[0:2], dtype=float), ring, required))
+
+        table = self.pcb.pads
+        if pads is None:
+            pads = np.flatnonzero(table.drilled)
+        for k in pads:
+            pad = table.pads[k]
+            if pad.drill is None or pad.size is None:
+                continue
+            ring = (min(pad.size) - pad.drill) / 2
+            if ring < required:
+                inst = table.insts[table.inst[k]]
+                feature = [f for _, f in index.features[inst]
+                           if f.kind == 'pad' and f.item == k][0]
+                violations.append(self.violation(
+                    'annular_ring', None, (feature,),
+                    table.location[k, :2].copy(), ring, required))
+        return violations
+
+
+class IncrementalDrc(Drc):
+    '''Design rule checker that keeps the violations of a Pcb up to date.
+
+    The Pcb is checked once.  Afterwards the IncrementalDrc listens to the
+    Pcb and marks placed insts and added or removed segments and vias as
+    dirty.  report() drops the cached violations of dirty items and checks
+    the features of dirty items against the features in their
+    neighbourhood only.'''
+
+    def __init__(self, pcb, workers=None):
+        super().__init__(pcb, workers)
+
+        self.violations = set()
+        self.by_owner = {}
+        self.add(self.run())
+        self.dirty = set()
+        pcb.add_listener(self)
+
+    def inst_placed(self, inst):
+        self.dirty.add(inst)
+
+    def segment_added(self, segment):
+        self.dirty.add(segment)
+
+    def segment_removed(self, segment):
+        self.dirty.add(segment)
+
+    def via_added(self, via):
+        self.dirty.add(via)
+
+    def via_removed(self, via):
+        self.dirty.add(via)
+
+    def owner(self, feature):
+        '''Returns the inst, segment or via feature belongs to.'''
+
+        if feature.kind == 'pad':
+            return self.pcb.pads.insts[self.pcb.pads.inst[feature.item]]
+        return feature.item
+
+    def add(self, violations):
+        for v in violations:
+            self.violations.add(v)
+            for f in v.features:
+                self.by_owner.setdefault(self.owner(f), set()).add(v)
+
+    def discard(self, owner):
+        '''Discards the violations of the features of owner.'''
+
+        for v in self.by_owner.pop(owner, ()):
+            self.violations.discard(v)
+            for f in v.features:
+                other = self.by_owner.get(self.owner(f))
+                if other is not None:
+                    other.discard(v)
+
+    def update(self):
+        '''Rechecks the features of all dirty items.'''
+
+        if len(self.dirty) == 0:
+            return
+        dirty, self.dirty = self.dirty, set()
+
+        for key in dirty:
+            self.discard(key)
+
+        # Current features of dirty items by layer
+        layers = {}
+        for key in dirty:
+            for key_layers, feature in self.index.features.get(key, ()):
+                for layer in key_layers:
+                    layers.setdefault(layer, []).append(feature)
+
+        margin = max([self.rules.min_clearance] +
+                     [nc.segment_clearance for nc in self.pcb.net_classes] +
+                     [nc.via_clearance for nc in self.pcb.net_classes])
+        for layer, features in layers.items():
+            copper = [f for f in features if f.kind in COPPER]
+            courtyards = [f for f in features if f.kind == 'courtyard']
+            neighbours = self.neighbours(layer, features, margin)
+
+            self.add(self.check_clearance(
+                layer, copper, [f for f in neighbours if f.kind in COPPER]))
+            self.add(self.check_edge_clearance(layer, copper))
+            self.add(self.check_courtyards(
+                layer, courtyards,
+                [f for f in neighbours if f.kind == 'courtyard']))
+
+        table = self.pcb.pads
+        pads = []
+        for key in dirty:
+            if key in table.inst_index:
+                inst_pads = table.by_inst(key)
+                pads += [k for k in range(inst_pads.start, inst_pads.stop)
+                         if table.drilled[k]]
+        vias = [key for key in dirty
+                if isinstance(key, Via) and key in self.index.features]
+        self.add(self.check_annular_rings(vias, pads))
+
+    def neighbours(self, layer, features, margin):
+        '''Returns the features on layer within margin of features.'''
+
+        grid = self.index.grid(layer)
+        found = set()
+        for feature in features:
+            b = feature.bounds
+            found |= grid.query((b[0] - margin, b[1] - margin,
+                                 b[2] + margin, b[3] + margin))
+        return sorted(found, key=lambda f: f.bounds)
+
+    def report(self):
+        '''Returns a DrcReport of the current violations.'''
+
+        self.update()
+        return DrcReport(self.violations)
+
+
+def board_edges(outline):
+    '''Returns the copper area of the board and its edges, which include
+    the holes, slots and cutouts of outline.'''
+
+    openings = []
+    for element in outline:
+        if isinstance(element, Hole):
+            openings.append(Point(element.position[0:2])
+                            .buffer(element.drill_size / 2))
+        elif isinstance(element, Slot):
+            length = max(element.width - element.drill_size, 0) / 2
+            theta = np.radians(element.angle)
+            dx, dy = length * np.cos(theta), length * np.sin(theta)
+            x, y = element.position[0], element.position[1]
+            openings.append(LineString([(x - dx, y - dy), (x + dx, y + dy)])
+                            .buffer(element.drill_size / 2))
+        elif isinstance(element, Cutout):
+            openings.append(element.polygon)
+
+    # The interiors of the outline polygon bound the area parts are placed
+    # in, the board is the exterior
+    board = Polygon(outline.polygon.exterior)
+    if len(openings) > 0:
+        board = board.difference(unary_union(openings))
+    shapely.prepare(board)
+    return board, board.boundary
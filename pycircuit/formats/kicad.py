@@ -126,10 +126,10 @@ def to_kicad(self):
             kpcb.segments.append(kseg)
 
         for via in net.attributes.vias:
-            kvia = ki.pcb.Via(at=list(via.coord)[0:2],
+            kvia = ki.pcb.Via(at=list(via.position)[0:2],
                               net=knet_code,
-                              size=self.diameter(),
-                              drill=self.drill())
+                              size=via.diameter,
+                              drill=via.drill)
             kpcb.vias.append(kvia)
 
     self.outline.to_kicad(kpcb)
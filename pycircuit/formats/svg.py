@@ -241,7 +241,7 @@ def to_svg(self):
                         SvgCircle(via.drill / 2, {
                             'class': 'drill'
                         })
-                        ).translate(via.coord[0], via.coord[1])
+                        ).translate(via.position[0], via.position[1])
         layer.append(svia)
 
     for seg in self.segments:
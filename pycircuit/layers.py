@@ -178,6 +178,25 @@ class PlacementLayer(object):
         self.layer = layer
         self.flip = flip
         self.insts = []
+        # inst -> index in insts
+        self.inst_index = {}
+
+    def add_inst(self, inst):
+        if inst not in self.inst_index:
+            self.inst_index[inst] = len(self.insts)
+            self.insts.append(inst)
+
+    def remove_inst(self, inst):
+        '''Removes inst in constant time by moving the last inst into its
+        place.'''
+
+        i = self.inst_index.pop(inst, None)
+        if i is None:
+            return
+        last = self.insts.pop()
+        if last is not inst:
+            self.insts[i] = last
+            self.inst_index[last] = i
 
 
 class Layers(object):
@@ -1,5 +1,9 @@
+from pycircuit.library import cache as _cache
 from pycircuit.library.components import *
 from pycircuit.library.packages import *
 from pycircuit.library.devices import *
 from pycircuit.library.design_rules import *
 from pycircuit.library.outlines import *
+
+# Must follow the imports, the cached parts replace the deferred parts
+_cached = _cache.load_library()
@@ -0,0 +1,121 @@
+'''Cache of the built parts library.
+
+When the environment variable PYCIRCUIT_LIBRARY_CACHE is set to a path,
+importing pycircuit.library loads all Component's, Package's and Device's
+from the file at path with a single read instead of building them.  When
+the file is missing or was built from different sources it is rebuilt.
+
+The library registers its parts as deferred first, load_library then
+replaces them with the cached parts.  All parts in the cache are
+unpickled on load, not only the parts that are looked up.
+'''
+import hashlib
+import os
+import pickle
+import sys
+from pycircuit.component import Component
+from pycircuit.device import Device
+from pycircuit.package import Package
+from pycircuit.registry import DeviceRegistry, registry
+
+MAGIC = 'pycircuit library cache'
+VERSION = 1
+
+SOURCES = [
+    'component.py', 'package.py', 'device.py', 'registry.py',
+    'library/components.py', 'library/packages.py', 'library/devices.py',
+    'library/cache.py',
+]
+
+
+def cache_path():
+    '''Returns the path of the cache or None.'''
+
+    return os.environ.get('PYCIRCUIT_LIBRARY_CACHE') or None
+
+
+def source_hash():
+    '''Returns a hash of the sources that define the library.'''
+
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    h = hashlib.sha1()
+    h.update(('%s %d %d.%d' % (MAGIC, VERSION, *sys.version_info[:2]))
+             .encode('utf-8'))
+    for source in SOURCES:
+        with open(os.path.join(root, source), 'rb') as f:
+            h.update(f.read())
+    return h.hexdigest()
+
+
+def registries():
+    return (registry(Component, 'components'),
+            registry(Package, 'packages'),
+            registry(Device, 'devices', DeviceRegistry))
+
+
+def is_library(factory):
+    return getattr(factory, '__module__', '').startswith('pycircuit.library.')
+
+
+def is_library_only():
+    '''Returns True when only the library registered parts and none of them
+    is built.  The cache is only used when the library is the first to
+    register parts, otherwise the parts of the library may refer to other
+    parts.'''
+
+    return all(len(parts) == 0 and
+               all(is_library(f) for f in parts.deferred.values())
+               for parts in registries())
+
+
+def load_cache(path=None):
+    '''Registers the parts in the cache at path in place of the deferred
+    parts of the library.  Returns False when the cache is not used.'''
+
+    path = path or cache_path()
+    if path is None or not os.path.exists(path) or not is_library_only():
+        return False
+
+    try:
+        with open(path, 'rb') as f:
+            if not pickle.load(f) == (MAGIC, VERSION, source_hash()):
+                return False
+            parts = pickle.load(f)
+    except Exception as e:
+        print('Warn: Failed to load library cache %s: %s' % (path, e))
+        return False
+
+    for reg, reg_parts in zip(registries(), parts):
+        reg.discard_deferred()
+        reg.extend(reg_parts)
+    return True
+
+
+def load_library(path=None):
+    '''Loads the cache at path or builds it when it can't be used.  Called
+    after the library registered its deferred parts.  Returns True when the
+    cache was loaded.'''
+
+    path = path or cache_path()
+    if path is None or not is_library_only():
+        return False
+    if load_cache(path):
+        return True
+    build_cache(path)
+    return False
+
+
+def build_cache(path=None):
+    '''Builds all deferred parts and writes them to the cache at path.'''
+
+    path = path or cache_path()
+    if path is None:
+        return
+
+    parts = [list(reg) for reg in registries()]
+
+    tmp = '%s.%d' % (path, os.getpid())
+    with open(tmp, 'wb') as f:
+        pickle.dump((MAGIC, VERSION, source_hash()), f)
+        pickle.dump(parts, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp, path)
@@ -2,110 +2,132 @@ from pycircuit.component import *
 
 
 # Passive Devices
-Component('Z', 'Impedance',
-          Pin('A', Fun('~'), optional=False),
-          Pin('B', Fun('~'), optional=False))
-
-Component('R', 'Resistor',
-          Pin('A', Fun('~'), optional=False),
-          Pin('B', Fun('~'), optional=False))
-
-Component('C', 'Capacitor',
-          Pin('A', BusFun('Ceramic', '~'),
-              BusFun('Electrolytic', '+'), optional=False),
-          Pin('B', BusFun('Ceramic', '~'),
-              BusFun('Electrolytic', '-'), optional=False))
-
-Component('L', 'Inductor',
-          Pin('A', Fun('~'), optional=False),
-          Pin('B', Fun('~'), optional=False))
-
-Component('V', 'Voltage source',
-          Pin('+', optional=False),
-          Pin('-', optional=False))
-
-Component('S', 'Switch',
-          Pin('A', Fun('~'), optional=False),
-          Pin('B', Fun('~'), optional=False))
-
-Component('XTAL', 'Crystal',
-          Pin('A', Fun('~'), optional=False),
-          Pin('B', Fun('~'), optional=False))
-
-Component('TP', 'Test point',
-          In('TP', optional=False))
-
-Component('J2P', 'Jumper 2-pins',
-          Pin('A', Fun('~'), optional=False),
-          Pin('B', Fun('~'), optional=False))
-
-Component('J3P', 'Jumper 3-pins',
-          Pin('A', Fun('~'), optional=False),
-          Pin('B', Fun('~'), optional=False),
-          Pin('C', optional=False))
-
-Component('ANT', 'Antenna', Pin('ANT', optional=False))
-
-Component('Transformer_1P_1S', 'Transformer with one primary and one secondary winding',
-          Pin('L1.1', optional=False),
-          Pin('L1.2', optional=False),
-          Pin('L2.1', optional=False),
-          Pin('L2.2', optional=False))
+Component.lazy('Z', lambda name: Component(
+    name, 'Impedance',
+    Pin('A', Fun('~'), optional=False),
+    Pin('B', Fun('~'), optional=False)))
+
+Component.lazy('R', lambda name: Component(
+    name, 'Resistor',
+    Pin('A', Fun('~'), optional=False),
+    Pin('B', Fun('~'), optional=False)))
+
+Component.lazy('C', lambda name: Component(
+    name, 'Capacitor',
+    Pin('A', BusFun('Ceramic', '~'),
+        BusFun('Electrolytic', '+'), optional=False),
+    Pin('B', BusFun('Ceramic', '~'),
+        BusFun('Electrolytic', '-'), optional=False)))
+
+Component.lazy('L', lambda name: Component(
+    name, 'Inductor',
+    Pin('A', Fun('~'), optional=False),
+    Pin('B', Fun('~'), optional=False)))
+
+Component.lazy('V', lambda name: Component(
+    name, 'Voltage source',
+    Pin('+', optional=False),
+    Pin('-', optional=False)))
+
+Component.lazy('S', lambda name: Component(
+    name, 'Switch',
+    Pin('A', Fun('~'), optional=False),
+    Pin('B', Fun('~'), optional=False)))
+
+Component.lazy('XTAL', lambda name: Component(
+    name, 'Crystal',
+    Pin('A', Fun('~'), optional=False),
+    Pin('B', Fun('~'), optional=False)))
+
+Component.lazy('TP', lambda name: Component(
+    name, 'Test point',
+    In('TP', optional=False)))
+
+Component.lazy('J2P', lambda name: Component(
+    name, 'Jumper 2-pins',
+    Pin('A', Fun('~'), optional=False),
+    Pin('B', Fun('~'), optional=False)))
+
+Component.lazy('J3P', lambda name: Component(
+    name, 'Jumper 3-pins',
+    Pin('A', Fun('~'), optional=False),
+    Pin('B', Fun('~'), optional=False),
+    Pin('C', optional=False)))
+
+Component.lazy('ANT', lambda name: Component(
+    name, 'Antenna',
+    Pin('ANT', optional=False)))
+
+Component.lazy('Transformer_1P_1S', lambda name: Component(
+    name, 'Transformer with one primary and one secondary winding',
+    Pin('L1.1', optional=False),
+    Pin('L1.2', optional=False),
+    Pin('L2.1', optional=False),
+    Pin('L2.2', optional=False)))
 
 
 # Active Devices
-Component('D', 'Diode',
-          Pin('+', optional=False),
-          Pin('-', optional=False))
-
-Component('Q', 'Bipolar transistor',
-          Pin('B', optional=False),
-          Pin('C', optional=False),
-          Pin('E', optional=False),
-          Pin('SUBSTRATE'))
-
-Component('M', 'Mosfet',
-          Pin('G', optional=False),
-          Pin('D', optional=False),
-          Pin('S', optional=False),
-          Pin('SUBSTRATE'))
-
-Component('OP', 'Opamp',
-          Pwr('VCC', optional=False),
-          Pwr('VEE', optional=False),
-          In('+', optional=False),
-          In('-', optional=False),
-          Out('OUT', optional=False))
-
-Component('RGB_A', 'RGB LED (Common Anode)',
-          In('+', optional=False),
-          Out('R', optional=False),
-          Out('G', optional=False),
-          Out('B', optional=False))
-
-Component('RGB_C', 'RGB LED (Common Cathode)',
-          In('R', optional=False),
-          In('G', optional=False),
-          In('B', optional=False),
-          Out('-', optional=False))
-
-Component('CLK', 'Clock',
-          Pwr('VDD', optional=False),
-          Gnd('GND', optional=False),
-          Out('CLK', optional=False))
-
-Component('QSPI:S', 'Quad SPI Slave',
-          Pwr('VDD', optional=False),
-          Gnd('GND', optional=False),
-          In('SCLK', optional=False),
-          Io('DQ0'),
-          Io('DQ1'),
-          Io('DQ2'),
-          Io('DQ3'),
-          In('SS', optional=False))
-
-Component('I2C:S', 'I2C Slave',
-          Pwr('VDD', optional=False),
-          Gnd('GND', optional=False),
-          Io('SDA', optional=False),
-          In('SCL', optional=False))
+Component.lazy('D', lambda name: Component(
+    name, 'Diode',
+    Pin('+', optional=False),
+    Pin('-', optional=False)))
+
+Component.lazy('Q', lambda name: Component(
+    name, 'Bipolar transistor',
+    Pin('B', optional=False),
+    Pin('C', optional=False),
+    Pin('E', optional=False),
+    Pin('SUBSTRATE')))
+
+Component.lazy('M', lambda name: Component(
+    name, 'Mosfet',
+    Pin('G', optional=False),
+    Pin('D', optional=False),
+    Pin('S', optional=False),
+    Pin('SUBSTRATE')))
+
+Component.lazy('OP', lambda name: Component(
+    name, 'Opamp',
+    Pwr('VCC', optional=False),
+    Pwr('VEE', optional=False),
+    In('+', optional=False),
+    In('-', optional=False),
+    Out('OUT', optional=False)))
+
+Component.lazy('RGB_A', lambda name: Component(
+    name, 'RGB LED (Common Anode)',
+    In('+', optional=False),
+    Out('R', optional=False),
+    Out('G', optional=False),
+    Out('B', optional=False)))
+
+Component.lazy('RGB_C', lambda name: Component(
+    name, 'RGB LED (Common Cathode)',
+    In('R', optional=False),
+    In('G', optional=False),
+    In('B', optional=False),
+    Out('-', optional=False)))
+
+Component.lazy('CLK', lambda name: Component(
+    name, 'Clock',
+    Pwr('VDD', optional=False),
+    Gnd('GND', optional=False),
+    Out('CLK', optional=False)))
+
+Component.lazy('QSPI:S', lambda name: Component(
+    name, 'Quad SPI Slave',
+    Pwr('VDD', optional=False),
+    Gnd('GND', optional=False),
+    In('SCLK', optional=False),
+    Io('DQ0'),
+    Io('DQ1'),
+    Io('DQ2'),
+    Io('DQ3'),
+    In('SS', optional=False)))
+
+Component.lazy('I2C:S', lambda name: Component(
+    name, 'I2C Slave',
+    Pwr('VDD', optional=False),
+    Gnd('GND', optional=False),
+    Io('SDA', optional=False),
+    In('SCL', optional=False)))
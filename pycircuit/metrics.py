@@ -0,0 +1,107 @@
+import numpy as np
+from scipy.sparse.csgraph import minimum_spanning_tree
+
+
+class Metrics(object):
+    '''Wire length estimates of all nets on a Pcb.
+
+    The metrics are computed from the PadTable of the Pcb with NumPy
+    reductions over the pads of every net.  Metrics listens for placed
+    insts and only recomputes the nets connected to an inst that moved.
+    Nets without pads have NaN bounds and zero length.'''
+
+    def __init__(self, pcb):
+        self.pcb = pcb
+
+        pads = pcb.pads
+        num_nets = len(pads.nets)
+        self.degree = np.diff(pads.net_ptr)
+        self._bounds = np.full((num_nets, 4), np.nan)
+        self._star = np.zeros(num_nets)
+        self._mst = np.zeros(num_nets)
+        self.dirty = self.degree > 0
+
+        pcb.add_listener(self)
+
+    def inst_placed(self, inst):
+        pads = self.pcb.pads
+        nets = pads.net[pads.by_inst(inst)]
+        self.dirty[nets[nets >= 0]] = True
+
+    def update(self):
+        '''Recomputes the metrics of all nets connected to a moved inst.'''
+
+        nets = np.flatnonzero(self.dirty)
+        if len(nets) == 0:
+            return
+        self.dirty[:] = False
+
+        # Gather the pad locations of nets into consecutive segments
+        pads = self.pcb.pads
+        counts = self.degree[nets]
+        offsets = np.zeros(len(nets) + 1, dtype=np.int64)
+        np.cumsum(counts, out=offsets[1:])
+        index = np.repeat(pads.net_ptr[nets] - offsets[:-1], counts) \
+            + np.arange(offsets[-1])
+        xy = pads.location[pads.net_pads[index], :2]
+        starts = offsets[:-1]
+
+        self._bounds[nets, :2] = np.minimum.reduceat(xy, starts, axis=0)
+        self._bounds[nets, 2:] = np.maximum.reduceat(xy, starts, axis=0)
+
+        centroids = np.add.reduceat(xy, starts, axis=0) / counts[:, None]
+        distances = np.hypot(*(xy - np.repeat(centroids, counts, axis=0)).T)
+        self._star[nets] = np.add.reduceat(distances, starts)
+
+        self._mst[nets] = [mst_length(xy[start:start + count])
+                           for start, count in zip(starts, counts)]
+
+    def bounds(self):
+        '''Returns an array of the (min_x, min_y, max_x, max_y) bounds of the
+        pads of every net.'''
+
+        self.update()
+        return self._bounds
+
+    def hpwl(self):
+        '''Returns the half perimeter wire length of every net.'''
+
+        bounds = self.bounds()
+        hpwl = bounds[:, 2] - bounds[:, 0] + bounds[:, 3] - bounds[:, 1]
+        return np.nan_to_num(hpwl)
+
+    def star(self):
+        '''Returns the length of a star from the centroid of the pads to
+        every pad for every net.'''
+
+        self.update()
+        return self._star
+
+    def mst(self):
+        '''Returns the length of the minimum spanning tree of the pads of
+        every net.'''
+
+        self.update()
+        return self._mst
+
+    def total(self, model='hpwl'):
+        '''Returns the sum over all nets of the metric called model.'''
+
+        return float(np.sum(getattr(self, model)()))
+
+
+def mst_length(xy):
+    '''Returns the length of the minimum spanning tree of the points xy.'''
+
+    if len(xy) == 2:
+        return float(np.hypot(*(xy[1] - xy[0])))
+
+    # Coincident points are connected at no cost, but csgraph treats a
+    # distance of zero as a missing edge
+    xy = np.unique(xy, axis=0)
+    if len(xy) < 2:
+        return 0.0
+
+    delta = xy[:, None, :] - xy[None, :, :]
+    distances = np.hypot(delta[..., 0], delta[..., 1])
+    return float(minimum_spanning_tree(distances).sum())
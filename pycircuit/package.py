@@ -2,6 +2,7 @@ import math
 import numpy as np
 from shapely import affinity
 from shapely.geometry import Point, Polygon
+from pycircuit.registry import Registry, registry
 
 
 class Pad(object):
@@ -234,7 +235,7 @@ class Package(object):
     '''Package represents a IC package. Packages are registered when imported
     from library.'''
 
-    packages = []
+    packages = Registry()
 
     def __init__(self, name, courtyard, pads,
                  package_size=(5, 5), pad_size=(1, 1),
@@ -242,6 +243,7 @@ class Package(object):
         self.name = name
         self.courtyard = courtyard
         self.pads = []
+        self._pads_by_name = {}
         self.package_size = package_size
         self.pad_size = pad_size
         self.pad_shape = pad_shape
@@ -262,11 +264,10 @@ class Package(object):
             pad.drill = self.pad_drill
 
         self.pads.append(pad)
+        self._pads_by_name.setdefault(pad.name, pad)
 
     def pad_by_name(self, name):
-        for pad in self.pads:
-            if pad.name == name:
-                return pad
+        return self._pads_by_name.get(name)
 
     def size(self):
         bounds = self.courtyard.polygon.bounds
@@ -301,19 +302,24 @@ class Package(object):
     def package_by_name(cls, name):
         '''Returns the Package with name from registered packages.'''
 
-        for pkg in cls.packages:
-            if pkg.name == name:
-                return pkg
+        package = registry(cls, 'packages').get(name)
+        if package is None:
+            raise IndexError('No Package with name ' + name)
+        return package
+
+    @classmethod
+    def lazy(cls, name, factory):
+        '''Register a Package that is built by calling factory with name
+        when it is looked up.'''
 
-        raise IndexError('No Package with name ' + name)
+        registry(cls, 'packages').defer(name, factory)
 
     @classmethod
     def register_package(cls, package):
         '''Register a Package.'''
 
-        try:
-            cls.package_by_name(package.name)
+        packages = registry(cls, 'packages')
+        if packages.get(package.name) is not None:
             raise Exception(
                 'Package with name %s already exists' % package.name)
-        except IndexError:
-            cls.packages.append(package)
+        packages.append(package)
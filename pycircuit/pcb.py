@@ -1,10 +1,13 @@
 import numpy as np
-import shapely.ops as ops
+import shapely
+from shapely import affinity
 from shapely.geometry import Point, Polygon
 from pycircuit.circuit import Netlist
 from pycircuit.device import Device
 from pycircuit.outline import Outline, OutlineDesignRules
 from pycircuit.layers import Layers
+from pycircuit.metrics import Metrics
+from pycircuit.spatial import SpatialIndex
 from pycircuit.traces import NetClass, TraceDesignRules, Segment, Via
 
 
@@ -42,16 +45,25 @@ class Matrix(object):
     def transform(geometry, matrix):
         '''Returns a new shapely geometry transformed with matrix.'''
 
-        def apply_matrix(xs, ys):
-            res_xs, res_ys = [], []
-            for x, y in zip(xs, ys):
-                vec = np.array([x, y, 1])
-                res = matrix.dot(np.array([x, y, 1]))
-                res_xs.append(res[0])
-                res_ys.append(res[1])
-            return (res_xs, res_ys)
+        return affinity.affine_transform(geometry, [
+            matrix[0, 0], matrix[0, 1], matrix[1, 0], matrix[1, 1],
+            matrix[0, 2], matrix[1, 2]])
 
-        return ops.transform(apply_matrix, geometry)
+    @staticmethod
+    def transform_all(geometries, matrices):
+        '''Returns an array of new shapely geometries where every geometry
+        is transformed with the matrix at the same index.  The coordinates
+        of all geometries are transformed in one NumPy operation.'''
+
+        geometries = np.array(geometries, dtype=object)
+        matrices = np.asarray(matrices, dtype=float)
+        coords, index = shapely.get_coordinates(geometries, return_index=True)
+
+        # Affine part of every coordinate's matrix
+        m = matrices[index]
+        coords = np.einsum('nij,nj->ni', m[:, :2, :2], coords) + m[:, :2, 2]
+
+        return shapely.set_coordinates(geometries.copy(), coords)
 
     @staticmethod
     def inst_matrix(x, y, angle, flip):
@@ -64,16 +76,113 @@ class Matrix(object):
 
 
 class AbsolutePad(object):
-    def __init__(self, inst, pad, matrix):
+    def __init__(self, inst, pad, location):
         self.inst = inst
         self.pad = pad
-        self.location = matrix.dot(pad.location)
+        self.location = location
         self.size = pad.size
 
     def __repr__(self):
         return 'pad %s %s' % (self.inst.name, self.pad.name)
 
 
+class PadTable(object):
+    '''Absolute locations, sizes and layers of all pads on a Pcb.
+
+    Pads are stored in NumPy arrays ordered by inst.  The pads of the i-th
+    inst are in the slice inst_ptr[i]:inst_ptr[i + 1], net_ptr/net_pads is
+    a CSR adjacency from nets to their pads in the order of the net's
+    assigns.  layer is the index of the routing layer of a pad or -1 for
+    through hole pads.'''
+
+    def __init__(self, pcb):
+        self.pcb = pcb
+        self.insts = list(pcb.netlist.insts)
+        self.nets = list(pcb.netlist.nets)
+        self.inst_index = {inst: i for i, inst in enumerate(self.insts)}
+        self.net_index = {net: i for i, net in enumerate(self.nets)}
+        self.layer_index = {
+            rlayer.layer: i
+            for i, rlayer in enumerate(pcb.attributes.layers.routing_layers)}
+
+        self.pads = []
+        self.pad_index = {}
+        self.inst_ptr = [0]
+        for inst in self.insts:
+            self.pads += inst.device.package.pads
+            self.inst_ptr.append(len(self.pads))
+        self.inst_ptr = np.array(self.inst_ptr, dtype=np.int64)
+
+        self.local = np.array([pad.location for pad in self.pads],
+                              dtype=float).reshape(-1, 3)
+        self.location = self.local.copy()
+        self.size = np.array([pad.size for pad in self.pads],
+                             dtype=float).reshape(-1, 2)
+        self.drilled = np.array([pad.drill is not None for pad in self.pads],
+                                dtype=bool)
+        self.layer = np.full(len(self.pads), -1, dtype=np.int64)
+        self.inst = np.repeat(np.arange(len(self.insts)),
+                              np.diff(self.inst_ptr))
+
+        self.net = np.full(len(self.pads), -1, dtype=np.int64)
+        net_pads = []
+        self.net_ptr = [0]
+        for i, net in enumerate(self.nets):
+            for assign in net.assigns:
+                for pad in assign.inst.device.pads_by_pin(assign.pin):
+                    if pad is not None:
+                        k = self.index(assign.inst, pad)
+                        self.net[k] = i
+                        net_pads.append(k)
+            self.net_ptr.append(len(net_pads))
+        self.net_ptr = np.array(self.net_ptr, dtype=np.int64)
+        self.net_pads = np.array(net_pads, dtype=np.int64)
+
+        for inst in self.insts:
+            self.update(inst)
+
+    def __len__(self):
+        return len(self.pads)
+
+    def index(self, inst, pad):
+        '''Returns the index of pad of inst.'''
+
+        package = inst.device.package
+        if package not in self.pad_index:
+            self.pad_index[package] = {pad: n
+                                       for n, pad in enumerate(package.pads)}
+        start = self.inst_ptr[self.inst_index[inst]]
+        return start + self.pad_index[package][pad]
+
+    def by_inst(self, inst):
+        '''Returns the slice of the pads of inst.'''
+
+        i = self.inst_index[inst]
+        return slice(self.inst_ptr[i], self.inst_ptr[i + 1])
+
+    def by_net(self, net):
+        '''Returns the indices of the pads connected to net.'''
+
+        i = self.net_index[net]
+        return self.net_pads[self.net_ptr[i]:self.net_ptr[i + 1]]
+
+    def update(self, inst):
+        '''Updates the locations and layers of the pads of inst after it
+        was placed.'''
+
+        attrs = inst.attributes
+        matrix = np.identity(3) if attrs.matrix is None else attrs.matrix
+        pads = self.by_inst(inst)
+
+        self.location[pads] = self.local[pads].dot(matrix.T)
+        self.layer[pads] = np.where(self.drilled[pads], -1,
+                                    self.layer_index[attrs.layer.layer])
+
+    def absolute_pad(self, k):
+        return AbsolutePad(self.insts[self.inst[k]], self.pads[k],
+                           self.location[k].copy())
+
+
 class NetAttributes(object):
     def __init__(self, net, net_class, pcb):
         self.net = net
@@ -87,15 +196,22 @@ class NetAttributes(object):
     def iter_pads(self):
         '''Iterator over all coordinates belonging to the net.'''
 
-        for assign in self.net.assigns:
-            for pad in assign.inst.attributes.pads_by_pin(assign.pin):
-                yield pad
+        pads = self.pcb.pads
+        for k in pads.by_net(self.net):
+            yield pads.absolute_pad(k)
+
+    def pad_locations(self):
+        '''Returns an array of the (x, y) coordinates of the net's pads.'''
+
+        pads = self.pcb.pads
+        return pads.location[pads.by_net(self.net), :2]
 
     def bounds(self):
         '''Returns a tuple (min_x, min_y, max_x, max_y) of all the coordinates
         connected by the net.  Useful for placement algorithms.'''
 
-        return asMultiPoint(list(self.pad_locations())).bounds
+        locations = self.pad_locations()
+        return (*locations.min(axis=0), *locations.max(axis=0))
 
     def size(self):
         '''Returns a tuple (width, height) of the net.  Useful for placement
@@ -154,16 +270,20 @@ class InstAttributes(object):
         self.matrix = None
 
     def iter_pads(self):
-        for pad in self.inst.device.package.pads:
-            yield AbsolutePad(self.inst, pad, self.matrix)
+        pads = self.pcb.pads
+        inst_pads = pads.by_inst(self.inst)
+        for k in range(inst_pads.start, inst_pads.stop):
+            yield pads.absolute_pad(k)
 
     def pad_by_name(self, name):
         pad = self.inst.device.package.pad_by_name(name)
-        return AbsolutePad(self.inst, pad, self.matrix)
+        return self.pcb.pads.absolute_pad(self.pcb.pads.index(self.inst, pad))
 
     def pads_by_pin(self, pin):
+        pads = self.pcb.pads
         for pad in self.inst.device.pads_by_pin(pin):
-            yield AbsolutePad(self.inst, pad, self.matrix)
+            if pad is not None:
+                yield pads.absolute_pad(pads.index(self.inst, pad))
 
     def courtyard(self):
         crtyd = self.inst.device.package.courtyard.polygon
@@ -172,12 +292,18 @@ class InstAttributes(object):
     def place(self, layer, x, y, angle=0):
         '''Places the node.'''
 
+        self.layer.remove_inst(self.inst)
+
         self.layer = layer
         self.angle = angle
         self.x = x
         self.y = y
         self.matrix = Matrix.inst_matrix(x, y, angle, layer.flip)
-        layer.insts.append(self.inst)
+        layer.add_inst(self.inst)
+
+        if self.pcb.pads is not None:
+            self.pcb.pads.update(self.inst)
+        self.pcb.notify('inst_placed', self.inst)
 
     def to_object(self):
         return {
@@ -233,6 +359,10 @@ class Pcb(object):
         self.outline = outline
         self.attributes = attributes
         self.net_classes = [attributes.trace_design_rules.to_netclass()]
+        self.pads = None
+        self.listeners = []
+        self._metrics = None
+        self._spatial_index = None
 
         if _init:
             for inst in self.netlist.insts:
@@ -243,6 +373,49 @@ class Pcb(object):
                 self.net_classes.append(nc)
                 NetAttributes(net, nc, self)
 
+            self.pads = PadTable(self)
+
+    def add_listener(self, listener):
+        '''Adds a listener that is notified about changes of the Pcb.  A
+        listener implements methods named like the events it handles:
+        inst_placed(inst), segment_added(segment), segment_removed(segment),
+        via_added(via) and via_removed(via).'''
+
+        self.listeners.append(listener)
+
+    def notify(self, event, *args):
+        for listener in self.listeners:
+            handler = getattr(listener, event, None)
+            if handler is not None:
+                handler(*args)
+
+    def metrics(self):
+        '''Returns the Metrics of the Pcb, which are kept up to date while
+        insts are placed.'''
+
+        if self._metrics is None:
+            self._metrics = Metrics(self)
+        return self._metrics
+
+    def spatial_index(self):
+        '''Returns the SpatialIndex of the Pcb, which is kept up to date
+        while insts are placed and segments and vias are added or
+        removed.'''
+
+        if self._spatial_index is None:
+            self._spatial_index = SpatialIndex(self)
+        return self._spatial_index
+
+    def courtyards(self, insts=None):
+        '''Returns an array of the courtyards of insts transformed to
+        their location on the pcb.  insts defaults to all insts.'''
+
+        if insts is None:
+            insts = self.netlist.insts
+        return Matrix.transform_all(
+            [inst.device.package.courtyard.polygon for inst in insts],
+            [inst.attributes.matrix for inst in insts])
+
     def net_class_by_uid(self, uid):
         for nc in self.net_classes:
             if nc.uid == uid:
@@ -299,4 +472,5 @@ class Pcb(object):
             net_obj = obj['nets'][net.name]
             NetAttributes.from_object(net_obj, net, pcb)
 
+        pcb.pads = PadTable(pcb)
         return pcb
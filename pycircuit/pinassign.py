@@ -1,5 +1,19 @@
-import uuid
-from z3 import And, Or, Implies, Int, Distinct, Solver, sat
+import hashlib
+import json
+import os
+from pycircuit.component import BusFun
+
+
+class PinAssignmentError(Exception):
+    '''Raised when no valid Pin assignment exists.  meta is the meta
+    data of the first conflicting Z3Assign if it is known.'''
+
+    def __init__(self, message, meta=None):
+        super().__init__(message, meta)
+        self.meta = meta
+
+    def __str__(self):
+        return self.args[0]
 
 
 class Z3Assign(object):
@@ -9,12 +23,19 @@ class Z3Assign(object):
 
         self.constraints = []
 
-        _uuid = uuid.uuid4()
-        self.z3_fun = Int(str(_uuid) + '_fun')
-        self.z3_pin = Int(str(_uuid) + '_pin')
-        self.z3_bus = Int(str(_uuid) + '_bus')
+    def declare(self, ctx, name):
+        '''Declares the Z3 variables of the assign in ctx.'''
+
+        from z3 import Int
+
+        self.constraints = []
+        self.z3_fun = Int(name + '_fun', ctx)
+        self.z3_pin = Int(name + '_pin', ctx)
+        self.z3_bus = Int(name + '_bus', ctx)
 
     def component_constraint(self, component):
+        from z3 import And, Or, Implies, BoolVal
+
         self.component = component
 
         fun_constraints = []
@@ -29,6 +50,8 @@ class Z3Assign(object):
             self.constraints.append(Implies(self.z3_fun == fun.id,
                                             And(self.z3_bus == fun.bus_id,
                                                 self.z3_pin == fun.pin.id)))
+        if len(fun_constraints) == 0:
+            fun_constraints.append(BoolVal(False, self.z3_fun.ctx))
         self.constraints.append(Or(fun_constraints))
 
     def eval(self, model):
@@ -45,9 +68,6 @@ class Z3Assign(object):
 
 class Z3BusAssign(object):
     def __init__(self, *assigns):
-        _uuid = uuid.uuid4()
-        self.z3_bus = Int(str(_uuid) + '_bus')
-
         self.assigns = []
         self.constraints = []
 
@@ -55,9 +75,19 @@ class Z3BusAssign(object):
             self.add_assign(assign)
 
     def add_assign(self, assign):
-        # All assignments in a BusAssign need to have a the same bus
         self.assigns.append(assign)
-        self.constraints.append(self.z3_bus == assign.z3_bus)
+
+    def declare(self, ctx, name):
+        '''Declares the Z3 variables of the bus assign in ctx.  The
+        assigns need to be declared first.'''
+
+        from z3 import Int
+
+        self.z3_bus = Int(name + '_bus', ctx)
+
+        # All assignments in a BusAssign need to have a the same bus
+        self.constraints = [self.z3_bus == assign.z3_bus
+                            for assign in self.assigns]
 
     def eval(self, model):
         self.bus = model[self.z3_bus].as_long()
@@ -67,24 +97,90 @@ class Z3BusAssign(object):
             yield assig
 
 
+def match(candidates, num_pins):
+    '''Returns a maximum matching of assigns to pins using the
+    Hopcroft-Karp algorithm.
+
+    candidates[i] are the pin ids assign i can be matched to.  Returns the
+    matched pin id of every assign or None.
+    '''
+
+    assign_pin = [None] * len(candidates)
+    pin_assign = [None] * num_pins
+
+    def augment(i, dist):
+        for pin in candidates[i]:
+            j = pin_assign[pin]
+            if j is None or (dist[j] == dist[i] + 1 and augment(j, dist)):
+                assign_pin[i] = pin
+                pin_assign[pin] = i
+                return True
+        dist[i] = None
+        return False
+
+    while True:
+        # Breadth first search for the layers of shortest augmenting paths
+        dist = [None] * len(candidates)
+        queue = [i for i, pin in enumerate(assign_pin) if pin is None]
+        for i in queue:
+            dist[i] = 0
+
+        found = False
+        for i in queue:
+            for pin in candidates[i]:
+                j = pin_assign[pin]
+                if j is None:
+                    found = True
+                elif dist[j] is None:
+                    dist[j] = dist[i] + 1
+                    queue.append(j)
+
+        if not found:
+            return assign_pin
+
+        for i in range(len(candidates)):
+            if assign_pin[i] is None:
+                augment(i, dist)
+
+
 class AssignmentProblem(object):
     def __init__(self, component, assigns):
         self.component = component
         self.assigns = []
         self.bus_assigns = []
         self.constraints = []
+        self.ctx = None
 
         for bus_assign in assigns:
             if isinstance(bus_assign, Z3Assign):
                 bus_assign = Z3BusAssign(bus_assign)
+            self.bus_assigns.append(bus_assign)
+
+            for assign in bus_assign:
+                assign.component = component
+                self.assigns.append(assign)
+
+    def declare(self):
+        '''Declares the Z3 variables and constraints of the problem.'''
+
+        from z3 import Context, Distinct
+
+        # Every problem has it's own Z3 context and deterministic variable
+        # names, so that solving the same problem always yields the same
+        # solution, independent of what was solved before in the process.
+        self.ctx = Context()
+        self.constraints = []
+
+        for i, bus_assign in enumerate(self.bus_assigns):
+            for j, assign in enumerate(bus_assign):
+                assign.declare(self.ctx, 'a%d_%d' % (i, j))
+            bus_assign.declare(self.ctx, 'b%d' % i)
 
             self.constraints += bus_assign.constraints
-            self.bus_assigns.append(bus_assign)
 
             for assign in bus_assign:
-                assign.component_constraint(component)
+                assign.component_constraint(self.component)
                 self.constraints += assign.constraints
-                self.assigns.append(assign)
 
         # Each assignment needs a different Fun
         self.constraints.append(
@@ -98,20 +194,54 @@ class AssignmentProblem(object):
         self.constraints.append(
             Distinct([bus_assign.z3_bus for bus_assign in self.bus_assigns]))
 
-    def solve(self):
-        s = Solver()
+    def is_matching(self):
+        '''Returns True when the problem has no bus constraints.  It is a
+        bipartite matching of assigns to pins then.'''
+
+        for bus_assign in self.bus_assigns:
+            if len(bus_assign.assigns) > 1:
+                return False
 
-        s.add(And(self.constraints))
+        for assign in self.assigns:
+            for fun in self.component.funs_by_function(assign.function):
+                if isinstance(fun, BusFun):
+                    return False
+        return True
 
-        if not s.check() == sat:
-            print('Problem:')
-            self.print_problem()
-            print('Constraints:')
-            for constraint in self.constraints:
-                print(constraint)
-            raise Exception('unsat')
+    def solve(self, incremental=False):
+        '''Solves the problem.
+
+        Problems without bus constraints are solved by matching assigns
+        to pins, problems with bus constraints by solve_busses.  Z3 is
+        used when solve_busses fails, to solve the problem with a single
+        Z3 check or to report why it is unsat.
+
+        In incremental mode the assigns are added one by one, so that the
+        first assign that makes the problem unsat can be reported.
+        '''
+
+        if self.is_matching():
+            self.solve_matching(incremental)
+            return
+
+        if self.solve_busses():
+            return
+
+        from z3 import And, Solver, sat
+
+        self.declare()
+
+        if incremental:
+            model = self.solve_incremental()
+        else:
+            s = Solver(ctx=self.ctx)
+            s.add(And(self.constraints))
 
-        model = s.model()
+            if not s.check() == sat:
+                self.print_unsat()
+                raise PinAssignmentError('unsat')
+
+            model = s.model()
 
         for assign in self.assigns:
             assign.eval(model)
@@ -119,6 +249,222 @@ class AssignmentProblem(object):
         for bus_assign in self.bus_assigns:
             bus_assign.eval(model)
 
+    def solve_matching(self, incremental=False):
+        '''Solves a problem without bus constraints by matching.'''
+
+        funs = [self.funs_by_pin(assign) for assign in self.assigns]
+        candidates = [list(funs_by_pin) for funs_by_pin in funs]
+
+        num_pins = len(self.component.pins)
+        pins = match(candidates, num_pins)
+        if None in pins:
+            self.print_problem()
+            if not incremental:
+                raise PinAssignmentError('unsat')
+            # The first assign that leaves any assign of its prefix
+            # unmatched is the first conflicting assign.  The matching may
+            # drop an earlier assign instead of the last one.
+            for i, assign in enumerate(self.assigns):
+                if None in match(candidates[:i + 1], num_pins):
+                    raise PinAssignmentError(
+                        'unsat: first conflicting assign %s' % repr(assign),
+                        assign.meta)
+
+        for assign, funs_by_pin, pin in zip(self.assigns, funs, pins):
+            assign.fun = funs_by_pin[pin]
+            assign.pin = assign.fun.pin
+            assign.bus = assign.fun.bus_id
+
+        for bus_assign in self.bus_assigns:
+            bus_assign.bus = bus_assign.assigns[0].bus
+
+    def funs_by_pin(self, assign, bus=None):
+        '''Returns a dict from Pin id to the Fun an assign can use on the
+        Pin.  When bus is not None only Fun's of the bus are considered.'''
+
+        funs_by_pin = {}
+        for fun in self.component.funs_by_function(assign.function):
+            if bus is None or fun.bus_id == bus:
+                funs_by_pin.setdefault(fun.pin.id, fun)
+        return funs_by_pin
+
+    def bus_classes(self):
+        '''Returns the busses of the component grouped into classes of
+        interchangeable busses.
+
+        Two busses are interchangeable when their Pin's have no Fun's of
+        other busses and offer the same functions.  Exchanging the Pin's of
+        the two busses maps every solution to another solution.'''
+
+        pins_by_bus = {}
+        for fun in self.component.funs:
+            if isinstance(fun, BusFun):
+                pins_by_bus.setdefault(fun.bus_id, []).append(fun.pin)
+
+        classes = {}
+        for bus, pins in sorted(pins_by_bus.items()):
+            offers = []
+            for pin in pins:
+                if any(isinstance(fun, BusFun) and not fun.bus_id == bus
+                       for fun in pin.funs):
+                    # Pin is shared with another bus
+                    offers = bus
+                    break
+                offers.append(tuple(sorted(fun.function for fun in pin.funs)))
+            else:
+                offers = tuple(sorted(offers))
+            classes.setdefault(offers, []).append(bus)
+        return list(classes.values())
+
+    def solve_busses(self, limit=10000):
+        '''Solves a problem with bus constraints without Z3.
+
+        Bus assigns requesting the same functions are interchangeable, and
+        so are the busses in a bus class.  Instead of choosing a bus for
+        every bus assign, the search chooses how many bus assigns of each
+        kind use busses of each class and takes the first unused busses of
+        a class.  Assigns are matched to the Pin's of their busses to check
+        a choice.
+
+        Returns False when the problem has bus assigns of non BusFun
+        functions or no solution was found within limit choices.
+        '''
+
+        kinds = {}
+        free = []
+        for bus_assign in self.bus_assigns:
+            funs = [list(self.component.funs_by_function(assign.function))
+                    for assign in bus_assign]
+            is_bus = [isinstance(fun, BusFun) for f in funs for fun in f]
+            if all(is_bus) and all(funs):
+                functions = tuple(sorted(assign.function
+                                         for assign in bus_assign))
+                kinds.setdefault(functions, []).append(bus_assign)
+            elif len(bus_assign.assigns) == 1 and not any(is_bus):
+                free.append(bus_assign)
+            else:
+                return False
+
+        # Busses offering all functions of a kind
+        kinds = list(kinds.items())
+        busses = []
+        for functions, bus_assigns in kinds:
+            bus_ids = None
+            for function in functions:
+                ids = {fun.bus_id
+                       for fun in self.component.funs_by_function(function)}
+                bus_ids = ids if bus_ids is None else bus_ids & ids
+            busses.append(bus_ids)
+
+        classes = self.bus_classes()
+        num_pins = len(self.component.pins)
+        chosen = []
+        used = set()
+        choices = [0]
+
+        def check(final):
+            entries = [(assign, self.funs_by_pin(assign, bus))
+                       for bus_assign, bus in chosen
+                       for assign in bus_assign]
+            if final:
+                entries += [(bus_assign.assigns[0],
+                             self.funs_by_pin(bus_assign.assigns[0]))
+                            for bus_assign in free]
+            pins = match([list(funs_by_pin) for _, funs_by_pin in entries],
+                         num_pins)
+            if None in pins:
+                return None
+            return [(assign, funs_by_pin[pin])
+                    for (assign, funs_by_pin), pin in zip(entries, pins)]
+
+        def counts(n, sizes):
+            if len(sizes) == 0:
+                if n == 0:
+                    yield ()
+                return
+            for k in range(min(n, sizes[0]), -1, -1):
+                for rest in counts(n - k, sizes[1:]):
+                    yield (k,) + rest
+
+        def search(k):
+            choices[0] += 1
+            if choices[0] > limit:
+                return None
+
+            solution = check(k == len(kinds))
+            if solution is None or k == len(kinds):
+                return solution
+
+            bus_assigns = kinds[k][1]
+            pools = [[bus for bus in cls if bus not in used]
+                     for cls in classes if cls[0] in busses[k]]
+            for count in counts(len(bus_assigns), [len(p) for p in pools]):
+                ids = [bus for pool, n in zip(pools, count)
+                       for bus in pool[:n]]
+                chosen.extend(zip(bus_assigns, ids))
+                used.update(ids)
+
+                solution = search(k + 1)
+                if solution is not None:
+                    return solution
+
+                del chosen[len(chosen) - len(ids):]
+                used.difference_update(ids)
+            return None
+
+        solution = search(0)
+        if solution is None:
+            return False
+
+        for assign, fun in solution:
+            assign.fun = fun
+            assign.pin = fun.pin
+            assign.bus = fun.bus_id
+
+        for bus_assign in self.bus_assigns:
+            bus_assign.bus = bus_assign.assigns[0].bus
+        return True
+
+    def solve_incremental(self):
+        '''Returns a model of the problem.  Raises a PinAssignmentError
+        with the first conflicting assign when the problem is unsat.'''
+
+        from z3 import Distinct, Solver, sat
+
+        s = Solver(ctx=self.ctx)
+        assigns = []
+        bus_assigns = []
+        model = None
+
+        for bus_assign in self.bus_assigns:
+            bus_assigns.append(bus_assign)
+            for assign, bus_constraint in zip(bus_assign,
+                                              bus_assign.constraints):
+                assigns.append(assign)
+                s.add(bus_constraint, *assign.constraints)
+
+                # The Distinct constraints change with every assign
+                s.push()
+                s.add(Distinct([a.z3_fun for a in assigns]),
+                      Distinct([a.z3_pin for a in assigns]),
+                      Distinct([b.z3_bus for b in bus_assigns]))
+                if not s.check() == sat:
+                    self.print_unsat()
+                    raise PinAssignmentError(
+                        'unsat: first conflicting assign %s' % repr(assign),
+                        assign.meta)
+                model = s.model()
+                s.pop()
+
+        return model
+
+    def print_unsat(self):
+        print('Problem:')
+        self.print_problem()
+        print('Constraints:')
+        for constraint in self.constraints:
+            print(constraint)
+
     def check_solution(self):
         pins = set()
         funs = set()
@@ -151,3 +497,87 @@ class AssignmentProblem(object):
         for i, assign in enumerate(self.assigns):
             print('pin: %s func: %s assign: %s' %
                   (assign.fun.pin.id, str(assign.fun), str(i)))
+
+
+class AssignmentCache(object):
+    '''Cache of solved pin assignments.
+
+    Solutions are keyed by the Component and the signature of the requested
+    functions, so that insts of the same Component requesting the same
+    functions with the same bus grouping share a solution.  When path is
+    given the cache is loaded from and saved to a json file.'''
+
+    version = 1
+
+    def __init__(self, path=None):
+        self.path = path
+        self.solutions = {}
+        self.fingerprints = {}
+
+        if path is not None and os.path.exists(path):
+            self.load()
+
+    @staticmethod
+    def signature(requests):
+        '''Returns the signature of (function, group) requests and the
+        canonical order of the requests.
+
+        The signature is the sorted tuple of the sorted functions of every
+        group.  order[i] is the index in requests of the i-th request in
+        canonical order.'''
+
+        groups = {}
+        for i, (function, group) in enumerate(requests):
+            groups.setdefault(group, []).append(i)
+
+        def functions(group):
+            return tuple(requests[i][0] for i in group)
+
+        groups = sorted((sorted(group, key=lambda i: requests[i][0])
+                         for group in groups.values()),
+                        key=lambda group: (functions(group), group))
+
+        signature = tuple(functions(group) for group in groups)
+        order = [i for group in groups for i in group]
+        return signature, order
+
+    def fingerprint(self, component):
+        '''Returns a hash of the pins and functions of a Component.'''
+
+        if component not in self.fingerprints:
+            self.fingerprints[component] = \
+                hashlib.sha1(repr(component).encode('utf-8')).hexdigest()
+        return self.fingerprints[component]
+
+    def key(self, component, signature):
+        return (component.name, self.fingerprint(component), signature)
+
+    def get(self, key):
+        '''Returns the Pin ids of a solution in canonical order or None.'''
+
+        return self.solutions.get(key)
+
+    def put(self, key, pins):
+        self.solutions[key] = list(pins)
+
+    def load(self):
+        with open(self.path) as f:
+            obj = json.loads(f.read())
+
+        if obj.get('version') != self.version:
+            return
+
+        for name, fingerprint, signature, pins in obj['solutions']:
+            signature = tuple(tuple(group) for group in signature)
+            self.solutions[(name, fingerprint, signature)] = pins
+
+    def save(self):
+        solutions = [[name, fingerprint, signature, pins]
+                     for (name, fingerprint, signature), pins
+                     in self.solutions.items()]
+
+        with open(self.path, 'w+') as f:
+            f.write(json.dumps({
+                'version': self.version,
+                'solutions': solutions,
+            }, sort_keys=True))
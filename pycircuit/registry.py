@@ -0,0 +1,123 @@
+class Registry(list):
+    '''List of registered Component's, Package's or Device's indexed by
+    name.  When multiple parts have the same name the first one registered
+    is found.
+
+    Parts can be deferred by registering a factory for a name.  The factory
+    is called with the name to build the part when it is looked up or the
+    registry is iterated.'''
+
+    def __init__(self, parts=()):
+        super().__init__()
+        self.by_name = {}
+        self.deferred = {}
+
+        self.extend(parts)
+
+    def __iter__(self):
+        self.load()
+        return super().__iter__()
+
+    def append(self, part):
+        # A deferred part with the same name was registered first
+        if part.name in self.deferred:
+            self.get(part.name)
+
+        super().append(part)
+        self._index(part)
+
+    def extend(self, parts):
+        for part in parts:
+            self.append(part)
+
+    def defer(self, name, factory):
+        '''Registers factory to build the part with name.'''
+
+        if name not in self.by_name:
+            self.deferred.setdefault(name, factory)
+
+    def _index(self, part):
+        self.by_name.setdefault(part.name, part)
+
+    def _build(self, name):
+        factory = self.deferred.pop(name, None)
+        if factory is not None:
+            factory(name)
+
+    def get(self, name):
+        '''Returns the part with name or None.'''
+
+        self._build(name)
+        return self.by_name.get(name)
+
+    def load(self):
+        '''Builds all deferred parts.'''
+
+        while len(self.deferred) > 0:
+            self.get(next(iter(self.deferred)))
+
+    def discard_deferred(self):
+        '''Forgets all deferred parts without building them.'''
+
+        self.deferred.clear()
+
+
+class DeviceRegistry(Registry):
+    '''Registry of Device's that is also indexed by Component.
+
+    Deferred devices are built together with all deferred devices of the
+    same Component, so that devices_by_component returns them in the
+    order they were registered.'''
+
+    def __init__(self, parts=()):
+        self.by_component = {}
+        self.deferred_by_component = {}
+        self.deferred_component = {}
+
+        super().__init__(parts)
+
+    def append(self, device):
+        self.load_component(device.component.name)
+        super().append(device)
+
+    def defer(self, name, factory, component):
+        '''Registers factory to build the device with name for the
+        Component called component.'''
+
+        if name not in self.by_name and name not in self.deferred:
+            super().defer(name, factory)
+            self.deferred_by_component.setdefault(component, []).append(name)
+            self.deferred_component[name] = component
+
+    def _index(self, device):
+        super()._index(device)
+        self.by_component.setdefault(device.component, []).append(device)
+
+    def _build(self, name):
+        component = self.deferred_component.get(name)
+        if component is not None:
+            self.load_component(component)
+
+    def load_component(self, component):
+        '''Builds all deferred devices of the Component called
+        component.'''
+
+        for name in self.deferred_by_component.pop(component, ()):
+            del self.deferred_component[name]
+            super()._build(name)
+
+    def discard_deferred(self):
+        super().discard_deferred()
+        self.deferred_by_component.clear()
+        self.deferred_component.clear()
+
+
+def registry(cls, attr, ty=Registry):
+    '''Returns the registry in the class attribute attr of cls.  A list
+    assigned to the attribute is converted to a registry of type ty.'''
+
+    parts = getattr(cls, attr)
+    if not isinstance(parts, ty):
+        parts = ty(parts)
+        setattr(cls, attr, parts)
+    return parts
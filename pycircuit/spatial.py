@@ -0,0 +1,299 @@
+import math
+import numpy as np
+from shapely import affinity
+from shapely.geometry import LineString, Point, box
+from pycircuit.layers import Layer
+
+
+class Feature(object):
+    '''A geometry on a layer of the Pcb.
+
+    kind is one of 'pad', 'courtyard', 'segment' or 'via'.  item is the
+    index of the pad in the PadTable, the Inst of the courtyard, the Segment
+    or the Via.  net is the Net the feature is connected to or None.'''
+
+    __slots__ = ('kind', 'item', 'net', 'geometry', 'bounds')
+
+    def __init__(self, kind, item, net, geometry):
+        self.kind = kind
+        self.item = item
+        self.net = net
+        self.geometry = geometry
+        self.bounds = geometry.bounds
+
+    def __repr__(self):
+        return '%s %r' % (self.kind, self.item)
+
+
+class GridIndex(object):
+    '''Uniform grid hash of Feature's.  A feature is stored in every cell
+    its bounds overlap, so features can be inserted and removed in time
+    proportional to their size.'''
+
+    def __init__(self, cell_size):
+        self.cell_size = cell_size
+        self.cells = {}
+        self.extent = None
+
+    def __len__(self):
+        return len(self.features())
+
+    def features(self):
+        '''Returns the set of all features.'''
+
+        return set().union(*self.cells.values())
+
+    def cell(self, x, y):
+        return (math.floor(x / self.cell_size),
+                math.floor(y / self.cell_size))
+
+    def cell_range(self, bounds):
+        x0, y0 = self.cell(bounds[0], bounds[1])
+        x1, y1 = self.cell(bounds[2], bounds[3])
+        return x0, y0, x1, y1
+
+    def insert(self, feature):
+        x0, y0, x1, y1 = self.cell_range(feature.bounds)
+        for i in range(x0, x1 + 1):
+            for j in range(y0, y1 + 1):
+                self.cells.setdefault((i, j), set()).add(feature)
+
+        if self.extent is None:
+            self.extent = [x0, y0, x1, y1]
+        else:
+            self.extent = [min(self.extent[0], x0), min(self.extent[1], y0),
+                           max(self.extent[2], x1), max(self.extent[3], y1)]
+
+    def remove(self, feature):
+        x0, y0, x1, y1 = self.cell_range(feature.bounds)
+        for i in range(x0, x1 + 1):
+            for j in range(y0, y1 + 1):
+                cell = self.cells.get((i, j))
+                if cell is not None:
+                    cell.discard(feature)
+                    if len(cell) == 0:
+                        del self.cells[(i, j)]
+
+    def query(self, bounds):
+        '''Returns the set of features whose bounds intersect bounds.'''
+
+        found = set()
+        x0, y0, x1, y1 = self.cell_range(bounds)
+        # Large queries visit the occupied cells instead of the whole range
+        if (x1 - x0 + 1) * (y1 - y0 + 1) > len(self.cells):
+            cells = [cell for (i, j), cell in self.cells.items()
+                     if x0 <= i <= x1 and y0 <= j <= y1]
+        else:
+            cells = [self.cells[(i, j)]
+                     for i in range(x0, x1 + 1) for j in range(y0, y1 + 1)
+                     if (i, j) in self.cells]
+
+        for cell in cells:
+            for feature in cell:
+                b = feature.bounds
+                if b[0] <= bounds[2] and bounds[0] <= b[2] and \
+                   b[1] <= bounds[3] and bounds[1] <= b[3]:
+                    found.add(feature)
+        return found
+
+    def nearest(self, x, y, accept=None):
+        '''Returns a tuple (feature, distance) of the feature closest to
+        x, y for which accept(feature) is True or (None, inf).'''
+
+        best, best_distance = None, math.inf
+        if self.extent is None:
+            return best, best_distance
+
+        point = Point(x, y)
+        cx, cy = self.cell(x, y)
+        max_ring = max(cx - self.extent[0], self.extent[2] - cx,
+                       cy - self.extent[1], self.extent[3] - cy)
+        seen = set()
+        ring = 0
+        while ring <= max_ring:
+            for key in ring_cells(cx, cy, ring):
+                for feature in self.cells.get(key, ()):
+                    if feature in seen:
+                        continue
+                    seen.add(feature)
+                    if accept is not None and not accept(feature):
+                        continue
+                    distance = feature.geometry.distance(point)
+                    if distance < best_distance:
+                        best, best_distance = feature, distance
+            # Features in cells outside of the ring are at least ring cells
+            # away from x, y
+            if best_distance <= ring * self.cell_size:
+                break
+            ring += 1
+        return best, best_distance
+
+
+def ring_cells(cx, cy, ring):
+    '''Iterator over the cells at Chebyshev distance ring from cx, cy.'''
+
+    if ring == 0:
+        yield cx, cy
+        return
+    for i in range(cx - ring, cx + ring + 1):
+        yield i, cy - ring
+        yield i, cy + ring
+    for j in range(cy - ring + 1, cy + ring):
+        yield cx - ring, j
+        yield cx + ring, j
+
+
+class SpatialIndex(object):
+    '''Spatial index over the pads, courtyards, segments and vias of a Pcb
+    with one GridIndex per Layer.
+
+    Through hole pads and vias are indexed on every routing layer they
+    pass through, courtyards on the layer of the inst's placement layer.
+    The index listens to the Pcb and is updated when insts are placed or
+    segments and vias are added or removed.'''
+
+    def __init__(self, pcb, cell_size=1.0):
+        self.pcb = pcb
+        self.cell_size = cell_size
+
+        layers = pcb.attributes.layers
+        self.grids = {}
+        for rlayer in layers.routing_layers:
+            self.grids[rlayer.layer] = GridIndex(cell_size)
+        for player in layers.placement_layers:
+            self.grids.setdefault(player.layer, GridIndex(cell_size))
+
+        self.features = {}
+        self.pad_shapes = {}
+
+        for inst in pcb.netlist.insts:
+            self.inst_placed(inst)
+        for rlayer in layers.routing_layers:
+            for segment in rlayer.segments:
+                self.segment_added(segment)
+        for net in pcb.netlist.nets:
+            for via in net.attributes.vias:
+                self.via_added(via)
+
+        pcb.add_listener(self)
+
+    def grid(self, layer):
+        '''Returns the GridIndex of layer.  layer is a Layer, a
+        RoutingLayer, a PlacementLayer or the name of a layer.'''
+
+        layer = getattr(layer, 'layer', layer)
+        if not isinstance(layer, Layer):
+            for l in self.grids:
+                if l.name == layer:
+                    return self.grids[l]
+            raise IndexError('No layer %s' % layer)
+        return self.grids[layer]
+
+    def add(self, key, layers, feature):
+        for layer in layers:
+            self.grids[layer].insert(feature)
+        self.features.setdefault(key, []).append((layers, feature))
+
+    def remove(self, key):
+        for layers, feature in self.features.pop(key, ()):
+            for layer in layers:
+                self.grids[layer].remove(feature)
+
+    def package_pad_shapes(self, package):
+        '''Returns the shapes of the pads of package in package
+        coordinates.'''
+
+        if package not in self.pad_shapes:
+            shapes = []
+            for pad in package.pads:
+                x, y = pad.location[0], pad.location[1]
+                if pad.size is None:
+                    shape = Point(x, y)
+                elif pad.shape == 'circle':
+                    shape = Point(x, y).buffer(pad.size[0] / 2)
+                else:
+                    w, h = pad.size[0] / 2, pad.size[1] / 2
+                    shape = affinity.rotate(box(x - w, y - h, x + w, y + h),
+                                            pad.angle, origin=(x, y))
+                shapes.append(shape)
+            self.pad_shapes[package] = shapes
+        return self.pad_shapes[package]
+
+    def inst_placed(self, inst):
+        # pycircuit.pcb imports this module
+        from pycircuit.pcb import Matrix
+
+        self.remove(inst)
+
+        attrs = inst.attributes
+        matrix = np.identity(3) if attrs.matrix is None else attrs.matrix
+
+        pads = self.pcb.pads
+        inst_pads = pads.by_inst(inst)
+        package = inst.device.package
+        # The pads followed by the courtyard
+        shapes = self.package_pad_shapes(package) + \
+            [package.courtyard.polygon]
+        shapes = Matrix.transform_all(shapes,
+                                      np.broadcast_to(matrix,
+                                                      (len(shapes), 3, 3)))
+        routing_layers = [rlayer.layer for rlayer in
+                          self.pcb.attributes.layers.routing_layers]
+        for k, shape in zip(range(inst_pads.start, inst_pads.stop),
+                            shapes[:-1]):
+            net = pads.nets[pads.net[k]] if pads.net[k] >= 0 else None
+            layer = pads.layer[k]
+            layers = routing_layers if layer < 0 else [routing_layers[layer]]
+            self.add(inst, layers, Feature('pad', k, net, shape))
+
+        self.add(inst, [attrs.layer.layer],
+                 Feature('courtyard', inst, None, shapes[-1]))
+
+    def segment_added(self, segment):
+        line = LineString([segment.start[0:2], segment.end[0:2]])
+        self.add(segment, [segment.layer.layer],
+                 Feature('segment', segment, segment.net,
+                         line.buffer(segment.width / 2)))
+
+    def via_added(self, via):
+        shape = Point(via.position[0:2]).buffer(via.diameter / 2)
+        self.add(via, [rlayer.layer for rlayer in via.layers],
+                 Feature('via', via, via.net, shape))
+
+    def segment_removed(self, segment):
+        self.remove(segment)
+
+    def via_removed(self, via):
+        self.remove(via)
+
+    def query(self, layer, bounds, kinds=None, exact=True):
+        '''Returns a list of the features on layer intersecting bounds
+        (min_x, min_y, max_x, max_y) or a shapely geometry.  kinds limits
+        the result to features of the given kinds.  When exact is False the
+        features whose bounds intersect are returned.'''
+
+        geometry = None
+        if hasattr(bounds, 'bounds'):
+            geometry, bounds = bounds, bounds.bounds
+        elif exact:
+            geometry = box(*bounds)
+
+        features = []
+        for feature in self.grid(layer).query(bounds):
+            if kinds is not None and feature.kind not in kinds:
+                continue
+            if exact and not feature.geometry.intersects(geometry):
+                continue
+            features.append(feature)
+        return features
+
+    def nearest(self, layer, x, y, kinds=None, accept=None):
+        '''Returns a tuple (feature, distance) of the feature on layer
+        closest to x, y.  kinds and accept filter the features.'''
+
+        def _accept(feature):
+            if kinds is not None and feature.kind not in kinds:
+                return False
+            return accept is None or accept(feature)
+
+        return self.grid(layer).nearest(x, y, _accept)
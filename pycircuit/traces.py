@@ -1,3 +1,5 @@
+import numpy as np
+from shapely.geometry import Point
 from pycircuit.circuit import UID
 
 
@@ -106,6 +108,7 @@ class Segment(object):
 
         self.net.attributes.segments.append(self)
         self.layer.segments.append(self)
+        self.net.attributes.pcb.notify('segment_added', self)
 
     def __getattr__(self, attr):
         if attr == 'width':
@@ -116,6 +119,13 @@ class Segment(object):
     def __str__(self):
         return '%s %s' % (str(self.start), str(self.end))
 
+    def remove(self):
+        '''Removes the segment from its net and layer.'''
+
+        self.net.attributes.segments.remove(self)
+        self.layer.segments.remove(self)
+        self.net.attributes.pcb.notify('segment_removed', self)
+
     def check(self, design_rules):
         # TODO: check clearance and edge_clearance
         if self.width < design_rules.min_width:
@@ -142,13 +152,15 @@ class Via(object):
         self.net = net
 
         self.position = position
+        self.layers = list(routable_layers)
 
         self.is_blind = False
         self.is_burried = False
 
         self.net.attributes.vias.append(self)
-        for layer in layers:
+        for layer in self.layers:
             layer.vias.append(self)
+        self.net.attributes.pcb.notify('via_added', self)
 
     def __getattr__(self, attr):
         if attr == 'drill':
@@ -160,6 +172,14 @@ class Via(object):
         for layer in self.layers:
             yield layer
 
+    def remove(self):
+        '''Removes the via from its net and layers.'''
+
+        self.net.attributes.vias.remove(self)
+        for layer in self.layers:
+            layer.vias.remove(self)
+        self.net.attributes.pcb.notify('via_removed', self)
+
     def check(self, design_rules):
         # TODO: check clearance and edge_clearance
         if self.drill < design_rules.min_drill:
@@ -185,7 +205,6 @@ class Via(object):
     @classmethod
     def from_object(cls, obj, pcb):
         net = pcb.netlist.net_by_uid(obj['net'])
-        net_class = pcb.net_class_by_uid(obj['net_class'])
-        layers = [pcb.attributes.layers.rlayer_by_name(name)
-                  for layer in obj['layers']]
-        return cls(net, net_class, np.array(obj['x'], obj['y']), rlayers)
+        rlayers = [pcb.attributes.layers.rlayer_by_name(name)
+                   for name in obj['layers']]
+        return cls(net, np.array([obj['x'], obj['y']]), rlayers)
@@ -79,8 +79,8 @@ class Router(object):
         nets = []
         for net in pcb.netlist.nets:
             nets.append([])
-            for pad in net.attributes.iter_pads():
-                nets[-1].append(pos_to_grid(*pad.location[0:2]))
+            for x, y in net.attributes.pad_locations():
+                nets[-1].append(pos_to_grid(x, y))
         # for inst in self.netlist.insts:
         #    for pad in inst.attributes.iter_pads():
         #        loc = grid(pad.location[0] - pad.size[0] / 2,
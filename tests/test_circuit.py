@@ -33,6 +33,49 @@ class CircuitTests(unittest.TestCase):
         assert str(s1) == 'SubCircuit'
         assert repr(s1) == 'subinst SubCircuit of SubCircuit {\n}\n'
 
+    def test_subinst_lookup(self):
+        circuit = Circuit('SubCircuit')
+        port = Port('p', PortType.IN, _parent=circuit)
+        net = Net('n', _parent=circuit)
+        inst = Inst('R', _parent=circuit)
+        SubInst(circuit)
+        assert self.circuit.port_by_uid(port.uid) == port
+        assert self.circuit.net_by_uid(net.uid) == net
+        assert self.circuit.inst_by_uid(inst.uid) == inst
+        # Only ports of the circuit itself are looked up by name
+        assert self.circuit.port_by_name('p') is None
+
+        # Elements added after instantiation are visible too
+        net2 = Net('n2', _parent=circuit)
+        assert self.circuit.net_by_uid(net2.uid) == net2
+
+    def test_hierarchy(self):
+        r1 = Inst('R')
+        circuit = Circuit('SubCircuit')
+        r2 = Inst('R', _parent=circuit)
+        subinst = SubInst(circuit)
+        assert list(self.circuit.iter_insts()) == [r1, r2]
+        assert list(self.circuit.iter_subinsts()) == [subinst]
+
+        # Adding an element to a subcircuit invalidates the hierarchy
+        r3 = Inst('R', _parent=circuit)
+        assert list(self.circuit.iter_insts()) == [r1, r2, r3]
+
+    def test_subinst_membership(self):
+        r1 = Inst('R')
+        inner = Circuit('Inner')
+        r2 = Inst('R', _parent=inner)
+        outer = Circuit('Outer')
+        s1 = SubInst(inner, _parent=outer)
+        s2 = SubInst(outer)
+        assert r1.subinsts == ()
+        assert r2.subinsts == ((s2.uid, 'Outer'), (s1.uid, 'Inner'))
+
+        # Membership survives flattening
+        c1 = Circuit.from_object(self.circuit.to_object())
+        assert [inst.subinsts for inst in c1.insts] == \
+            [r1.subinsts, r2.subinsts]
+
     def test_assign_inst_to_net(self):
         n1 = Net('n1')
         r1 = Inst('R')
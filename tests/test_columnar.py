@@ -0,0 +1,57 @@
+import unittest
+from pycircuit.circuit import *
+from pycircuit.columnar import ColumnarNetlist
+from pycircuit.library import *
+
+
+class ColumnarNetlistTests(unittest.TestCase):
+    def setUp(self):
+        # n1 - R1 - n2 - R2 - n3
+        #             \- Q1 (B)
+        self.netlist = Netlist('ColumnarTests')
+        n1, n2, n3 = [Net(name, _parent=self.netlist)
+                      for name in ('n1', 'n2', 'n3')]
+        r1 = Inst('R', _parent=self.netlist)
+        r2 = Inst('R', _parent=self.netlist)
+        q1 = Inst('Q', _parent=self.netlist)
+        for inst, function, net in [(r1, '~', n1), (r1, '~', n2),
+                                    (r2, '~', n2), (r2, '~', n3),
+                                    (q1, 'B', n2)]:
+            InstAssign(inst, function, net, _parent=self.netlist)
+        for inst in (r1, r2, q1):
+            for pin, assign in zip(inst.component.pins, inst.assigns):
+                assign.pin = pin
+                assign.type = pin.type
+        # R2 and Q1 are part of a subcircuit
+        r2.subinsts = ((10, 'Outer'), (11, 'Stage'))
+        q1.subinsts = ((10, 'Outer'),)
+
+    def test_roundtrip(self):
+        columnar = ColumnarNetlist.from_netlist(self.netlist)
+        assert len(columnar) == 5
+        assert columnar.to_object() == self.netlist.to_object()
+        assert ColumnarNetlist.from_object(columnar.to_object()) \
+            .to_object() == self.netlist.to_object()
+
+        netlist = columnar.to_netlist()
+        assert netlist.to_object() == self.netlist.to_object()
+        assert [inst.subinsts for inst in netlist.insts] == \
+            [inst.subinsts for inst in self.netlist.insts]
+
+    def test_adjacency(self):
+        columnar = ColumnarNetlist.from_netlist(self.netlist)
+        assert list(columnar.net_degree()) == [1, 3, 1]
+        assert list(columnar.inst_degree()) == [2, 2, 1]
+        assert list(columnar.assigns_by_net(1)) == [1, 2, 4]
+        assert list(columnar.assigns_by_inst(1)) == [2, 3]
+
+    def test_partner(self):
+        columnar = ColumnarNetlist.from_netlist(self.netlist)
+        assert list(columnar.net_partner()) == [-1] * 5
+        assert list(columnar.inst_partner()) == [1, 0, 3, 2, -1]
+
+    def test_erc_types(self):
+        columnar = ColumnarNetlist.from_netlist(self.netlist)
+        expected = [ERCType.from_type(assign.type).value
+                    for assign in self.netlist.iter_assigns()]
+        assert list(columnar.erc_types()) == expected
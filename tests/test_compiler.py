@@ -0,0 +1,132 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+import pycircuit.compiler
+from pycircuit.build import Builder
+from pycircuit.circuit import *
+from pycircuit.compiler import Compiler
+from pycircuit.pinassign import PinAssignmentError
+from pycircuit.component import *
+
+Component('UART MCU', 'Microcontroller with 4 UARTs',
+          *[Pin('GPIO%d' % i, Fun('GPIO'),
+                BusFun('UART%d' % (i // 2), 'UART_RX' if i % 2 else 'UART_TX'))
+            for i in range(8)])
+
+
+class CompilerTests(unittest.TestCase):
+    def setUp(self):
+        self.circuit = Circuit('CompilerTests')
+        Circuit.active_circuit = self.circuit
+
+        self.insts = []
+        for i in range(4):
+            inst = Inst('UART MCU')
+            tx, rx, gpio = nets('tx rx gpio')
+            inst['UART_TX', 'UART_RX'] = tx, rx
+            inst['GPIO'] = gpio
+            self.insts.append(inst)
+
+    def pins(self):
+        return [[assign.pin.id for assign in inst.assigns]
+                for inst in self.insts]
+
+    def test_assign_pins(self):
+        Compiler().assign_all_pins(self.insts)
+        for inst in self.insts:
+            tx, rx, gpio = [assign.pin for assign in inst.assigns]
+            assert tx.id // 2 == rx.id // 2
+            assert gpio not in (tx, rx)
+
+    def test_parallel_assign_pins(self):
+        # Insts requesting different functions are distinct problems
+        self.insts = []
+        for i in range(4):
+            inst = Inst('UART MCU')
+            for k in range(i):
+                inst['UART_TX', 'UART_RX'] = nets('tx rx')
+            inst['GPIO'] = Net('gpio')
+            self.insts.append(inst)
+
+        Compiler().assign_all_pins(self.insts)
+        serial = self.pins()
+        for inst in self.insts:
+            for assign in inst.assigns:
+                assign.pin = None
+
+        with mock.patch.object(pycircuit.compiler, 'ProcessPoolExecutor',
+                               wraps=pycircuit.compiler.ProcessPoolExecutor
+                               ) as pool:
+            Compiler(workers=2).assign_all_pins(self.insts)
+            assert pool.called
+        assert self.pins() == serial
+
+    def test_pin_error(self):
+        # The UART pair is solved after the GPIOs in canonical order
+        inst = Inst('UART MCU')
+        inst['UART_TX', 'UART_RX'] = nets('tx rx')
+        for i in range(7):
+            inst['GPIO'] = Net('gpio%d' % i)
+
+        with self.assertRaises(PinAssignmentError) as error:
+            Compiler(incremental=True).assign_all_pins([inst])
+        assert error.exception.meta == 0
+        assert str(error.exception) == \
+            'unsat: first conflicting assign UART_TX = tx'
+
+    def test_pin_cache(self):
+        compiler = Compiler()
+        compiler.assign_all_pins(self.insts)
+        assert len(compiler.pin_cache.solutions) == 1
+        # All insts request the same functions and share a solution
+        pins = self.pins()
+        assert all(p == pins[0] for p in pins)
+
+    def test_pin_cache_file(self):
+        with tempfile.TemporaryDirectory() as d:
+            path = os.path.join(d, 'pins.cache')
+            Compiler(pin_cache=path).assign_all_pins(self.insts)
+            serial = self.pins()
+
+            compiler = Compiler(pin_cache=path)
+            assert len(compiler.pin_cache.solutions) == 1
+            # Rebuilds don't call the solver
+            with mock.patch.object(Compiler, 'solve_pins'):
+                compiler.assign_all_pins(self.insts)
+                assert not Compiler.solve_pins.called
+            assert self.pins() == serial
+
+    def test_builder_pin_cache(self):
+        with tempfile.TemporaryDirectory() as d:
+            builddir = os.path.join(d, 'build')
+            Builder(self.circuit, builddir=builddir).compile()
+            assert not os.path.exists(os.path.join(builddir, 'pins.cache'))
+
+            path = os.path.join(d, 'pins.cache')
+            Builder(self.circuit, builddir=builddir, pin_cache=path).clean()
+            Builder(self.circuit, builddir=builddir, pin_cache=path).compile()
+            assert os.path.exists(path)
+
+    def test_compile_ports(self):
+        circuit = Circuit('Top')
+        sub = Circuit('Sub')
+        Circuit.active_circuit = sub
+        p, q = Port('p', PortType.IN), Port('q', PortType.OUT)
+        inst = Inst('UART MCU')
+        inst['GPIO'] = p.internal_net()
+        inst['GPIO'] = q.internal_net()
+        Circuit.active_circuit = circuit
+        SubInst(sub)['p'] = Net('n')
+
+        with tempfile.TemporaryDirectory() as d:
+            net_in = os.path.join(d, 'in.net')
+            net_out = os.path.join(d, 'out.net')
+            circuit.to_file(net_in)
+            circuit = Compiler().compile(net_in, net_out)
+
+        # The unconnected port of the subcircuit is a port of the circuit
+        assert [port.name for port in circuit.ports] == ['q']
+        assert circuit.port_by_name('q') is circuit.ports[0]
+        assert circuit.port_by_uid(circuit.ports[0].uid) is circuit.ports[0]
+        assert circuit.port_by_name('p') is None
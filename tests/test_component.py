@@ -74,3 +74,19 @@ class ComponentTests(unittest.TestCase):
         gpio_1 = cmp.pin_by_name('GPIO_1')
         assert gpio_1.name == 'GPIO_1'
         assert len(gpio_1.funs) == 2
+
+    def test_funs_by_function(self):
+        cmp = Component('UART MCU 2', 'Microcontroller',
+                        Pin('GPIO_1', Fun('GPIO'), BusFun('UART0', 'UART_TX')),
+                        Pin('GPIO_2', Fun('GPIO'), BusFun('UART0', 'UART_RX')),
+                        Pin('GPIO_3', Fun('GPIO'), BusFun('UART1', 'UART_TX')))
+
+        assert [fun.pin.name for fun in cmp.funs_by_function('GPIO')] \
+            == ['GPIO_1', 'GPIO_2', 'GPIO_3']
+        assert [fun.bus for fun in cmp.funs_by_function('UART_TX')] \
+            == ['UART0', 'UART1']
+        assert list(cmp.funs_by_function('SPI_MOSI')) == []
+        assert cmp.has_function('UART_RX')
+        assert cmp.is_busfun('UART_RX')
+        assert not cmp.is_busfun('GPIO')
+        assert cmp.pin_by_name('GPIO_4') is None
@@ -13,6 +13,37 @@ class DeviceTests(unittest.TestCase):
                Map('1', 'A'),
                Map('2', 'B'))
 
+    def test_registry(self):
+        r0805 = Device('R0805', 'R', '0805',
+                       Map('1', 'A'),
+                       Map('2', 'B'))
+        rsot23 = Device('RSOT23', 'R', 'SOT23',
+                        Map('1', 'A'),
+                        Map('2', 'B'),
+                        Map('3', None))
+
+        assert Device.device_by_name('RSOT23') is rsot23
+        r = Component.component_by_name('R')
+        assert list(Device.devices_by_component(r)) == [r0805, rsot23]
+        with pytest.raises(Exception):
+            Device('R0805', 'R', '0805',
+                   Map('1', 'A'),
+                   Map('2', 'B'))
+
+    def test_pad_pin_maps(self):
+        device = Device('SOT23BCE', 'Q', 'SOT23',
+                        Map('1', 'B'),
+                        Map('2', 'C'),
+                        Map('3', 'E'),
+                        Map(None, 'SUBSTRATE'))
+
+        pad = device.package.pad_by_name('2')
+        pin = device.component.pin_by_name('C')
+        assert device.pin_by_pad(pad) is pin
+        assert list(device.pads_by_pin(pin)) == [pad]
+        substrate = device.component.pin_by_name('SUBSTRATE')
+        assert list(device.pads_by_pin(substrate)) == [None]
+
     def test_none_none_map(self):
         with pytest.raises(Exception):
             Map(None, None)
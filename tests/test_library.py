@@ -0,0 +1,36 @@
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SCRIPT = '''
+import pycircuit.library as library
+from pycircuit.device import Device
+print(library._cached, [device.name for device in Device.devices])
+'''
+
+
+def import_library(path):
+    env = dict(os.environ, PYCIRCUIT_LIBRARY_CACHE=path)
+    return subprocess.check_output([sys.executable, '-c', SCRIPT], env=env,
+                                   cwd=ROOT, universal_newlines=True)
+
+
+def test_library_cache(tmpdir):
+    path = str(tmpdir.join('library.cache'))
+    built = import_library(path)
+    assert os.path.exists(path)
+    loaded = import_library(path)
+
+    assert built.startswith('False')
+    assert loaded.startswith('True')
+    assert built.split(' ', 1)[1] == loaded.split(' ', 1)[1]
+
+
+def test_stale_library_cache(tmpdir):
+    path = str(tmpdir.join('library.cache'))
+    with open(path, 'wb') as f:
+        f.write(b'stale')
+    assert import_library(path).startswith('Warn')
+    assert import_library(path).startswith('True')
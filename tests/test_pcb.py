@@ -0,0 +1,295 @@
+import numpy as np
+import unittest
+from shapely.geometry import Point, Polygon
+from pycircuit.circuit import *
+from pycircuit.device import Device, Map
+from pycircuit.library import *
+from pycircuit.library.design_rules import oshpark_4layer
+from pycircuit.library.outlines import rectangle_with_mounting_holes
+from pycircuit.drc import Drc, IncrementalDrc
+from pycircuit.metrics import mst_length
+from pycircuit.pcb import Matrix, Pcb
+from pycircuit.spatial import GridIndex, Feature
+from pycircuit.traces import Segment, Via
+
+
+def device(name, component, package, *maps):
+    # The device tests reset the registered devices
+    try:
+        return Device.device_by_name(name)
+    except IndexError:
+        return Device(name, component, package, *maps)
+
+
+def pcb_fixture():
+    '''Returns a Pcb with two resistors and a transistor.
+
+    n1 - R1 - n2 - R2 - n3
+                \\- Q1 (B)
+    '''
+    netlist = Netlist('PcbTests')
+    n1, n2, n3 = [Net(name, _parent=netlist) for name in ('n1', 'n2', 'n3')]
+    r1 = Inst('R', _parent=netlist)
+    r2 = Inst('R', _parent=netlist)
+    q1 = Inst('Q', _parent=netlist)
+    for inst, function, net in [(r1, '~', n1), (r1, '~', n2),
+                                (r2, '~', n2), (r2, '~', n3),
+                                (q1, 'B', n2)]:
+        InstAssign(inst, function, net, _parent=netlist)
+    r0805 = device('PcbTests R0805', 'R', '0805', Map('1', 'A'), Map('2', 'B'))
+    sot23 = device('PcbTests SOT23', 'Q', 'SOT23',
+                   Map('1', 'B'), Map('2', 'C'), Map('3', 'E'),
+                   Map(None, 'SUBSTRATE'))
+    for inst, dev in [(r1, r0805), (r2, r0805), (q1, sot23)]:
+        inst.device = dev
+        for pin, assign in zip(inst.component.pins, inst.assigns):
+            assign.pin = pin
+            assign.type = pin.type
+
+    outline = rectangle_with_mounting_holes(30, 30, 1.7, 4, 3.2)
+    return Pcb(netlist, outline, oshpark_4layer())
+
+
+class MatrixTests(unittest.TestCase):
+    def setUp(self):
+        self.square = Polygon([(-1, 1), (1, 1), (1, -1), (-1, -1)])
+        self.matrix = Matrix.inst_matrix(3, 4, 90, True)
+
+    def test_transform(self):
+        polygon = Matrix.transform(self.square, self.matrix)
+        for (x, y), coord in zip(self.square.exterior.coords,
+                                 polygon.exterior.coords):
+            assert np.allclose(self.matrix.dot([x, y, 1])[:2], coord)
+
+    def test_transform_all(self):
+        matrices = [self.matrix, Matrix.translation(1, 2)]
+        geometries = Matrix.transform_all([self.square, Point(1, 1)],
+                                          matrices)
+        assert len(geometries) == 2
+        assert geometries[0].equals_exact(
+            Matrix.transform(self.square, self.matrix), 1e-9)
+        assert geometries[1].equals(Point(2, 3))
+
+
+class PadTableTests(unittest.TestCase):
+    def setUp(self):
+        self.pcb = pcb_fixture()
+        self.r1, self.r2, self.q1 = self.pcb.netlist.insts
+        self.top, self.bottom = self.pcb.attributes.layers.placement_layers
+
+    def test_pads(self):
+        pads = self.pcb.pads
+        assert len(pads) == 7
+        assert list(pads.inst_ptr) == [0, 2, 4, 7]
+        assert list(pads.net) == [0, 1, 1, 2, 1, -1, -1]
+        n2 = self.pcb.netlist.nets[1]
+        assert [pads.pads[k].name for k in pads.by_net(n2)] == ['2', '1', '1']
+        assert list(pads.layer) == [0] * 7
+
+    def test_place(self):
+        self.r2.attributes.place(self.bottom, 10, 5, 90)
+        pads = self.pcb.pads
+        for k, pad in zip(range(2, 4), self.r2.attributes.iter_pads()):
+            expected = self.r2.attributes.matrix.dot(pad.pad.location)
+            assert np.allclose(pads.location[k], expected)
+            assert np.allclose(pad.location, expected)
+        assert list(pads.layer[2:4]) == [3, 3]
+        assert self.bottom.insts == [self.r2]
+
+        # Placing again doesn't add the inst to a layer twice
+        self.r2.attributes.place(self.top, 10, 5)
+        assert self.top.insts == [self.r2] and self.bottom.insts == []
+
+    def test_place_layer_insts(self):
+        for inst in self.pcb.netlist.insts:
+            inst.attributes.place(self.top, 0, 0)
+        r1, r2, q = self.pcb.netlist.insts
+
+        # The last inst takes the place of the moved inst
+        r1.attributes.place(self.bottom, 0, 0)
+        assert self.top.insts == [q, r2] and self.bottom.insts == [r1]
+        assert self.top.inst_index == {q: 0, r2: 1}
+        q.attributes.place(self.bottom, 0, 0)
+        assert self.top.insts == [r2] and self.bottom.insts == [r1, q]
+
+    def test_bounds(self):
+        self.r1.attributes.place(self.top, 0, 0)
+        self.r2.attributes.place(self.top, 10, 5)
+        self.q1.attributes.place(self.top, 5, 10)
+        n2 = self.pcb.netlist.nets[1]
+        locations = [pad.location[:2] for pad in n2.attributes.iter_pads()]
+        min_x, min_y = np.min(locations, axis=0)
+        max_x, max_y = np.max(locations, axis=0)
+        assert np.allclose(n2.attributes.bounds(),
+                           (min_x, min_y, max_x, max_y))
+
+
+class MetricsTests(unittest.TestCase):
+    def setUp(self):
+        self.pcb = pcb_fixture()
+        self.r1, self.r2, self.q1 = self.pcb.netlist.insts
+        self.top = self.pcb.attributes.layers.placement_layers[0]
+        self.r1.attributes.place(self.top, 0, 0)
+        self.r2.attributes.place(self.top, 10, 5)
+        self.q1.attributes.place(self.top, 5, 10)
+
+    def check(self, metrics):
+        for i, net in enumerate(self.pcb.netlist.nets):
+            assert np.isclose(metrics.hpwl()[i],
+                              net.attributes.half_perimeter_length())
+            xy = net.attributes.pad_locations()
+            star = np.hypot(*(xy - xy.mean(axis=0)).T).sum()
+            assert np.isclose(metrics.star()[i], star)
+
+    def test_metrics(self):
+        metrics = self.pcb.metrics()
+        self.check(metrics)
+        # n1 and n3 have a single pad
+        assert list(metrics.mst()[[0, 2]]) == [0, 0]
+        xy = self.pcb.netlist.nets[1].attributes.pad_locations()
+        assert np.isclose(metrics.mst()[1], mst_length(xy))
+
+    def test_incremental(self):
+        metrics = self.pcb.metrics()
+        metrics.update()
+        self.q1.attributes.place(self.top, 20, -3)
+        assert list(metrics.dirty) == [False, True, False]
+        self.check(metrics)
+        assert not metrics.dirty.any()
+
+
+class SpatialIndexTests(unittest.TestCase):
+    def setUp(self):
+        self.pcb = pcb_fixture()
+        self.r1, self.r2, self.q1 = self.pcb.netlist.insts
+        self.top, self.bottom = self.pcb.attributes.layers.placement_layers
+        self.r1.attributes.place(self.top, 0, 0)
+        self.r2.attributes.place(self.top, 10, 5)
+        self.q1.attributes.place(self.bottom, 5, 10)
+        self.index = self.pcb.spatial_index()
+
+    def test_query(self):
+        features = self.index.query('top', (-3, -3, 3, 3))
+        assert {f.item for f in features} == {self.r1, 0, 1}
+        # Between the pads of R1
+        assert self.index.query(self.top, (-0.1, -0.1, 0.1, 0.1),
+                                kinds=('pad',)) == []
+        # Q1 is on the bottom layer
+        pads = self.index.query('bottom', self.q1.attributes.courtyard(),
+                                kinds=('pad',))
+        assert sorted(f.item for f in pads) == [4, 5, 6]
+
+    def test_nearest(self):
+        feature, distance = self.index.nearest('top', 10.95, 9, ('pad',))
+        # The pads of the 0805 package are rotated by 90 degrees
+        assert feature.item == 3 and np.isclose(distance, 9 - 5 - 0.75)
+        assert self.index.nearest('inner1', 0, 0) == (None, np.inf)
+
+    def test_incremental(self):
+        self.r2.attributes.place(self.top, 0, 5)
+        feature, _ = self.index.nearest('top', 0, 5, ('courtyard',))
+        assert feature.item is self.r2
+        assert self.index.query('top', (9, 4, 11, 6)) == []
+
+        n2 = self.pcb.netlist.nets[1]
+        rlayers = self.pcb.attributes.layers.routing_layers
+        segment = Segment(n2, np.array([0.95, 0, 1]),
+                          np.array([0.95, 20, 1]), rlayers[0])
+        via = Via(n2, np.array([0.95, 20]), rlayers)
+        features = self.index.query(rlayers[0], (0.9, 19, 1, 21))
+        assert {f.item for f in features} == {segment, via}
+        assert [f.item for f in self.index.query('bottom', (0, 19, 2, 21))] \
+            == [via]
+
+
+class DrcTests(unittest.TestCase):
+    def setUp(self):
+        self.pcb = pcb_fixture()
+        self.r1, self.r2, self.q1 = self.pcb.netlist.insts
+        self.top, self.bottom = self.pcb.attributes.layers.placement_layers
+        self.r1.attributes.place(self.top, 10, 10)
+        self.r2.attributes.place(self.top, 20, 10)
+        self.q1.attributes.place(self.top, 15, 20)
+
+    def test_clean(self):
+        assert len(Drc(self.pcb).run()) == 0
+
+    def test_clearance(self):
+        # The pad of R2 on n3 is 0.1mm from the pad of R1 on n2
+        self.r2.attributes.place(self.top, 10 + 1.9 + 1.3 + 0.1, 10, 180)
+        report = Drc(self.pcb, workers=2).run()
+        clearance = report.by_rule('clearance')
+        assert len(clearance) == 1
+        assert sorted(f.item for f in clearance[0].features) == [1, 3]
+        assert clearance[0].descriptions == ('pad R.2', 'pad R.2')
+        assert np.isclose(clearance[0].actual, 0.1)
+        assert clearance[0].layer.name == 'top'
+        assert report.count() == {'clearance': 1, 'courtyard_overlap': 1}
+
+        # Pads on the same net don't need clearance
+        self.r2.attributes.place(self.top, 10 + 1.9 + 1.3 + 0.1, 10)
+        assert len(Drc(self.pcb).run().by_rule('clearance')) == 0
+
+    def test_edge_clearance(self):
+        self.q1.attributes.place(self.top, 15, 29)
+        report = Drc(self.pcb).run()
+        assert report.count() == {'edge_clearance': 2}
+        assert [v.descriptions for v in report] == \
+            [('pad Q.1',), ('pad Q.2',)]
+
+    def test_traces(self):
+        n1, n2, n3 = self.pcb.netlist.nets
+        rlayers = self.pcb.attributes.layers.routing_layers
+        Segment(n1, np.array([5, 12]), np.array([25, 12]), rlayers[3])
+        n2.attributes.net_class._via_diameter = 0.3
+        Via(n2, np.array([15, 12.2]), rlayers)
+        report = Drc(self.pcb).run()
+        assert report.count() == {'annular_ring': 1, 'clearance': 1}
+        assert report.by_rule('clearance')[0].layer.name == 'bottom'
+        assert report.to_object()['violations'][0]['features'] == \
+            ['via n2']
+
+    def test_incremental(self):
+        def violations(report):
+            return sorted((v.rule, str(v.layer), sorted(v.descriptions),
+                           round(float(v.actual), 6)) for v in report)
+
+        drc = IncrementalDrc(self.pcb)
+        assert len(drc.report()) == 0
+
+        n1, n2, n3 = self.pcb.netlist.nets
+        rlayers = self.pcb.attributes.layers.routing_layers
+        segment = Segment(n1, np.array([5, 10]), np.array([25, 10]),
+                          rlayers[0])
+        via = Via(n3, np.array([15, 10.3]), rlayers)
+        self.q1.attributes.place(self.top, 20, 11)
+        self.r1.attributes.place(self.top, 10, 29)
+        report = drc.report()
+        assert len(report) > 0
+        assert violations(report) == violations(Drc(self.pcb).run())
+
+        segment.remove()
+        via.remove()
+        self.r1.attributes.place(self.top, 10, 10)
+        assert violations(drc.report()) == violations(Drc(self.pcb).run())
+        assert via not in self.pcb.spatial_index().features
+
+
+def test_grid_index():
+    grid = GridIndex(1.0)
+    a = Feature('pad', 0, None, Point(0.5, 0.5).buffer(2))
+    b = Feature('pad', 1, None, Point(10, 10))
+    grid.insert(a)
+    grid.insert(b)
+    assert len(grid) == 2
+    assert grid.query((2, 2, 3, 3)) == {a}
+    assert grid.nearest(8, 8) == (b, np.hypot(2, 2))
+    grid.remove(a)
+    assert grid.query((-2, -2, 3, 3)) == set()
+    assert grid.nearest(0, 0)[0] is b
+
+
+def test_mst_length():
+    xy = np.array([[0, 0], [3, 0], [3, 4], [3, 0]], dtype=float)
+    assert np.isclose(mst_length(xy), 7)
+    assert mst_length(xy[:1]) == 0
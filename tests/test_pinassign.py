@@ -1,4 +1,6 @@
+import pytest
 import unittest
+from unittest import mock
 from pycircuit.component import *
 from pycircuit.pinassign import *
 
@@ -15,6 +17,11 @@ Component('MCU', 'Microcontroller',
           Pin('GPIO3', Fun('GPIO'), BusFun('UART1', 'UART_RX'))
           )
 
+Component('AB', 'Two pins sharing a function',
+          Pin('A', Fun('a'), Fun('x')),
+          Pin('B', Fun('a'), Fun('y'))
+          )
+
 Component('3x0806', '2 Resistors and one Capacitor',
           Pin('P1.1', BusFun('P1', '~'), BusFun('P1', '+'), BusFun('P1', '-')),
           Pin('P1.2', BusFun('P1', '~'), BusFun('P1', '+'), BusFun('P1', '-')),
@@ -24,6 +31,11 @@ Component('3x0806', '2 Resistors and one Capacitor',
           Pin('P3.2', BusFun('P3', '~'), BusFun('P3', '+'), BusFun('P3', '-')),
           )
 
+Component('UART16', 'Microcontroller with 16 UARTs',
+          *[Pin('GPIO%d' % i, Fun('GPIO'),
+                BusFun('UART%d' % (i // 2), 'UART_RX' if i % 2 else 'UART_TX'))
+            for i in range(32)])
+
 
 class PinAssignTests(unittest.TestCase):
     def test_obvious_assign(self):
@@ -87,3 +99,132 @@ class PinAssignTests(unittest.TestCase):
         problem.solve()
         problem.print_solution()
         assert problem.check_solution() is None
+
+    def test_incremental_assign(self):
+        component = Component.component_by_name('MCU')
+        problem = AssignmentProblem(component, (
+            Z3Assign('GPIO', 0),
+            Z3BusAssign(
+                Z3Assign('UART_TX', 1),
+                Z3Assign('UART_RX', 2)
+            ),
+            Z3Assign('VCC', 3)
+        ))
+
+        problem.solve(incremental=True)
+        assert problem.check_solution() is None
+
+    def test_incremental_conflict(self):
+        component = Component.component_by_name('MCU')
+        problem = AssignmentProblem(component, (
+            Z3Assign('UART_TX', 0),
+            Z3Assign('UART_TX', 1),
+            Z3Assign('UART_TX', 2),
+            Z3Assign('VCC', 3)
+        ))
+
+        with pytest.raises(PinAssignmentError) as error:
+            problem.solve(incremental=True)
+        assert error.value.meta == 2
+
+    def test_matching_assign(self):
+        component = Component.component_by_name('MCU')
+        problem = AssignmentProblem(component, (
+            Z3Assign('GPIO', 0),
+            Z3Assign('GPIO', 1),
+            Z3Assign('GPIO', 2),
+            Z3Assign('VCC', 3)
+        ))
+
+        assert problem.is_matching()
+        problem.solve()
+        assert problem.ctx is None
+        assert problem.check_solution() is None
+
+    def test_matching_conflict(self):
+        component = Component.component_by_name('MCU')
+        problem = AssignmentProblem(component, (
+            Z3Assign('VCC', 0),
+            Z3Assign('GPIO', 1),
+            Z3Assign('VCC', 2),
+            Z3Assign('GPIO', 3)
+        ))
+
+        with pytest.raises(PinAssignmentError) as error:
+            problem.solve(incremental=True)
+        assert error.value.meta == 2
+
+    def test_matching_incremental_assign(self):
+        component = Component.component_by_name('MCU')
+        problem = AssignmentProblem(component, (
+            Z3Assign('GPIO', 0),
+            Z3Assign('GPIO', 1),
+            Z3Assign('VCC', 2)
+        ))
+
+        # A sat problem is matched once
+        with mock.patch('pycircuit.pinassign.match', wraps=match) as spy:
+            problem.solve(incremental=True)
+        assert spy.call_count == 1
+        assert problem.check_solution() is None
+
+    def test_matching_no_assigns(self):
+        component = Component.component_by_name('R')
+        for incremental in (False, True):
+            problem = AssignmentProblem(component, ())
+            problem.solve(incremental=incremental)
+            assert problem.check_solution() is None
+
+    def test_matching_conflict_unmatches_earlier(self):
+        # Matching y can leave the earlier a unmatched instead
+        component = Component.component_by_name('AB')
+        problem = AssignmentProblem(component, (
+            Z3Assign('a', 0),
+            Z3Assign('x', 1),
+            Z3Assign('y', 2)
+        ))
+
+        with pytest.raises(PinAssignmentError) as error:
+            problem.solve(incremental=True)
+        assert error.value.meta == 2
+
+    def test_symmetric_bus_assign(self):
+        component = Component.component_by_name('UART16')
+        problem = AssignmentProblem(component, [
+            Z3BusAssign(Z3Assign('UART_TX', 2 * i),
+                        Z3Assign('UART_RX', 2 * i + 1))
+            for i in range(15)
+        ] + [Z3Assign('GPIO', 30), Z3Assign('GPIO', 31)])
+
+        assert problem.bus_classes() == [list(range(16))]
+        assert problem.solve_busses()
+        assert problem.check_solution() is None
+
+    def test_bus_conflict(self):
+        component = Component.component_by_name('MCU')
+        problem = AssignmentProblem(component, (
+            Z3Assign('GPIO', 0),
+            Z3Assign('GPIO', 1),
+            Z3Assign('GPIO', 2),
+            Z3BusAssign(
+                Z3Assign('UART_TX', 3),
+                Z3Assign('UART_RX', 4)
+            )
+        ))
+
+        assert not problem.solve_busses()
+        with pytest.raises(PinAssignmentError):
+            problem.solve()
+
+
+def test_match():
+    # Assign 0 has to give up pin 0 for assign 1
+    assert match([[0, 1], [0]], 2) == [1, 0]
+    assert match([[0], [0]], 2) == [0, None]
+
+
+def test_assignment_signature():
+    requests = [('B', 1), ('GPIO', 2), ('A', 1), ('GPIO', 3)]
+    signature, order = AssignmentCache.signature(requests)
+    assert signature == (('A', 'B'), ('GPIO',), ('GPIO',))
+    assert order == [2, 0, 1, 3]
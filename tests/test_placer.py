@@ -0,0 +1,241 @@
+import numpy as np
+import os
+import scipy.sparse as sp
+import tempfile
+import time
+import unittest
+from shapely.geometry import Polygon
+from pycircuit.drc import Drc
+from placer.analytic import AnalyticPlacer, free_position
+from placer.anneal import AnnealPlacer
+from placer.hierarchy import HierarchicalPlacer
+from placer.partition import partition
+from placer.box import Z3Box
+from placer.place import Placer
+from z3 import Solver, sat, unsat
+from pycircuit.circuit import Inst, InstAssign, Net, Netlist
+from pycircuit.device import Map
+from pycircuit.library.design_rules import oshpark_4layer
+from pycircuit.library.outlines import rectangle_with_mounting_holes
+from pycircuit.pcb import Pcb
+from tests.test_pcb import device, pcb_fixture
+
+
+def chain_fixture(n, size, outline=None):
+    '''Returns a Pcb with a chain of n resistors on a size * size board or
+    outline.  Every fourth resistor is also connected to a bus net.'''
+
+    netlist = Netlist('PlacerTests')
+    nets = [Net('n%d' % i, _parent=netlist) for i in range(n + 1)]
+    bus = Net('bus', _parent=netlist)
+    r0805 = device('PcbTests R0805', 'R', '0805', Map('1', 'A'), Map('2', 'B'))
+    for i in range(n):
+        inst = Inst('R', _parent=netlist)
+        inst.name = 'R%d' % i
+        InstAssign(inst, '~', nets[i], _parent=netlist)
+        InstAssign(inst, '~', bus if i % 4 == 0 else nets[i + 1],
+                   _parent=netlist)
+        inst.device = r0805
+        for pin, assign in zip(inst.component.pins, inst.assigns):
+            assign.pin = pin
+            assign.type = pin.type
+
+    if outline is None:
+        outline = rectangle_with_mounting_holes(size, size, 1.7, 4, 3.2)
+    return Pcb(netlist, outline, oshpark_4layer())
+
+
+class AnalyticPlacerTests(unittest.TestCase):
+    def setUp(self):
+        self.pcb = pcb_fixture()
+
+    def test_place(self):
+        placer = AnalyticPlacer()
+        assert placer.place_pcb(self.pcb)
+
+        area = Polygon(self.pcb.outline.polygon.interiors[0])
+        for inst in self.pcb.netlist.insts:
+            crtyd = inst.attributes.courtyard()
+            assert area.contains(crtyd)
+            # Courtyards are on the grid
+            left = crtyd.bounds[0] - area.bounds[0]
+            assert np.isclose(left / placer.grid_size,
+                              round(left / placer.grid_size))
+        assert Drc(self.pcb).run().count() == {}
+
+    def test_no_space(self):
+        placer = AnalyticPlacer(grid_size=5)
+        assert not placer.place_pcb(self.pcb)
+
+    def test_large(self):
+        pcb = chain_fixture(1000, 120)
+        placer = AnalyticPlacer()
+        # The bus net is modelled as a star
+        assert len(pcb.pads.by_net(pcb.netlist.nets[-1])) > \
+            placer.star_degree
+
+        start = time.time()
+        assert placer.place_pcb(pcb)
+        assert time.time() - start < 10
+        assert 'courtyard_overlap' not in Drc(pcb).run().count()
+
+
+class AnnealPlacerTests(unittest.TestCase):
+    def place(self, **kwargs):
+        pcb = pcb_fixture()
+        placer = AnnealPlacer(moves=2000, **kwargs)
+        assert placer.place_pcb(pcb)
+        return pcb, placer
+
+    def test_place(self):
+        pcb, placer = self.place()
+        assert Drc(pcb).run().count() == {}
+        # The incrementally updated cost matches a full evaluation
+        nets = placer.net_hpwl.copy()
+        for n in range(len(nets)):
+            assert np.isclose(nets[n], placer.hpwl(n))
+        assert np.isclose(placer.net_hpwl.sum(), pcb.metrics().total())
+
+    def test_delta(self):
+        pcb, placer = self.place()
+        # Legalization moves boxes without updating the cost
+        placer.bounds = placer.scan_bounds()
+        for k in range(200):
+            undo = placer.move(1)
+            saved, cost = placer.delta(undo)
+            assert placer.bounds == placer.scan_bounds()
+            assert np.isclose(placer.total_hpwl, placer.net_hpwl.sum())
+            if k % 2:
+                placer.restore(undo, saved)
+                assert placer.bounds == placer.scan_bounds()
+
+    def test_narrow_board(self):
+        # The resistors only fit on the 3mm high board unrotated
+        outline = rectangle_with_mounting_holes(60, 5, 1, 1, 0.2)
+        pcb = chain_fixture(4, None, outline)
+        placer = AnnealPlacer(moves=2000)
+        assert placer.place_pcb(pcb)
+        assert all(inst.attributes.angle == 0 for inst in pcb.netlist.insts)
+        assert placer.occupancy.count.min() >= 0
+        assert Drc(pcb).run().count() == {}
+
+        attrs = pcb.netlist.insts[0].attributes
+        attrs.place(attrs.layer, attrs.x, attrs.y, 90)
+        assert not AnnealPlacer(start='current').place_pcb(pcb)
+
+    def test_seed(self):
+        def positions(pcb):
+            return [(inst.attributes.x, inst.attributes.y,
+                     inst.attributes.angle) for inst in pcb.netlist.insts]
+
+        assert positions(self.place(seed=1)[0]) == \
+            positions(self.place(seed=1)[0])
+
+    def test_start_current(self):
+        pcb = pcb_fixture()
+        AnalyticPlacer().place_pcb(pcb)
+        hpwl = pcb.metrics().total()
+        AnnealPlacer(moves=500, start='current', initial_temperature=0,
+                     seed=2).place_pcb(pcb)
+        assert pcb.metrics().total() <= hpwl + 1e-9
+
+
+class HierarchicalPlacerTests(unittest.TestCase):
+    def setUp(self):
+        self.pcb = pcb_fixture()
+        r1, r2, q = self.pcb.netlist.insts
+        # Two channels of one resistor and a nested channel with a Q
+        r1.subinsts = ((100, 'Channel'),)
+        r2.subinsts = ((101, 'Channel'),)
+        q.subinsts = ((102, 'Outer'), (103, 'Inner'))
+
+    def test_place(self):
+        placer = HierarchicalPlacer(workers=1)
+        assert placer.place_pcb(self.pcb)
+        # Both channels share a placement
+        assert placer.num_layouts == 3
+
+        area = Polygon(self.pcb.outline.polygon.interiors[0])
+        for inst in self.pcb.netlist.insts:
+            assert area.contains(inst.attributes.courtyard())
+        assert Drc(self.pcb).run().count() == {}
+
+    def test_clusters(self):
+        placer = HierarchicalPlacer()
+        placer.pcb = self.pcb
+        root = placer.clusters()
+        assert root.insts == []
+        assert [c.name for c in root.children] == \
+            ['Channel', 'Channel', 'Outer']
+        assert root.children[2].children[0].insts == [2]
+        pads = self.pcb.pads
+        assert root.children[0].signature(pads) == \
+            root.children[1].signature(pads)
+
+
+def test_optimize():
+    with tempfile.TemporaryDirectory() as tmp:
+        filein = os.path.join(tmp, 'in.pcb')
+        fileout = os.path.join(tmp, 'out.pcb')
+        pcb_fixture().to_file(filein)
+
+        placer = Placer(optimize=True, time_limit=10)
+        placer.place(filein, fileout)
+        assert os.path.exists(fileout)
+
+    phases = [step[1] for step in placer.trajectory]
+    assert phases[0] == 'area' and phases[-1] == 'hpwl'
+    hpwl = [step[4] for step in placer.trajectory if step[1] == 'hpwl']
+    assert hpwl == sorted(hpwl, reverse=True)
+
+
+def test_wirelength_no_rotation():
+    placer = Placer()
+    placer.pcb = pcb_fixture()
+    boxes = [Z3Box.from_inst(inst) for inst in placer.pcb.netlist.insts]
+    hpwl, constraints = placer.wirelength(boxes)
+
+    s = Solver()
+    s.add(constraints)
+    s.add(boxes[0].rotation_constraint(allow_rotate=True))
+    assert s.check() == sat
+    s.add(boxes[0].var_rot)
+    assert s.check() == unsat
+
+
+def test_partition_placement():
+    with tempfile.TemporaryDirectory() as tmp:
+        filein = os.path.join(tmp, 'in.pcb')
+        fileout = os.path.join(tmp, 'out.pcb')
+        pcb_fixture().to_file(filein)
+
+        placer = Placer(partition=True, region_size=1, workers=1)
+        placer.place(filein, fileout)
+        assert os.path.exists(fileout)
+
+    assert placer.num_constraints < 3
+    assert 'courtyard_overlap' not in Drc(placer.pcb).run().count()
+
+
+def test_partition():
+    # Two cliques of four insts connected by a single edge
+    edges = [(i, j) for k in (0, 4) for i in range(k, k + 4)
+             for j in range(k, k + 4) if i != j] + [(3, 4), (4, 3)]
+    rows, cols = zip(*edges)
+    adjacency = sp.csr_matrix((np.ones(len(edges)), (rows, cols)),
+                              shape=(8, 8))
+    root = partition(adjacency, np.ones(8), np.arange(8), (0, 0, 10, 4), 4)
+
+    assert [sorted(leaf.index) for leaf in root.leaves()] in \
+        ([[0, 1, 2, 3], [4, 5, 6, 7]], [[4, 5, 6, 7], [0, 1, 2, 3]])
+    # The longer side is cut in proportion to the area
+    assert [leaf.bounds for leaf in root.leaves()] == \
+        [(0, 0, 5, 4), (5, 0, 10, 4)]
+
+
+def test_free_position():
+    occupied = np.zeros((10, 10), dtype=bool)
+    occupied[2:6, 2:6] = True
+    assert free_position(occupied, 2, 2, (3, 3.5)) == (3, 6)
+    assert free_position(occupied, 2, 2, (8, 8)) == (8, 8)
+    assert free_position(occupied, 11, 1, (0, 0)) is None
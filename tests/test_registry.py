@@ -0,0 +1,74 @@
+import unittest
+from pycircuit.registry import Registry, DeviceRegistry
+
+
+class Part(object):
+    def __init__(self, name, component=None, registry=None):
+        self.name = name
+        self.component = component
+        if registry is not None:
+            registry.append(self)
+
+
+class RegistryTests(unittest.TestCase):
+    def test_first_wins(self):
+        registry = Registry()
+        a1, a2 = Part('A', registry=registry), Part('A', registry=registry)
+        assert registry.get('A') is a1
+        assert list(registry) == [a1, a2]
+        assert registry.get('B') is None
+
+    def test_defer(self):
+        registry = Registry()
+        built = []
+
+        def factory(name):
+            built.append(name)
+            return Part(name, registry=registry)
+
+        registry.defer('A', factory)
+        registry.defer('B', factory)
+        assert built == []
+
+        assert registry.get('B').name == 'B'
+        assert built == ['B']
+
+        # The deferred A was registered before the eager A
+        eager = Part('A', registry=registry)
+        assert registry.get('A') is not eager
+        assert built == ['B', 'A']
+
+    def test_defer_iter(self):
+        registry = Registry()
+        registry.defer('A', lambda name: Part(name, registry=registry))
+        assert [part.name for part in registry] == ['A']
+
+    def test_defer_devices(self):
+        registry = DeviceRegistry()
+        c = Part('C')
+        for name in ('D1', 'D2', 'D3'):
+            registry.defer(name, lambda name: Part(name, c,
+                                                   registry=registry), 'C')
+
+        # All devices of a component are built in order
+        registry.get('D2')
+        assert [d.name for d in registry.by_component[c]] == \
+            ['D1', 'D2', 'D3']
+
+        registry.defer('D4', lambda name: Part(name, c,
+                                               registry=registry), 'C')
+        Part('D5', c, registry=registry)
+        assert [d.name for d in registry.by_component[c]] == \
+            ['D1', 'D2', 'D3', 'D4', 'D5']
+
+    def test_discard_deferred(self):
+        registry = DeviceRegistry()
+        c = Part('C')
+        registry.defer('D1', lambda name: Part(name, c,
+                                               registry=registry), 'C')
+        registry.discard_deferred()
+
+        # The discarded factory isn't built in place of the eager device
+        eager = Part('D1', c, registry=registry)
+        assert registry.get('D1') is eager
+        assert list(registry) == [eager]